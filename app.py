@@ -10,10 +10,14 @@ import json
 import tempfile
 import shutil
 from pathlib import Path
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Iterator
 import io
 import subprocess
 import re
+import functools
+import threading
+from collections import OrderedDict, deque
+from dataclasses import dataclass
 
 # 必要なライブラリのインポート
 try:
@@ -26,10 +30,13 @@ try:
     from google.oauth2 import service_account
     import yt_dlp
     import torch
+    import numpy as np
 except ImportError as e:
     st.error(f"必要なライブラリのインポートに失敗しました: {e}")
     st.stop()
 
+import workers
+
 # ============================
 # 定数とディレクトリ設定
 # ============================
@@ -39,11 +46,156 @@ TEMP_IMAGES_DIR = Path("./temp_images")  # 画像/ステッカー用一時ディ
 TEMP_AUDIOS_DIR = Path("./temp_audios")  # 音声用一時ディレクトリ
 CHROMADB_DIR = Path("./chromadb_data")
 TEXT_BACKGROUNDS_DIR = Path("./text_backgrounds")  # テキストレイヤー背景画像用
+TRANSCRIPT_CACHE_DIR = Path("./transcript_cache")  # 文字起こし結果のキャッシュ
+RENDER_CACHE_DIR = Path("./render_cache")  # 生成済み動画のキャッシュ（編集内容のハッシュごと）
+TEXT_LAYER_CACHE_DIR = Path("./text_layer_cache")  # ラスタライズ済みテキストPNGのキャッシュ
 
 # ディレクトリの作成
-for dir_path in [FONTS_DIR, TEMP_VIDEOS_DIR, TEMP_IMAGES_DIR, TEMP_AUDIOS_DIR, CHROMADB_DIR, TEXT_BACKGROUNDS_DIR]:
+for dir_path in [FONTS_DIR, TEMP_VIDEOS_DIR, TEMP_IMAGES_DIR, TEMP_AUDIOS_DIR, CHROMADB_DIR, TEXT_BACKGROUNDS_DIR, TRANSCRIPT_CACHE_DIR, RENDER_CACHE_DIR, TEXT_LAYER_CACHE_DIR]:
     dir_path.mkdir(exist_ok=True, parents=True)
 
+# 文字起こしキャッシュの容量上限（環境変数 TRANSCRIPT_CACHE_MAX_MB で変更可能）
+TRANSCRIPT_CACHE_MAX_BYTES = int(os.environ.get("TRANSCRIPT_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# 生成済み動画キャッシュの容量上限（環境変数 RENDER_CACHE_MAX_MB で変更可能）
+RENDER_CACHE_MAX_BYTES = int(os.environ.get("RENDER_CACHE_MAX_MB", "2048")) * 1024 * 1024
+RENDER_CACHE_VERSION = 2  # 描画処理を変更して同じ入力でも出力が変わる場合は上げる
+
+# ラスタライズ済みテキストPNGの容量上限（環境変数 TEXT_LAYER_CACHE_MAX_MB で変更可能）
+TEXT_LAYER_CACHE_MAX_BYTES = int(os.environ.get("TEXT_LAYER_CACHE_MAX_MB", "128")) * 1024 * 1024
+TEXT_LAYER_FADE_SECONDS = 0.5  # テキストアニメーションのフェード時間
+
+# ffprobeの結果を保持するファイル数（パス・更新時刻・サイズが同じファイルは再probeしない）
+MEDIA_INFO_CACHE_SIZE = 32
+
+# プレビューのスマートカット設定（境界のGOPだけ再エンコードし、中間はストリームコピー）
+SMART_CUT_ENCODERS = {'h264': 'libx264'}  # 元動画のコーデック → 境界部分の再エンコードに使うエンコーダー
+SMART_CUT_MIN_COPY_SECONDS = 2.0  # コピーできる区間がこれより短い場合は範囲全体を再エンコードする
+SMART_CUT_CHECK_SECONDS = 1.0  # 再エンコード部分とコピー部分のつなぎ目の前後でデコードを確認する長さ
+# ffprobeのH.264プロファイル名 → x264のプロファイル（コピー部分と同じプロファイルで境界を再エンコードする）
+SMART_CUT_H264_PROFILES = {
+    'Constrained Baseline': 'baseline',
+    'Baseline': 'baseline',
+    'Main': 'main',
+    'High': 'high',
+    'High 10': 'high10',
+    'High 4:2:2': 'high422',
+    'High 4:4:4 Predictive': 'high444'
+}
+
+# プロフェッショナル編集のプロキシプレビュー設定（縮小・低フレームレートで素早く確認する）
+PROXY_MAX_HEIGHT = 360  # これより高い動画は縦この高さに縮小する
+PROXY_FPS = 15
+
+# 動画エンコードのプロファイル（環境変数 ENCODE_THREADS でエンコードのスレッド数を指定可能、0はFFmpegの自動設定）
+# crf と video_bitrate はどちらか一方を指定する。max_height / max_fps を超える動画は縮小・間引きして出力する
+ENCODE_THREADS = int(os.environ.get("ENCODE_THREADS", "0"))
+ENCODE_PROFILES = {
+    'draft': {
+        'label': "📝 下書き（高速・軽量）",
+        'preset': 'veryfast', 'crf': 28, 'audio_bitrate': '128k'
+    },
+    'standard': {
+        'label': "⚖️ 標準",
+        'preset': 'medium', 'crf': 23, 'audio_bitrate': '192k'
+    },
+    'social_1080p': {
+        'label': "📱 SNS投稿（1080p・ビットレート指定）",
+        'preset': 'fast', 'video_bitrate': '8M', 'maxrate': '10M', 'bufsize': '16M', 'g': 60,
+        'max_height': 1080, 'audio_bitrate': '160k'
+    },
+    'archive': {
+        'label': "🗄️ 保存用（高画質）",
+        'preset': 'slow', 'crf': 18, 'tune': 'film', 'audio_bitrate': '256k'
+    },
+    'proxy': {
+        'label': "⚡ プロキシ（プレビュー専用）", 'hidden': True,
+        'preset': 'ultrafast', 'crf': 30, 'tune': 'fastdecode', 'audio_bitrate': '96k',
+        'max_height': PROXY_MAX_HEIGHT, 'max_fps': PROXY_FPS
+    },
+}
+DEFAULT_ENCODE_PROFILE = 'standard'
+PROXY_ENCODE_PROFILE = 'proxy'
+
+# 分割並列レンダリング設定（環境変数 RENDER_PARALLEL_WORKERS で同時にエンコードする区間数を変更可能）
+RENDER_PARALLEL_WORKERS = int(os.environ.get("RENDER_PARALLEL_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // 2)))))
+RENDER_PARALLEL_MIN_SECONDS = 60.0  # これより短いクリップは分割しない
+RENDER_PARALLEL_MIN_SEGMENT_SECONDS = 10.0  # 区間の最小長
+
+# Whisperのデコード設定（キャッシュキーにも含める）
+WHISPER_DECODE_OPTIONS = {
+    'language': 'ja',
+    'fp16': False,  # CPU互換性のため
+    'temperature': 0.0,  # より安定した結果を得る
+    'condition_on_previous_text': False  # エラー回避
+}
+
+# 並列文字起こし設定（環境変数 WHISPER_PARALLEL_WORKERS でプロセス数を変更可能）
+WHISPER_SAMPLE_RATE = 16000
+# 各プロセスがWhisperモデルを丸ごとロードするため、既定値はメモリを使い切らない程度に抑える
+PARALLEL_MAX_WORKERS = int(os.environ.get("WHISPER_PARALLEL_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // 2)))))
+PARALLEL_MIN_DURATION = 120.0  # これより短い動画は分割しない（秒）
+PARALLEL_CHUNK_SECONDS = 60.0  # チャンクの目標長（秒）
+PARALLEL_MIN_CHUNK_SECONDS = 20.0  # チャンクの最小長（秒）
+STREAMING_WINDOW_SECONDS = 30.0  # ストリーミング文字起こしのウィンドウ長（秒）
+
+# 発話区間検出（VAD）設定: フレームエネルギーが背景ノイズより十分大きい区間を発話とみなす
+VAD_FRAME_MS = 30
+VAD_THRESHOLD_DB = 12.0  # 背景ノイズレベルからの閾値（dB）
+VAD_MIN_THRESHOLD_DBFS = -50.0  # これより小さい音は常に無音扱い
+VAD_MAX_THRESHOLD_DBFS = -35.0  # BGMが常に鳴っていても発話を取りこぼさないための閾値上限
+VAD_MIN_SILENCE_SECONDS = 0.6  # これより短い無音は発話区間に含める
+VAD_MIN_SPEECH_SECONDS = 0.25  # これより短い発話区間はノイズとして除外
+VAD_PADDING_SECONDS = 0.3  # 発話区間の前後に残す余白
+
+# OCRのフレームサンプリング設定
+OCR_SAMPLE_INTERVAL_SECONDS = 5.0  # 既定のサンプリング間隔（秒）
+OCR_SEEK_MIN_GAP_SECONDS = 2.0  # これより近いサンプルはシークせず順方向に読み進める
+OCR_SCENE_THRESHOLD = 0.3  # FFmpegのシーン変化スコアの閾値（0〜1）
+OCR_SCENE_SETTLE_SECONDS = 0.3  # カット直後はトランジション中のことがあるため少し後のフレームを使う
+OCR_DHASH_MAX_DISTANCE = 4  # 直前にOCRしたフレームとのdHashのハミング距離がこれ以下ならスキップ
+OCR_BATCH_SIZE = int(os.environ.get("OCR_BATCH_SIZE", "8"))  # EasyOCRに1回で渡すフレーム数
+OCR_MIN_CONFIDENCE = 0.6  # これより信頼度が低い認識結果は捨てる
+# MSERで検出したテキスト領域だけを認識する（環境変数 OCR_CROP_TEXT_REGIONS=0 でフレーム全体をEasyOCRで検出・認識）
+OCR_CROP_TEXT_REGIONS = os.environ.get("OCR_CROP_TEXT_REGIONS", "1") != "0"
+# OCRワーカープロセス数（各プロセスがOCRモデルをロードするため、既定値はメモリを使い切らない程度に抑える）
+OCR_PARALLEL_WORKERS = int(os.environ.get("OCR_PARALLEL_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) // 2)))))
+
+# ChromaDBへの書き込みを分割するサイズ
+CHROMA_UPSERT_BATCH_SIZE = 256
+LIBRARY_COLLECTION_NAME = "video_library"  # 全動画のセグメントをまとめたコレクション
+
+# ハイブリッド検索（BM25 + ベクトル検索）の設定
+LEXICAL_INDEX_DIR = CHROMADB_DIR / "lexical"  # コレクションごとの転置インデックスの保存先
+LEXICAL_INDEX_DIR.mkdir(exist_ok=True, parents=True)
+LEXICAL_COMPACT_RATIO = 0.3  # 削除済み文書がこの割合を超えたら転置インデックスを詰め直す
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60  # Reciprocal Rank Fusion の定数
+HYBRID_CANDIDATES = 50  # 統合前にそれぞれの検索で取得する候補数
+QUERY_RESULT_CACHE_SIZE = 512  # 検索結果を保持する件数（コレクション・クエリ・件数ごと）
+SEARCH_DEFAULT_N_RESULTS = 5  # 検索結果数の既定値（検索クエリ候補の事前計算にも使う）
+
+# 検索単位の設定
+SEARCH_UNIT_SEGMENT = "segment"  # Whisperのセグメントをそのまま検索単位にする
+SEARCH_UNIT_WINDOW = "window"  # 連続するセグメントを重なりのあるウィンドウにまとめる
+SCENE_WINDOW_SECONDS = 20.0  # ウィンドウの長さ
+SCENE_WINDOW_STRIDE_SECONDS = 10.0  # ウィンドウのずらし幅（長さより短いと前後のウィンドウが重なる）
+SCENE_MERGE_GAP_SECONDS = 1.0  # これ以下の間隔で隣り合う検索ヒットは1つのシーンにまとめる
+SCENE_MERGE_CANDIDATE_FACTOR = 2  # まとめて減る分を見込んで、検索結果数の何倍の候補を取得するか
+
+# 検索用の埋め込みモデル（日本語対応の多言語モデル。環境変数 EMBEDDING_MODEL で変更可能）
+EMBEDDING_MODEL_NAME = os.environ.get("EMBEDDING_MODEL", "intfloat/multilingual-e5-small")
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "32"))  # 1回の推論でまとめて埋め込むテキスト数
+EMBEDDING_QUERY_CACHE_SIZE = 256  # 検索クエリの埋め込みを保持する件数
+EMBEDDING_DEFAULT_NAME = "chroma-default"  # ChromaDB標準の埋め込みを使う場合の名前
+EMBEDDING_CACHE_DIR = TRANSCRIPT_CACHE_DIR / "embeddings"  # ドキュメント埋め込みの保存先
+EMBEDDING_CACHE_DIR.mkdir(exist_ok=True, parents=True)
+
+# メモリ上で音声を扱う際の上限（利用可能メモリに対する割合）
+AUDIO_MEMORY_BYTES_PER_SAMPLE = 10
+AUDIO_MEMORY_BUDGET_RATIO = 0.5
+
 # Google Fonts カテゴリー別フォントリスト（日本語対応フォント全種類）
 # 5つのカテゴリーに分類: 普通、スタイリッシュ、漫画風、古風・和風、その他
 
@@ -476,24 +628,309 @@ def download_from_web(url: str, output_path: str) -> bool:
     return False
 
 
+def evict_lru_cache(cache_dir: Path, max_bytes: int, pattern: str = "*") -> int:
+    """キャッシュディレクトリを容量上限内に収める（最終アクセスが古い順に削除）
+
+    Returns:
+        削除したファイル数
+    """
+    entries = []
+    for cache_file in cache_dir.glob(pattern):
+        if cache_file.is_file():
+            stat = cache_file.stat()
+            entries.append((stat.st_mtime, stat.st_size, cache_file))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    removed_count = 0
+    for _, size, cache_file in sorted(entries, key=lambda entry: entry[0]):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            cache_file.unlink()
+            total_bytes -= size
+            removed_count += 1
+        except OSError:
+            pass
+
+    return removed_count
+
+
+def compute_pcm_hash(pcm_bytes: bytes, sample_rate: int = WHISPER_SAMPLE_RATE) -> str:
+    """16bit モノラルPCMのバイト列からハッシュを計算（コンテナやファイル名に依存しない）"""
+    import hashlib
+
+    hasher = hashlib.sha256()
+    hasher.update(f"{sample_rate}:1:2".encode('ascii'))
+    hasher.update(pcm_bytes)
+    return hasher.hexdigest()
+
+
+def get_transcription_cache_key(audio_hash: str, model_name: str, decode_options: Dict) -> str:
+    """音声ハッシュ・モデル名・デコード設定から文字起こしキャッシュのキーを生成"""
+    import hashlib
+
+    payload = json.dumps(
+        {'audio': audio_hash, 'model': model_name, 'options': decode_options},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_cached_transcription(cache_key: str) -> Optional[Dict]:
+    """キャッシュ済みの文字起こし結果を取得（ヒット時はLRU用にアクセス時刻を更新）"""
+    cache_path = TRANSCRIPT_CACHE_DIR / f"{cache_key}.json"
+    if not cache_path.exists():
+        return None
+
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        os.utime(cache_path, None)
+        return result
+    except Exception as e:
+        print(f"文字起こしキャッシュの読み込みに失敗: {e}")
+        return None
+
+
+def save_transcription_to_cache(cache_key: str, result: Dict, max_bytes: int = TRANSCRIPT_CACHE_MAX_BYTES) -> None:
+    """文字起こし結果をキャッシュに保存し、容量上限を超えた分を古い順に削除"""
+    cache_path = TRANSCRIPT_CACHE_DIR / f"{cache_key}.json"
+    tmp_path = cache_path.with_suffix('.tmp')
+
+    try:
+        # 書き込み途中のファイルを読まないよう一時ファイル経由で保存
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, default=float)
+        os.replace(tmp_path, cache_path)
+        evict_lru_cache(TRANSCRIPT_CACHE_DIR, max_bytes, pattern="*.json")
+    except Exception as e:
+        print(f"文字起こしキャッシュの保存に失敗: {e}")
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+@functools.lru_cache(maxsize=256)
+def _hash_file_content(file_path: str, mtime_ns: int, size: int) -> str:
+    """ファイル内容のSHA-256（更新時刻とサイズはキャッシュキー用）"""
+    import hashlib
+
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def compute_file_hash(file_path: Optional[str]) -> Optional[str]:
+    """素材ファイル（画像・BGM・フォント）の内容ハッシュ。存在しない場合は None"""
+    if not file_path or not Path(file_path).is_file():
+        return None
+    stat = os.stat(file_path)
+    return _hash_file_content(str(Path(file_path).resolve()), stat.st_mtime_ns, stat.st_size)
+
+
+def get_render_cache_key(
+    video_path: str,
+    start_time: float,
+    end_time: float,
+    layers: List[Dict],
+    effects: Dict,
+    audio_settings: Dict,
+    encode_options: Dict
+) -> str:
+    """編集内容から生成済み動画キャッシュのキーを生成
+
+    元動画はパス・更新時刻・サイズで識別し（大きいため内容は読まない）、
+    レイヤーの画像・フォントやBGMは内容ハッシュを含めるため、同名で差し替えた素材も区別できる。
+    """
+    import hashlib
+
+    stat = os.stat(video_path)
+    canonical_layers = []
+    for layer in layers:
+        layer = dict(layer)
+        for key in ('path', 'background_image'):
+            if layer.get(key):
+                layer[f'{key}_sha256'] = compute_file_hash(layer[key])
+        if layer.get('type') == 'text':
+            layer['font_sha256'] = compute_file_hash(str(FONTS_DIR / layer.get('font_file', 'Noto_Sans_JP.ttf')))
+        canonical_layers.append(layer)
+
+    audio_settings = dict(audio_settings)
+    if audio_settings.get('bgm_path'):
+        audio_settings['bgm_sha256'] = compute_file_hash(audio_settings['bgm_path'])
+
+    payload = json.dumps(
+        {
+            'version': RENDER_CACHE_VERSION,
+            'source': {'path': str(Path(video_path).resolve()), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size},
+            'range': [round(float(start_time), 3), round(float(end_time), 3)],
+            'layers': canonical_layers,
+            'effects': effects,
+            'audio': audio_settings,
+            'encode': encode_options
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_cached_render(cache_key: str, output_path: str) -> bool:
+    """生成済み動画がキャッシュにあれば出力先にコピー（ヒット時はLRU用にアクセス時刻を更新）"""
+    cache_path = RENDER_CACHE_DIR / f"{cache_key}.mp4"
+    if not cache_path.exists():
+        return False
+
+    try:
+        # 出力先は次回の生成で上書きされるため、ハードリンクではなくコピーする
+        shutil.copyfile(cache_path, output_path)
+        os.utime(cache_path, None)
+        return True
+    except OSError as e:
+        print(f"生成済み動画キャッシュの読み込みに失敗: {e}")
+        return False
+
+
+def save_render_to_cache(cache_key: str, output_path: str, max_bytes: int = RENDER_CACHE_MAX_BYTES) -> None:
+    """生成した動画をキャッシュに保存し、容量上限を超えた分を古い順に削除"""
+    cache_path = RENDER_CACHE_DIR / f"{cache_key}.mp4"
+    tmp_path = cache_path.with_suffix('.tmp')
+
+    try:
+        shutil.copyfile(output_path, tmp_path)
+        os.replace(tmp_path, cache_path)
+        evict_lru_cache(RENDER_CACHE_DIR, max_bytes, pattern="*.mp4")
+    except OSError as e:
+        print(f"生成済み動画キャッシュの保存に失敗: {e}")
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
 @st.cache_resource
-def load_whisper_model(model_name: str = "base"):
-    """Whisperモデルをロード（キャッシュ付き）"""
+def load_whisper_model(model_name: str = "base", backend: str = workers.ASR_BACKEND_OPENAI_WHISPER):
+    """Whisperモデルをロード（キャッシュ付き）
+
+    backend に faster-whisper を指定すると、CTranslate2のint8量子化モデルでCPU推論する。
+    """
     try:
-        st.info(f"🔄 Whisperモデル（{model_name}）をロード中... 初回は数分かかります。")
-        model = whisper.load_model(model_name)
-        st.success(f"✅ Whisperモデル（{model_name}）のロードが完了しました！")
+        st.info(f"🔄 Whisperモデル（{model_name} / {backend}）をロード中... 初回は数分かかります。")
+        model = workers.load_asr_model(model_name, backend)
+        st.success(f"✅ Whisperモデル（{model_name} / {backend}）のロードが完了しました！")
         return model
+    except ImportError as e:
+        st.error(f"❌ {backend} がインストールされていません: {e}")
+        st.info("💡 `pip install faster-whisper` を実行するか、標準のopenai-whisperを選択してください。")
+        return None
     except Exception as e:
         st.error(f"❌ Whisperモデルのロードに失敗しました: {e}")
         return None
 
 
+@dataclass
+class MediaInfo:
+    """ffprobeで取得した動画ファイルの情報（get_media_info で1ファイルにつき1回だけ取得する）"""
+    path: str
+    duration: float
+    fps: float
+    frame_count: int
+    width: int
+    height: int
+    video_codec: Optional[str]
+    audio_codec: Optional[str]
+    streams: List[Dict]
+
+    @property
+    def video_stream(self) -> Dict:
+        return next((stream for stream in self.streams if stream.get('codec_type') == 'video'), {})
+
+    @property
+    def audio_streams(self) -> List[Dict]:
+        return [stream for stream in self.streams if stream.get('codec_type') == 'audio']
+
+    @property
+    def has_audio(self) -> bool:
+        return bool(self.audio_streams)
+
+    @functools.cached_property
+    def keyframes(self) -> List[float]:
+        """映像のキーフレーム時刻（秒・昇順）。パケットの走査が必要なため、初めて参照したときに取得する"""
+        return probe_keyframes(self.path)
+
+
+def parse_frame_rate(rate: Optional[str]) -> float:
+    """ffprobeのフレームレート表記（例: '30000/1001'）を数値に変換"""
+    try:
+        numerator, _, denominator = (rate or '').partition('/')
+        return float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return 0.0
+
+
+def probe_keyframes(video_path: str) -> List[float]:
+    """ffprobeのパケットフラグから映像のキーフレーム時刻を取得（デコードはしない）
+
+    Raises:
+        subprocess.CalledProcessError: ffprobeの実行に失敗した場合
+    """
+    output = subprocess.run(
+        [
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path
+        ],
+        capture_output=True, text=True, check=True
+    ).stdout
+
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if flags.startswith('K') and pts_time not in ('', 'N/A'):
+            keyframes.append(float(pts_time))
+    return sorted(keyframes)
+
+
+@functools.lru_cache(maxsize=MEDIA_INFO_CACHE_SIZE)
+def _probe_media_info(video_path: str, mtime_ns: int, size: int) -> MediaInfo:
+    """ffprobeを1回だけ実行してMediaInfoを作成（更新時刻とサイズはキャッシュキー用）"""
+    probe = ffmpeg.probe(video_path)
+    streams = probe.get('streams', [])
+    video_stream = next((stream for stream in streams if stream.get('codec_type') == 'video'), {})
+    audio_stream = next((stream for stream in streams if stream.get('codec_type') == 'audio'), {})
+
+    duration = float(probe.get('format', {}).get('duration') or video_stream.get('duration') or 0.0)
+    fps = parse_frame_rate(video_stream.get('avg_frame_rate')) or parse_frame_rate(video_stream.get('r_frame_rate'))
+    frame_count = int(video_stream.get('nb_frames') or 0) or int(round(duration * fps))
+
+    return MediaInfo(
+        path=video_path,
+        duration=duration,
+        fps=fps,
+        frame_count=frame_count,
+        width=int(video_stream.get('width') or 0),
+        height=int(video_stream.get('height') or 0),
+        video_codec=video_stream.get('codec_name'),
+        audio_codec=audio_stream.get('codec_name'),
+        streams=streams
+    )
+
+
+def get_media_info(video_path: str) -> MediaInfo:
+    """動画ファイルの情報を取得（パス・更新時刻・サイズが同じ間はffprobeを再実行しない）
+
+    Raises:
+        ffmpeg.Error: ffprobeの実行に失敗した場合
+        OSError: ファイルが存在しない場合
+    """
+    stat = os.stat(video_path)
+    return _probe_media_info(str(video_path), stat.st_mtime_ns, stat.st_size)
+
+
 def check_video_has_audio(video_path: str) -> bool:
     """動画に音声トラックがあるかチェック"""
     try:
-        probe = ffmpeg.probe(video_path)
-        audio_streams = [stream for stream in probe['streams'] if stream['codec_type'] == 'audio']
+        audio_streams = get_media_info(video_path).audio_streams
         
         if len(audio_streams) > 0:
             # デバッグ情報を表示
@@ -511,8 +948,329 @@ def check_video_has_audio(video_path: str) -> bool:
         return False
 
 
-def transcribe_video(video_path: str, model) -> Optional[Dict]:
-    """動画から音声を文字起こし"""
+def extract_audio_pcm(video_path: str, sample_rate: int = WHISPER_SAMPLE_RATE) -> bytes:
+    """FFmpegで最初の音声ストリームを16bit モノラルPCMとして標準出力に流し、メモリ上で受け取る
+
+    Raises:
+        ffmpeg.Error: 音声抽出に失敗した場合
+    """
+    pcm_bytes, _ = (
+        ffmpeg
+        .input(video_path)
+        .output(
+            'pipe:',
+            format='s16le',       # ヘッダーなしのPCM 16-bit
+            acodec='pcm_s16le',
+            ac=1,                 # モノラル
+            ar=str(sample_rate),  # 16kHz サンプリングレート
+            **{'map': '0:a:0'}    # 最初の音声ストリームを明示的に選択
+        )
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return pcm_bytes
+
+
+def pcm_to_float32(pcm_bytes: bytes) -> np.ndarray:
+    """16bit PCMのバイト列をWhisperが受け取るfloat32配列（-1.0〜1.0）に変換"""
+    return np.frombuffer(pcm_bytes, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def get_available_memory_bytes() -> Optional[int]:
+    """利用可能なメモリ量（バイト）を取得（取得できない場合はNone）"""
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimate_audio_memory_bytes(duration: float, sample_rate: int = WHISPER_SAMPLE_RATE) -> int:
+    """文字起こし中に音声データが占めるメモリ量の目安を計算
+
+    PCMバイト列（2バイト/サンプル）とfloat32配列（4バイト/サンプル）に加え、
+    Whisper内部のパディングやメルスペクトログラムの作業領域を見込んで約10バイト/サンプルとする。
+    """
+    return int(duration * sample_rate * AUDIO_MEMORY_BYTES_PER_SAMPLE)
+
+
+def check_audio_memory_budget(duration: float) -> bool:
+    """動画の長さと利用可能メモリから、音声をメモリ上で処理できるか判定（不可の場合はエラーを表示）"""
+    available_bytes = get_available_memory_bytes()
+    if available_bytes is None:
+        return True
+
+    estimated_bytes = estimate_audio_memory_bytes(duration)
+    budget_bytes = available_bytes * AUDIO_MEMORY_BUDGET_RATIO
+    if estimated_bytes <= budget_bytes:
+        return True
+
+    max_minutes = budget_bytes / (WHISPER_SAMPLE_RATE * AUDIO_MEMORY_BYTES_PER_SAMPLE) / 60
+    st.error(f"❌ 動画が長すぎます（{duration/60:.1f}分）。音声処理に約{estimated_bytes/(1024*1024):.0f} MBのメモリが必要ですが、利用可能なメモリは{available_bytes/(1024*1024):.0f} MBです。")
+    st.info(f"""
+    💡 **対処方法**:
+    1. 動画を{max_minutes:.0f}分以内に短く切り取る
+    2. 他のアプリケーションを終了してメモリを空ける
+    3. より軽量なモデル（tiny）を使用する
+    """)
+    return False
+
+
+def compute_frame_energy(audio: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE, frame_ms: int = 30) -> np.ndarray:
+    """音声をフレームに区切り、フレームごとのRMSエネルギーを計算"""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def find_silence_split_points(
+    audio: np.ndarray,
+    chunk_seconds: float = PARALLEL_CHUNK_SECONDS,
+    search_seconds: float = 5.0,
+    sample_rate: int = WHISPER_SAMPLE_RATE,
+    frame_ms: int = 30
+) -> List[int]:
+    """チャンクの目標長付近で最もエネルギーが低い（無音に近い）位置を分割点として返す
+
+    Returns:
+        分割位置のサンプルインデックスのリスト（昇順）
+    """
+    energy = compute_frame_energy(audio, sample_rate, frame_ms)
+    frame_len = int(sample_rate * frame_ms / 1000)
+    chunk_frames = max(1, int(chunk_seconds * 1000 / frame_ms))
+    search_frames = int(search_seconds * 1000 / frame_ms)
+
+    split_points = []
+    position = 0
+    while position + chunk_frames + search_frames < len(energy):
+        target = position + chunk_frames
+        lo = max(position + 1, target - search_frames)
+        hi = min(len(energy), target + search_frames)
+        best = lo + int(np.argmin(energy[lo:hi]))
+        split_points.append(best * frame_len)
+        position = best
+
+    return split_points
+
+
+def detect_speech_regions(
+    audio: np.ndarray,
+    sample_rate: int = WHISPER_SAMPLE_RATE,
+    frame_ms: int = VAD_FRAME_MS
+) -> List[Tuple[int, int]]:
+    """フレームエネルギーから発話区間を検出（エネルギーベースのVAD）
+
+    閾値は音声ごとの背景ノイズレベル（下位10%のフレームエネルギー）から決める。
+    短い無音は発話区間に含め、短すぎる区間は除外し、前後に余白を付ける。
+
+    Returns:
+        発話区間 (開始サンプル, 終了サンプル) のリスト（昇順・重なりなし）
+    """
+    energy = compute_frame_energy(audio, sample_rate, frame_ms)
+    if len(energy) == 0:
+        return []
+
+    frame_len = int(sample_rate * frame_ms / 1000)
+    energy_db = 20 * np.log10(energy + 1e-10)
+    noise_floor_db = float(np.percentile(energy_db, 10))
+    threshold_db = min(max(noise_floor_db + VAD_THRESHOLD_DB, VAD_MIN_THRESHOLD_DBFS), VAD_MAX_THRESHOLD_DBFS)
+
+    # 発話フレームの連続区間を抽出
+    is_speech = np.concatenate(([0], (energy_db > threshold_db).astype(np.int8), [0]))
+    edges = np.diff(is_speech)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_silence_frames = int(VAD_MIN_SILENCE_SECONDS * 1000 / frame_ms)
+    min_speech_frames = int(VAD_MIN_SPEECH_SECONDS * 1000 / frame_ms)
+    padding = int(VAD_PADDING_SECONDS * sample_rate)
+
+    # 短い無音をはさむ区間を結合
+    merged = []
+    for start, end in zip(starts, ends):
+        if merged and start - merged[-1][1] < min_silence_frames:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    regions = []
+    for start, end in merged:
+        if end - start < min_speech_frames:
+            continue
+        region_start = max(0, int(start) * frame_len - padding)
+        region_end = min(len(audio), int(end) * frame_len + padding)
+        if end == len(energy):
+            region_end = len(audio)
+        if regions and region_start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], region_end)
+        else:
+            regions.append((region_start, region_end))
+
+    return regions
+
+
+def compact_speech_audio(
+    audio: np.ndarray,
+    regions: List[Tuple[int, int]],
+    sample_rate: int = WHISPER_SAMPLE_RATE
+) -> Tuple[np.ndarray, List[Tuple[float, float, float]]]:
+    """発話区間だけを連結した音声と、元の時刻へ戻すための区間対応表を返す
+
+    Returns:
+        (連結した音声, [(連結後の開始秒, 元音声の開始秒, 区間長（秒）), ...])
+    """
+    region_map = []
+    compact_position = 0
+    for start, end in regions:
+        region_map.append((compact_position / sample_rate, start / sample_rate, (end - start) / sample_rate))
+        compact_position += end - start
+
+    if not regions:
+        return audio[:0], region_map
+    return np.concatenate([audio[start:end] for start, end in regions]), region_map
+
+
+def map_compact_time(t: float, region_map: List[Tuple[float, float, float]], is_end: bool = False) -> float:
+    """連結後の音声上の時刻を元音声の時刻に変換
+
+    is_end=True の場合、区間の境界ちょうどの時刻は直前の区間の終端として扱う。
+    """
+    import bisect
+
+    if not region_map:
+        return t
+
+    compact_starts = [entry[0] for entry in region_map]
+    if is_end:
+        index = bisect.bisect_left(compact_starts, t) - 1
+    else:
+        index = bisect.bisect_right(compact_starts, t) - 1
+    compact_start, original_start, region_length = region_map[max(0, index)]
+    return original_start + min(max(0.0, t - compact_start), region_length)
+
+
+def remap_segments_to_original(segments: List[Dict], region_map: List[Tuple[float, float, float]]) -> List[Dict]:
+    """発話区間を連結した音声で得たセグメントの時刻を、元動画のタイムラインに戻す（元のdictは変更しない）"""
+    remapped = []
+    for segment in segments:
+        segment = dict(segment)
+        compact_start = float(segment['start'])
+        segment['start'] = map_compact_time(compact_start, region_map)
+        segment['end'] = max(segment['start'], map_compact_time(float(segment['end']), region_map, is_end=True))
+        if 'seek' in segment:
+            # seekはメルスペクトログラムのフレーム単位（100フレーム/秒）
+            segment['seek'] = int(segment['seek']) + int(round((segment['start'] - compact_start) * 100))
+        remapped.append(segment)
+    return remapped
+
+
+def format_vad_stats(speech_seconds: float, total_seconds: float) -> str:
+    """VADの統計（発話率・スキップした時間）を表示用の文字列にする"""
+    speech_ratio = speech_seconds / total_seconds if total_seconds > 0 else 0.0
+    return (
+        f"🔇 VAD: 発話区間 {speech_seconds:.1f}秒 / 全体 {total_seconds:.1f}秒"
+        f"（発話率 {speech_ratio:.0%}、{max(0.0, total_seconds - speech_seconds):.1f}秒の無音・BGM区間をスキップ）"
+    )
+
+
+def stitch_chunk_segments(chunk_segments: List[List[Dict]], language: str = 'ja') -> Dict:
+    """チャンクごとのセグメントを1つの文字起こし結果（model.transcribeと同じ形式）に統合"""
+    segments = []
+    for chunk in chunk_segments:
+        for segment in chunk:
+            segment = dict(segment)
+            segment['id'] = len(segments)
+            segments.append(segment)
+
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': language
+    }
+
+
+def transcribe_audio_parallel(
+    audio: np.ndarray,
+    model_name: str,
+    decode_options: Dict,
+    max_workers: int = PARALLEL_MAX_WORKERS,
+    progress_callback=None,
+    backend: str = workers.ASR_BACKEND_OPENAI_WHISPER
+) -> Dict:
+    """音声を無音区間で分割し、プロセスプールで並列に文字起こし
+
+    各ワーカープロセスは自身のWhisperモデルを1回だけロードして使い回す。
+
+    Args:
+        audio: 16kHzモノラルのfloat32音声
+        model_name: Whisperモデル名
+        decode_options: model.transcribe に渡すデコード設定
+        max_workers: ワーカープロセス数
+        progress_callback: (完了チャンク数, 全チャンク数) を受け取る関数
+        backend: 音声認識バックエンド
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    max_workers = max(1, max_workers)
+    # コア数分のチャンクができるよう、長さに応じてチャンク長を調整
+    chunk_seconds = max(PARALLEL_MIN_CHUNK_SECONDS, min(PARALLEL_CHUNK_SECONDS, duration / max_workers))
+    split_points = find_silence_split_points(audio, chunk_seconds=chunk_seconds)
+    boundaries = [0] + split_points + [len(audio)]
+    chunks = [(boundaries[i], boundaries[i + 1]) for i in range(len(boundaries) - 1)]
+
+    num_workers = min(max_workers, len(chunks))
+    threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+
+    chunk_segments = [None] * len(chunks)
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=workers.init_whisper_worker,
+        initargs=(model_name, threads_per_worker, backend)
+    ) as executor:
+        futures = {
+            executor.submit(
+                workers.transcribe_chunk,
+                audio[chunk_start:chunk_end],
+                chunk_start / WHISPER_SAMPLE_RATE,
+                decode_options
+            ): index
+            for index, (chunk_start, chunk_end) in enumerate(chunks)
+        }
+        for completed, future in enumerate(as_completed(futures), 1):
+            chunk_segments[futures[future]] = future.result()
+            if progress_callback:
+                progress_callback(completed, len(chunks))
+
+    return stitch_chunk_segments(chunk_segments, language=decode_options.get('language', 'ja'))
+
+
+def transcribe_video(
+    video_path: str,
+    model,
+    model_name: str = "base",
+    parallel: bool = False,
+    backend: str = workers.ASR_BACKEND_OPENAI_WHISPER,
+    vad: bool = True
+) -> Optional[Dict]:
+    """動画から音声を文字起こし
+
+    抽出した16kHz PCMのハッシュとモデル名・デコード設定をキーにキャッシュを参照し、
+    同じ音声を処理済みの場合はWhisperを実行せずに保存済みの結果を返す。
+    parallel=True の場合、長い動画は無音区間で分割して複数プロセスで並列に処理する。
+    vad=True の場合、発話区間だけをWhisperに渡し、セグメントの時刻は元動画のタイムラインに戻す。
+    """
     try:
         # 動画の長さをチェック
         duration = get_video_duration(video_path)
@@ -526,8 +1284,13 @@ def transcribe_video(video_path: str, model) -> Optional[Dict]:
             st.info("💡 音声付きの動画を使用するか、音声なしで動画編集を行ってください。")
             return None
         
+        # 並列モードは一定以上の長さの動画にのみ適用
+        use_parallel = parallel and duration >= PARALLEL_MIN_DURATION
+        
         # 処理時間の目安を表示
-        if duration > 600:  # 10分以上
+        if use_parallel:
+            st.info(f"⚡ 並列文字起こし中... （動画の長さ: {duration/60:.1f}分、最大{PARALLEL_MAX_WORKERS}プロセスで処理）")
+        elif duration > 600:  # 10分以上
             st.warning(f"⚠️ 動画が長いです（{duration/60:.1f}分）。処理に10分以上かかる可能性があります。")
             st.info("💡 **推奨**: 動画を短く切り取るか、tinyモデルを使用してください。")
         elif duration > 300:  # 5分以上
@@ -535,130 +1298,116 @@ def transcribe_video(video_path: str, model) -> Optional[Dict]:
         else:
             st.info(f"🎤 動画を文字起こし中... （動画の長さ: {duration:.1f}秒、1-3分程度かかります）")
         
-        # 一時的な音声ファイルを作成（Whisperが処理しやすい形式に変換）
-        import tempfile
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_audio:
-            tmp_audio_path = tmp_audio.name
+        # 音声をメモリ上に展開できるか、動画の長さと利用可能メモリから事前に判定
+        if not check_audio_memory_budget(duration):
+            return None
+        
+        # FFmpegで音声を抽出し、標準出力のPCMをメモリ上で受け取る（一時ファイルを作らない）
+        progress_bar = st.progress(0)
+        status_text = st.empty()
         
         try:
-            # FFmpegで音声を抽出してWAV形式に変換
-            progress_bar = st.progress(0)
-            status_text = st.empty()
+            status_text.text("⏳ ステップ 1/3: FFmpegで音声を抽出中...")
+            progress_bar.progress(10)
             
-            try:
-                status_text.text("⏳ ステップ 1/3: FFmpegで音声を抽出中...")
-                progress_bar.progress(10)
-                
-                (
-                    ffmpeg
-                    .input(video_path)
-                    .output(
-                        tmp_audio_path,
-                        acodec='pcm_s16le',  # PCM 16-bit
-                        ac=1,                 # モノラル
-                        ar='16000',          # 16kHz サンプリングレート
-                        **{'map': '0:a:0'}   # 最初の音声ストリームを明示的に選択
-                    )
-                    .overwrite_output()
-                    .run(capture_stdout=True, capture_stderr=True)
-                )
-                
-                progress_bar.progress(30)
-                status_text.text("✅ 音声抽出完了！")
-                
-            except ffmpeg.Error as e:
-                progress_bar.empty()
-                status_text.empty()
-                stderr_output = e.stderr.decode('utf-8') if e.stderr else 'エラー情報なし'
-                st.error(f"❌ FFmpegでの音声抽出に失敗しました。")
-                st.error(f"**FFmpegエラー詳細**:\n```\n{stderr_output}\n```")
-                if os.path.exists(tmp_audio_path):
-                    os.unlink(tmp_audio_path)
-                return None
-            
-            # 音声ファイルのサイズチェック
-            import os
-            status_text.text("⏳ ステップ 2/3: 音声ファイルを検証中...")
-            progress_bar.progress(40)
-            
-            if not os.path.exists(tmp_audio_path):
-                progress_bar.empty()
-                status_text.empty()
-                st.error("❌ 音声ファイルが作成されませんでした。")
-                return None
-            
-            audio_size = os.path.getsize(tmp_audio_path)
-            audio_size_mb = audio_size / (1024 * 1024)
-            st.info(f"🔍 抽出された音声: {audio_size:,} bytes ({audio_size_mb:.2f} MB)")
-            
-            if audio_size < 1000:  # 1KB未満
-                progress_bar.empty()
-                status_text.empty()
-                st.error("❌ 抽出された音声データが小さすぎます。音声が含まれていない可能性があります。")
-                st.info(f"💡 音声ファイルサイズ: {audio_size} bytes（最低1,000 bytes必要）")
-                os.unlink(tmp_audio_path)
-                return None
-            
-            # 大きなファイルの警告
-            if audio_size_mb > 100:
-                progress_bar.empty()
-                status_text.empty()
-                st.error(f"❌ 音声ファイルが大きすぎます（{audio_size_mb:.1f} MB）。")
-                st.error("**Streamlit Community Cloudの制限により、100MB以上の音声は処理できません。**")
-                st.info("""
-                💡 **対処方法**:
-                1. 動画を短く切り取る（5分以内推奨）
-                2. より軽量なモデル（tiny）を使用する
-                3. 動画の音声ビットレートを下げる
-                """)
-                os.unlink(tmp_audio_path)
-                return None
-            elif audio_size_mb > 50:
-                st.warning(f"⚠️ 音声ファイルが大きいです（{audio_size_mb:.1f} MB）。処理に5-10分以上かかる可能性があります。")
-                st.info("💡 長い動画の場合は、tinyモデルの使用または事前に短く切り取ることをおすすめします。")
-            
-            # Whisperで文字起こし実行
-            progress_bar.progress(50)
-            status_text.text("⏳ ステップ 3/3: Whisperで音声認識中（これには数分かかります）...")
-            
-            import time
-            start_time = time.time()
+            pcm_bytes = extract_audio_pcm(video_path)
             
-            try:
-                result = model.transcribe(
-                    tmp_audio_path, 
-                    language='ja', 
-                    verbose=False,
-                    fp16=False,  # CPU互換性のため
-                    temperature=0.0,  # より安定した結果を得る
-                    condition_on_previous_text=False  # エラー回避
-                )
-                
-                elapsed_time = time.time() - start_time
-                progress_bar.progress(100)
-                status_text.text(f"✅ 音声認識完了！（処理時間: {elapsed_time:.1f}秒）")
-                
-            except Exception as whisper_error:
-                progress_bar.empty()
-                status_text.empty()
-                elapsed_time = time.time() - start_time
-                st.error(f"❌ Whisperでの音声認識に失敗しました（{elapsed_time:.1f}秒後）: {whisper_error}")
-                if os.path.exists(tmp_audio_path):
-                    os.unlink(tmp_audio_path)
-                raise whisper_error
-            
-            # 一時ファイルを削除
-            if os.path.exists(tmp_audio_path):
-                os.unlink(tmp_audio_path)
+            progress_bar.progress(30)
+            status_text.text("✅ 音声抽出完了！")
             
         except ffmpeg.Error as e:
-            # FFmpegエラーは既に上で処理済み
+            progress_bar.empty()
+            status_text.empty()
+            stderr_output = e.stderr.decode('utf-8') if e.stderr else 'エラー情報なし'
+            st.error(f"❌ FFmpegでの音声抽出に失敗しました。")
+            st.error(f"**FFmpegエラー詳細**:\n```\n{stderr_output}\n```")
             return None
-        except Exception as e:
-            # 一時ファイルのクリーンアップ
-            if os.path.exists(tmp_audio_path):
-                os.unlink(tmp_audio_path)
-            raise e
+        
+        # 音声データの検証
+        status_text.text("⏳ ステップ 2/3: 音声データを検証中...")
+        progress_bar.progress(40)
+        
+        audio_size = len(pcm_bytes)
+        audio_seconds = audio_size / (WHISPER_SAMPLE_RATE * 2)
+        st.info(f"🔍 抽出された音声: {audio_size:,} bytes（{audio_seconds:.1f}秒）")
+        
+        if audio_size < 1000:  # 1KB未満
+            progress_bar.empty()
+            status_text.empty()
+            st.error("❌ 抽出された音声データが小さすぎます。音声が含まれていない可能性があります。")
+            st.info(f"💡 音声データサイズ: {audio_size} bytes（最低1,000 bytes必要）")
+            return None
+        
+        # 🚀 キャッシュ確認: 同じ音声・モデル・設定なら保存済みの結果を返す
+        cache_key = get_transcription_cache_key(
+            compute_pcm_hash(pcm_bytes),
+            model_name,
+            {**WHISPER_DECODE_OPTIONS, 'mode': 'chunked' if use_parallel else 'single', 'backend': backend, 'vad': vad}
+        )
+        cached_result = load_cached_transcription(cache_key)
+        
+        # Whisperで文字起こし実行
+        progress_bar.progress(50)
+        status_text.text("⏳ ステップ 3/3: Whisperで音声認識中（これには数分かかります）...")
+        
+        import time
+        start_time = time.time()
+        
+        try:
+            if cached_result is not None:
+                result = cached_result
+                progress_bar.progress(100)
+                status_text.text("✅ キャッシュから文字起こし結果を読み込みました（音声認識をスキップ）")
+            else:
+                audio = pcm_to_float32(pcm_bytes)
+                del pcm_bytes  # float32配列に変換したら元のバイト列は不要
+                
+                # 🔇 VAD: 発話区間だけを連結してWhisperに渡す（無音・BGMのみの区間をスキップ）
+                region_map = None
+                if vad:
+                    total_seconds = len(audio) / WHISPER_SAMPLE_RATE
+                    regions = detect_speech_regions(audio)
+                    if regions:
+                        audio, region_map = compact_speech_audio(audio, regions)
+                        st.info(format_vad_stats(len(audio) / WHISPER_SAMPLE_RATE, total_seconds))
+                    else:
+                        st.warning("⚠️ 発話区間が検出されなかったため、音声全体を文字起こしします。")
+                
+                if use_parallel:
+                    def update_chunk_progress(completed: int, total: int):
+                        progress_bar.progress(50 + int(completed / total * 50))
+                        status_text.text(f"⏳ ステップ 3/3: 並列音声認識中... （{completed}/{total}チャンク完了）")
+                    
+                    result = transcribe_audio_parallel(
+                        audio,
+                        model_name,
+                        WHISPER_DECODE_OPTIONS,
+                        progress_callback=update_chunk_progress,
+                        backend=backend
+                    )
+                    
+                    elapsed_time = time.time() - start_time
+                    progress_bar.progress(100)
+                    status_text.text(f"✅ 並列音声認識完了！（処理時間: {elapsed_time:.1f}秒）")
+                else:
+                    if model is None:
+                        model = load_whisper_model(model_name, backend)
+                    result = workers.run_asr(model, audio, WHISPER_DECODE_OPTIONS, verbose=False)
+                    
+                    elapsed_time = time.time() - start_time
+                    progress_bar.progress(100)
+                    status_text.text(f"✅ 音声認識完了！（処理時間: {elapsed_time:.1f}秒）")
+                
+                # 連結音声上の時刻を元動画のタイムラインに戻す
+                if region_map:
+                    result['segments'] = remap_segments_to_original(result['segments'], region_map)
+            
+        except Exception as whisper_error:
+            progress_bar.empty()
+            status_text.empty()
+            elapsed_time = time.time() - start_time
+            st.error(f"❌ Whisperでの音声認識に失敗しました（{elapsed_time:.1f}秒後）: {whisper_error}")
+            raise whisper_error
         
         # 結果の検証
         if not result or 'segments' not in result:
@@ -670,6 +1419,9 @@ def transcribe_video(video_path: str, model) -> Optional[Dict]:
             st.info("💡 考えられる原因:\n- 音声が小さすぎる\n- 背景ノイズが多い\n- 言語が日本語ではない")
             return None
         
+        if cached_result is None:
+            save_transcription_to_cache(cache_key, result)
+        
         st.success(f"✅ 文字起こし完了！ {len(result['segments'])}個のセグメントを検出しました。")
         return result
         
@@ -713,127 +1465,545 @@ def transcribe_video(video_path: str, model) -> Optional[Dict]:
         return None
 
 
-def extract_text_from_video_frames(video_path: str, use_easyocr: bool = True) -> List[Dict]:
-    """動画フレームからOCRでテキストを抽出（高速版）
-    
-    Args:
-        video_path: 動画ファイルのパス
-        use_easyocr: EasyOCRを使用する（日本語対応が良い）
-        
-    Returns:
-        抽出されたテキストとタイムスタンプのリスト
-        [{"text": "抽出テキスト", "timestamp": 10.5, "confidence": 0.95}, ...]
+def extract_audio_for_transcription(video_path: str) -> Tuple[np.ndarray, str]:
+    """動画から16kHzモノラル音声をメモリ上に抽出し、(float32音声, PCMハッシュ) を返す
+
+    Raises:
+        ffmpeg.Error: 音声抽出に失敗した場合
+    """
+    pcm_bytes = extract_audio_pcm(video_path)
+    return pcm_to_float32(pcm_bytes), compute_pcm_hash(pcm_bytes)
+
+
+def iter_transcription_windows(
+    audio: np.ndarray,
+    model,
+    decode_options: Dict,
+    window_seconds: float = STREAMING_WINDOW_SECONDS
+) -> Iterator[Tuple[List[Dict], float]]:
+    """音声を無音区間で区切ったウィンドウごとに文字起こしし、完了した順にセグメントを返す
+
+    Yields:
+        (元音声の時刻に補正したセグメント, 処理済みの音声長（秒）)
+    """
+    split_points = find_silence_split_points(audio, chunk_seconds=window_seconds, search_seconds=min(5.0, window_seconds / 4))
+    boundaries = [0] + split_points + [len(audio)]
+
+    for window_start, window_end in zip(boundaries[:-1], boundaries[1:]):
+        result = workers.run_asr(model, audio[window_start:window_end], decode_options)
+        offset = window_start / WHISPER_SAMPLE_RATE
+        yield workers.shift_segments(result.get('segments', []), offset), window_end / WHISPER_SAMPLE_RATE
+
+
+def _run_streaming_transcription(
+    job: Dict,
+    audio: np.ndarray,
+    model,
+    collection,
+    cache_key: str,
+    region_map: Optional[List[Tuple[float, float, float]]] = None,
+    embedding_model=None,
+    library_collection=None,
+    video: Optional[Dict] = None
+) -> None:
+    """バックグラウンドスレッドで文字起こしを進め、ウィンドウごとにChromaDBへ追記
+
+    Streamlitのスクリプト実行コンテキスト外で動くため、st.* は呼ばずに job の状態だけを更新する。
+    region_map が指定された場合、audio はVADで発話区間を連結した音声として扱い、時刻を元に戻す。
+    library_collection が指定された場合、ライブラリのコレクションにも同じセグメントを書き込む。
+    処理中はセグメント単位で追記し、job['search_unit'] がウィンドウ単位なら完了時にシーンのウィンドウへ置き換える。
     """
+    transcription = job['transcription']
+    indexed_documents = []
+    indexed_ids = []
+    library_ids = []
+    model_name = get_embedding_model_name(embedding_model)
+    embedding_cache = load_embedding_cache(job['collection_name'], model_name) if embedding_model is not None else None
     try:
-        import cv2
+        for window_segments, processed_seconds in iter_transcription_windows(audio, model, WHISPER_DECODE_OPTIONS):
+            if region_map:
+                window_segments = remap_segments_to_original(window_segments, region_map)
+                processed_seconds = map_compact_time(processed_seconds, region_map, is_end=True)
+            with job['lock']:
+                start_index = len(transcription['segments'])
+                for segment in window_segments:
+                    segment['id'] = len(transcription['segments'])
+                    transcription['segments'].append(segment)
+
+                documents, metadatas, ids = build_segment_documents(window_segments, start_index)
+                if documents:
+                    upsert_segment_documents(collection, documents, metadatas, ids, embedding_model, embedding_cache)
+                    sync_lexical_index(job['collection_name'], documents, ids, remove_stale=False, save=False)
+                    if library_collection is not None:
+                        window_library_ids = upsert_library_documents(
+                            library_collection, video, documents, metadatas, ids, embedding_model, embedding_cache
+                        )
+                        sync_lexical_index(LIBRARY_COLLECTION_NAME, documents, window_library_ids, remove_stale=False, save=False)
+                        library_ids.extend(window_library_ids)
+                    invalidate_query_cache(job['collection_name'])
+                    invalidate_query_cache(LIBRARY_COLLECTION_NAME)
+                    job['indexed_count'] += len(documents)
+                    indexed_documents.extend(documents)
+                    indexed_ids.extend(ids)
+                job['processed_seconds'] = processed_seconds
+
+        if job['search_unit'] == SEARCH_UNIT_WINDOW:
+            # 全セグメントがそろったので、ウィンドウをまたぐシーンもまとめて登録し直す
+            with job['lock']:
+                segments = list(transcription['segments'])
+            indexed_documents, metadatas, indexed_ids = build_index_documents(
+                segments, SEARCH_UNIT_WINDOW, job['window_seconds'], job['stride_seconds']
+            )
+            upsert_segment_documents(collection, indexed_documents, metadatas, indexed_ids, embedding_model, embedding_cache)
+            if library_collection is not None:
+                library_ids = upsert_library_documents(
+                    library_collection, video, indexed_documents, metadatas, indexed_ids, embedding_model, embedding_cache
+                )
+
+        # 以前のインデックスに残っていて今回の結果にないドキュメントを削除
+        delete_stale_segment_documents(collection, indexed_ids)
+        sync_lexical_index(job['collection_name'], indexed_documents, indexed_ids)
+        if library_collection is not None:
+            delete_stale_segment_documents(library_collection, library_ids, where={'video_id': video['video_id']})
+            sync_lexical_index(LIBRARY_COLLECTION_NAME, indexed_documents, library_ids, scope_prefix=f"{video['video_id']}:")
+            invalidate_query_cache(LIBRARY_COLLECTION_NAME)
+        invalidate_query_cache(job['collection_name'])
+        if embedding_cache is not None:
+            save_embedding_cache(job['collection_name'], model_name, embedding_cache, indexed_ids)
+        with job['lock']:
+            transcription['text'] = ''.join(segment['text'] for segment in transcription['segments'])
+            job['status'] = 'done'
+        if transcription['segments']:
+            save_transcription_to_cache(cache_key, transcription)
+    except Exception as e:
+        with job['lock']:
+            job['error'] = f"{type(e).__name__}: {e}"
+            job['status'] = 'error'
+
+
+def start_streaming_transcription(
+    video_path: str,
+    model,
+    model_name: str,
+    video_name: str,
+    client: chromadb.Client,
+    backend: str = workers.ASR_BACKEND_OPENAI_WHISPER,
+    vad: bool = True,
+    search_unit: str = SEARCH_UNIT_WINDOW,
+    window_seconds: float = SCENE_WINDOW_SECONDS,
+    stride_seconds: float = SCENE_WINDOW_STRIDE_SECONDS
+) -> Optional[Dict]:
+    """ストリーミング文字起こしを開始（ウィンドウ完了ごとにセグメントを検索可能にする）
+
+    キャッシュにヒットした場合は通常どおり一括でインデックス化し、完了済みのジョブを返す。
+
+    Returns:
+        ジョブ状態のdict（'transcription', 'collection_name', 'status' などを含む）
+    """
+    import threading
+
+    if client is None:
+        st.error("❌ ChromaDBクライアントが初期化されていません。ページをリロードしてください。")
+        return None
+
+    duration = get_video_duration(video_path)
+    if duration < 0.5:
+        st.error(f"❌ 動画が短すぎます（{duration:.2f}秒）。最低0.5秒以上の動画が必要です。")
+        return None
+    if not check_video_has_audio(video_path):
+        st.error("❌ この動画には音声トラックがありません。")
+        return None
+    if not check_audio_memory_budget(duration):
+        return None
+
+    try:
+        with st.spinner("⏳ FFmpegで音声を抽出中..."):
+            audio, audio_hash = extract_audio_for_transcription(video_path)
+    except ffmpeg.Error as e:
+        stderr_output = e.stderr.decode('utf-8') if e.stderr else 'エラー情報なし'
+        st.error(f"❌ FFmpegでの音声抽出に失敗しました。")
+        st.error(f"**FFmpegエラー詳細**:\n```\n{stderr_output}\n```")
+        return None
+
+    cache_key = get_transcription_cache_key(
+        audio_hash,
+        model_name,
+        {**WHISPER_DECODE_OPTIONS, 'mode': 'streaming', 'backend': backend, 'vad': vad}
+    )
+    job = {
+        'status': 'running',  # running / done / error
+        'transcription': {'text': '', 'segments': [], 'language': WHISPER_DECODE_OPTIONS['language']},
+        'collection_name': get_video_collection_name(video_name),
+        'processed_seconds': 0.0,
+        'total_seconds': len(audio) / WHISPER_SAMPLE_RATE,
+        'indexed_count': 0,
+        'vad_stats': None,
+        'search_unit': search_unit,
+        'window_seconds': window_seconds,
+        'stride_seconds': stride_seconds,
+        'error': None,
+        'lock': threading.Lock(),
+    }
+
+    cached_result = load_cached_transcription(cache_key)
+    if cached_result is not None:
+        st.success("✅ キャッシュから文字起こし結果を読み込みました")
+        job['transcription'] = cached_result
+        job['collection_name'] = index_transcription_to_chromadb(
+            cached_result, video_name, client, video_path, search_unit, window_seconds, stride_seconds
+        )
+        job['processed_seconds'] = job['total_seconds']
+        job['status'] = 'done'
+        return job
+
+    # 既存のコレクションに、ウィンドウごとに差分を書き込む（同じ内容のセグメントは再利用）
+    # バックグラウンドスレッドから st.cache_resource を呼ばないよう、埋め込みモデルはここでロードして渡す
+    try:
+        embedding_model = load_embedding_model()
+        collection = get_segment_collection(client, job['collection_name'], embedding_model)
+        library_collection = get_segment_collection(client, LIBRARY_COLLECTION_NAME, embedding_model)
+    except Exception as e:
+        st.error(f"❌ インデックスの準備に失敗しました: {e}")
+        return None
+
+    # 🔇 VAD: 発話区間だけを連結して文字起こしする
+    region_map = None
+    if vad:
+        regions = detect_speech_regions(audio)
+        if regions:
+            audio, region_map = compact_speech_audio(audio, regions)
+            job['vad_stats'] = format_vad_stats(len(audio) / WHISPER_SAMPLE_RATE, job['total_seconds'])
+
+    thread = threading.Thread(
+        target=_run_streaming_transcription,
+        args=(
+            job, audio, model, collection, cache_key, region_map, embedding_model,
+            library_collection, get_library_video(video_name, video_path)
+        ),
+        daemon=True
+    )
+    thread.start()
+    return job
+
+
+def iter_sampled_frames(video_path: str, timestamps: List[float]) -> Iterator[Tuple[float, np.ndarray]]:
+    """指定した時刻のフレームだけをデコードして返す
+
+    サンプル間隔が離れている場合はフレーム位置へシークし（直前のキーフレームからのみデコード）、
+    間隔が近い場合やシークできないコンテナでは grab() で読み進める（色変換を伴う retrieve() は対象フレームのみ）。
+
+    Yields:
+        (時刻（秒）, BGRフレーム)
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return
+
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        seek_gap_frames = int(fps * OCR_SEEK_MIN_GAP_SECONDS)
+        seekable = True
+        current_frame = 0  # 次に grab() で得られるフレーム番号
+
+        for timestamp in sorted(timestamps):
+            target_frame = int(round(timestamp * fps))
+            if target_frame < current_frame:
+                continue
+
+            if seekable and target_frame - current_frame > seek_gap_frames:
+                seekable = cap.set(cv2.CAP_PROP_POS_FRAMES, target_frame)
+                if seekable:
+                    current_frame = target_frame
+
+            # 対象フレームまで読み進める（デコードのみで画像変換はしない）
+            grabbed = True
+            while current_frame < target_frame and grabbed:
+                grabbed = cap.grab()
+                current_frame += 1
+            if not grabbed or not cap.grab():
+                break
+            current_frame += 1
+
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            yield target_frame / fps, frame
+    finally:
+        cap.release()
+
+
+@st.cache_resource
+def load_easyocr_reader():
+    """EasyOCRのリーダーをロード（キャッシュ付き・プロセス内で共有）
+
+    検出・認識モデルの重みは初回のみ読み込み、以降のOCR処理では同じリーダーを使い回す。
+    """
+    try:
+        st.info("🔄 EasyOCR (日本語対応) を初期化中...")
+        reader = workers.create_easyocr_reader()
+        st.success("✅ EasyOCR初期化完了")
+        return reader
+    except Exception as e:
+        st.warning(f"EasyOCRの初期化に失敗: {e}")
+        return None
+
+
+@st.cache_resource
+def get_ocr_worker_pool(use_easyocr: bool, num_workers: int):
+    """OCRワーカープロセスのプールを起動（キャッシュ付き・OCRの呼び出し間で共有）
+
+    各ワーカーはEasyOCRのリーダーをプロセスごとに1回だけロードし、以降のOCRでも同じプロセスを使い回す。
+    起動に失敗した場合の例外はキャッシュされないため、次回の呼び出しで再度起動を試みる。
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    executor = ProcessPoolExecutor(
+        max_workers=num_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=workers.init_ocr_worker,
+        initargs=(use_easyocr, max(1, (os.cpu_count() or 1) // num_workers))
+    )
+    try:
+        # 初期化の失敗（モデルのロードエラーなど）をここで検出する
+        executor.submit(workers.ocr_frames_in_worker, [], OCR_CROP_TEXT_REGIONS, OCR_MIN_CONFIDENCE).result()
+    except Exception:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    return executor
+
+
+def detect_scene_changes(video_path: str, threshold: float = OCR_SCENE_THRESHOLD) -> List[float]:
+    """FFmpegのシーン変化検出（select='gt(scene,N)'）でカットの時刻を取得
+
+    縮小した映像でスコアを計算し、showinfoフィルターのログから該当フレームの時刻を読み取る。
+
+    Raises:
+        ffmpeg.Error: FFmpegの実行に失敗した場合
+    """
+    _, stderr = (
+        ffmpeg
+        .input(video_path)
+        .video
+        .filter('scale', 160, -2)
+        .filter('select', f'gt(scene,{threshold})')
+        .filter('showinfo')
+        .output('-', format='null')
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    scene_times = re.findall(r'pts_time:\s*([0-9.]+)', stderr.decode('utf-8', errors='ignore'))
+    return sorted(float(t) for t in scene_times)
+
+
+def build_ocr_sample_times(scene_times: List[float], duration: float, max_gap: float) -> List[float]:
+    """シーンのカット時刻と最大間隔からOCRのサンプリング時刻を決める
+
+    カットが長時間ない区間では、max_gap 秒ごとに補完のサンプルを入れる。
+    """
+    anchors = [0.0] + [min(t + OCR_SCENE_SETTLE_SECONDS, duration) for t in scene_times if 0.0 < t < duration]
+    anchors.append(duration)
+
+    sample_times = []
+    for start, end in zip(anchors[:-1], anchors[1:]):
+        t = start
+        while t < end:
+            sample_times.append(t)
+            t += max_gap
+    return sample_times
+
+
+def compute_dhash(gray: np.ndarray, hash_size: int = 8) -> int:
+    """グレースケール画像の差分ハッシュ（dHash）を計算（知覚的に同じフレームは近い値になる）"""
+    import cv2
+
+    resized = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    diff = resized[:, 1:] > resized[:, :-1]
+    return int(np.packbits(diff.flatten()).tobytes().hex(), 16)
+
+
+def extract_text_from_video_frames(
+    video_path: str,
+    use_easyocr: bool = True,
+    sample_interval: float = OCR_SAMPLE_INTERVAL_SECONDS,
+    scene_detection: bool = True,
+    crop_text_regions: bool = OCR_CROP_TEXT_REGIONS
+) -> List[Dict]:
+    """動画フレームからOCRでテキストを抽出（高速版）
+    
+    Args:
+        video_path: 動画ファイルのパス
+        use_easyocr: EasyOCRを使用する（日本語対応が良い）
+        sample_interval: フレームのサンプリング間隔（秒）。scene_detection=True の場合はカットがない区間の最大間隔
+        scene_detection: シーンの切り替わりに合わせてフレームを選ぶ
+        crop_text_regions: MSERで検出したテキスト領域だけを認識する（False の場合はフレーム全体）
+        
+    Returns:
+        抽出されたテキストとタイムスタンプのリスト
+        [{"text": "抽出テキスト", "timestamp": 10.5, "confidence": 0.95}, ...]
+    """
+    try:
+        import cv2
         import numpy as np
         
+        import importlib.util
+        import threading
+        from concurrent.futures.process import BrokenProcessPool
+        
+        num_workers = max(1, OCR_PARALLEL_WORKERS)
+        
         # EasyOCRまたはTesseractを選択
-        if use_easyocr:
-            try:
-                import easyocr
-                st.info("🔄 EasyOCR (日本語対応) を初期化中...")
-                reader = easyocr.Reader(['ja', 'en'], gpu=False)
-                st.success("✅ EasyOCR初期化完了")
-            except Exception as e:
-                st.warning(f"EasyOCRの初期化に失敗: {e}")
-                st.info("Tesseractにフォールバック...")
-                use_easyocr = False
+        if use_easyocr and importlib.util.find_spec('easyocr') is None:
+            st.warning("EasyOCRがインストールされていません")
+            st.info("Tesseractにフォールバック...")
+            use_easyocr = False
         
         if not use_easyocr:
             try:
                 import pytesseract
-                # Tesseractの設定（日本語対応）
-                tesseract_config = '--oem 3 --psm 6 -l jpn+eng'
             except Exception as e:
                 st.error(f"OCRライブラリが利用できません: {e}")
                 return []
         
-        # 動画を開く
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
+        # 🚀 高速化: OCRワーカープロセスのプールを使う（初回だけ起動し、各プロセスがリーダーを1回だけロード）
+        executor = None
+        pool_broken = False  # ワーカープロセスが落ちた場合は、次回のOCRで新しいプールを起動する
+        if num_workers > 1:
+            try:
+                with st.spinner(f"⚡ OCRワーカー（{num_workers}プロセス）を準備中..."):
+                    executor = get_ocr_worker_pool(use_easyocr, num_workers)
+            except Exception as e:
+                st.warning(f"並列OCRの起動に失敗したため、このプロセスで処理します: {e}")
+                executor = None
+        
+        reader = None
+        if executor is None and use_easyocr:
+            reader = load_easyocr_reader()
+            if reader is None:
+                st.info("Tesseractにフォールバック...")
+                use_easyocr = False
+        
+        # 動画情報を取得（文字起こしで取得済みのMediaInfoを再利用）
+        try:
+            media_info = get_media_info(video_path)
+        except Exception:
             st.error("動画を開けませんでした")
             return []
-        
-        # 動画情報を取得
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = total_frames / fps if fps > 0 else 0
+        fps = media_info.fps
+        total_frames = media_info.frame_count
+        duration = media_info.duration
         
         st.info(f"📹 動画情報: {duration:.1f}秒, {fps:.1f}fps, {total_frames}フレーム")
         
-        # 🚀 高速化: サンプリング間隔を5秒に変更（従来の5倍高速）
-        sample_interval = max(1, int(fps * 5))  # 5秒ごと
+        # EasyOCRは複数フレームをまとめて推論する。並列時はワーカー間で負荷が偏らないようバッチを小さくする
+        batch_size = max(1, OCR_BATCH_SIZE) if use_easyocr else 1
+        
+        # 🚀 高速化: サンプリング時刻のフレームだけをデコードする（全フレームを読まない）
+        sample_interval = max(0.1, sample_interval)
+        timestamps = None
+        if scene_detection:
+            try:
+                with st.spinner("🎬 シーンの切り替わりを検出中..."):
+                    scene_times = detect_scene_changes(video_path)
+                timestamps = build_ocr_sample_times(scene_times, duration, sample_interval)
+                st.info(f"🎬 {len(scene_times)}箇所のシーン切り替わりを検出（OCR対象: {len(timestamps)}フレーム）")
+            except ffmpeg.Error as e:
+                st.warning("⚠️ シーン切り替わりの検出に失敗したため、一定間隔でサンプリングします。")
+        if timestamps is None:
+            timestamps = list(np.arange(0.0, duration, sample_interval))
+        if executor is not None:
+            batch_size = max(1, min(batch_size, len(timestamps) // (num_workers * 2)))
         
         ocr_results = []
         progress_bar = st.progress(0)
         status_text = st.empty()
         
-        frame_count = 0
         processed_count = 0
-        last_text = ""  # 重複テキストを避ける
+        skipped_count = 0
+        failed_count = 0  # OCRに失敗したフレーム数
+        last_ocr_hash = None  # 直前にOCRしたフレームのdHash
+        pending_frames = []  # OCR待ちのフレーム [(時刻, グレースケール画像), ...]
+        futures = []
+        # デコードがOCRより先行してフレームがメモリにたまらないよう、処理中のバッチ数を制限
+        in_flight = threading.BoundedSemaphore(num_workers * 2)
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+        def submit_ocr_batch(frames: List[Tuple[float, np.ndarray]]) -> None:
+            nonlocal failed_count, pool_broken
+            if not frames:
+                return
+            if executor is None:
+                # バッチが失敗した場合は1フレームずつやり直す
+                batch_results, batch_failed = workers.ocr_frame_batch_with_retry(frames, reader, crop_text_regions, OCR_MIN_CONFIDENCE)
+                ocr_results.extend(batch_results)
+                failed_count += batch_failed
+                return
+            in_flight.acquire()
+            try:
+                future = executor.submit(workers.ocr_frames_in_worker, frames, crop_text_regions, OCR_MIN_CONFIDENCE)
+            except BrokenProcessPool as e:
+                in_flight.release()
+                pool_broken = True
+                print(f"OCRワーカーの処理に失敗: {e}")
+                failed_count += len(frames)
+                return
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append((future, len(frames)))
+        
+        for timestamp, frame in iter_sampled_frames(video_path, timestamps):
+            # 進捗表示
+            progress = min(100, int((timestamp / duration) * 100)) if duration > 0 else 0
+            progress_bar.progress(progress)
+            status_text.text(f"🔍 OCR処理中... {timestamp:.1f}秒 / {duration:.1f}秒")
             
-            # サンプリング間隔ごとに処理
-            if frame_count % sample_interval == 0:
-                timestamp = frame_count / fps
-                
-                # 進捗表示
-                progress = int((frame_count / total_frames) * 100)
-                progress_bar.progress(progress)
-                status_text.text(f"🔍 OCR処理中... {timestamp:.1f}秒 / {duration:.1f}秒")
-                
-                # 🚀 高速化: シンプルなグレースケール変換のみ（前処理を最小化）
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                
-                # OCR実行
+            # 🚀 高速化: シンプルなグレースケール変換のみ（前処理を最小化）
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            
+            # 🚀 高速化: 直前にOCRしたフレームと見た目が同じならOCRしない（同じスライド・テロップの再読み取りを防ぐ）
+            frame_hash = compute_dhash(gray)
+            if last_ocr_hash is not None and bin(frame_hash ^ last_ocr_hash).count('1') <= OCR_DHASH_MAX_DISTANCE:
+                skipped_count += 1
+                continue
+            last_ocr_hash = frame_hash
+            
+            pending_frames.append((timestamp, gray))
+            processed_count += 1
+            
+            # OCR実行（バッチがたまったらまとめて推論）
+            if len(pending_frames) >= batch_size:
+                submit_ocr_batch(pending_frames)
+                pending_frames = []
+        
+        # 残りのフレームを処理し、ワーカーの結果を回収
+        submit_ocr_batch(pending_frames)
+        if executor is not None:
+            status_text.text("🔍 OCRワーカーの処理完了を待っています...")
+            for future, frame_count in futures:
                 try:
-                    if use_easyocr:
-                        # EasyOCRで読み取り
-                        results = reader.readtext(gray)
-                        for (bbox, text, confidence) in results:
-                            # 🚀 高速化: 信頼度閾値を0.6に上げて処理削減
-                            if confidence > 0.6 and text.strip() and len(text.strip()) > 1:
-                                # 重複チェック（前後3件と比較）
-                                is_duplicate = False
-                                for recent in ocr_results[-3:]:
-                                    if recent['text'] == text.strip():
-                                        is_duplicate = True
-                                        break
-                                
-                                if not is_duplicate:
-                                    ocr_results.append({
-                                        "text": text.strip(),
-                                        "timestamp": timestamp,
-                                        "confidence": confidence
-                                    })
-                    else:
-                        # Tesseractで読み取り
-                        text = pytesseract.image_to_string(gray, config=tesseract_config)
-                        text = text.strip()
-                        if text and len(text) > 1 and text != last_text:
-                            ocr_results.append({
-                                "text": text,
-                                "timestamp": timestamp,
-                                "confidence": 0.8  # Tesseractは信頼度を返さない
-                            })
-                            last_text = text
+                    batch_results, batch_failed = future.result()
+                    ocr_results.extend(batch_results)
+                    failed_count += batch_failed
                 except Exception as e:
-                    # OCRエラーはスキップ
-                    pass
-                
-                processed_count += 1
-            
-            frame_count += 1
+                    # ワーカープロセス自体が落ちた場合はバッチ全体が失敗
+                    print(f"OCRワーカーの処理に失敗: {e}")
+                    failed_count += frame_count
+                    pool_broken = pool_broken or isinstance(e, BrokenProcessPool)
+            # プールは次回のOCRでも使い回す（壊れた場合だけ捨てる）
+            if pool_broken:
+                get_ocr_worker_pool.clear()
+                executor.shutdown(wait=False, cancel_futures=True)
+        
+        # ワーカーの完了順によらず時刻順に並べる
+        ocr_results.sort(key=lambda result: result['timestamp'])
         
-        cap.release()
         progress_bar.empty()
         status_text.empty()
         
+        if skipped_count > 0:
+            st.info(f"⏭️ 直前と同じ画面の{skipped_count}フレームはOCRをスキップしました（OCR実行: {processed_count}フレーム）")
+        if failed_count > 0:
+            st.warning(f"⚠️ {failed_count}フレームはOCRに失敗したため、その時刻のテキストは含まれていません")
+        
         # 結果をまとめる
         if ocr_results:
             st.success(f"✅ OCR完了: {len(ocr_results)}個のテキストを抽出しました")
@@ -851,72 +2021,78 @@ def extract_text_from_video_frames(video_path: str, use_easyocr: bool = True) ->
         return []
 
 
-def combine_transcription_and_ocr(transcription: Dict, ocr_results: List[Dict]) -> Dict:
+def combine_transcription_and_ocr(transcription: Dict, ocr_results: List[Dict], max_gap: float = 3.0) -> Dict:
     """音声文字起こしとOCRテキストを統合
     
+    セグメントの開始時刻のソート済みリストを二分探索してOCRの時刻に近いセグメントを探し、
+    最後に音声セグメントとOCRだけのセグメントを1回の線形マージで時刻順に並べる。
+    呼び出し元の文字起こし結果（セグメントのdict）は変更しない。
+    
     Args:
         transcription: Whisperの文字起こし結果
         ocr_results: OCRで抽出したテキスト
+        max_gap: これより離れたOCRテキストは新しいセグメントとして追加（秒）
         
     Returns:
         統合された文字起こしデータ
     """
+    import bisect
+    import heapq
+    
     if not ocr_results:
         return transcription
     
     try:
-        # 元のセグメントをコピー
-        combined = transcription.copy()
-        segments = combined.get('segments', [])
+        # 元のセグメントを変更しないようにコピー
+        segments = sorted(
+            (dict(segment, ocr_text=list(segment['ocr_text'])) if 'ocr_text' in segment else dict(segment)
+             for segment in transcription.get('segments', [])),
+            key=lambda x: x['start']
+        )
+        segment_starts = [segment['start'] for segment in segments]
+        ocr_segments = []  # OCRテキストだけのセグメント（時刻順に作られる）
         
-        # OCRテキストを近い時刻のセグメントに追加
-        for ocr_item in ocr_results:
+        def distance_to(segment: Dict, t: float) -> float:
+            """時刻からセグメントまでの距離（セグメント内なら0）"""
+            if t < segment['start']:
+                return segment['start'] - t
+            return max(0.0, t - segment['end'])
+        
+        # OCRテキストを時刻順に、近い時刻のセグメントに追加
+        for ocr_item in sorted(ocr_results, key=lambda x: x['timestamp']):
             ocr_text = ocr_item['text']
             ocr_time = ocr_item['timestamp']
             
-            # 最も近いセグメントを見つける
-            closest_segment = None
-            min_time_diff = float('inf')
+            # 開始時刻が直前・直後のセグメントと、直前に作ったOCRセグメントが候補
+            index = bisect.bisect_right(segment_starts, ocr_time)
+            candidates = segments[max(0, index - 1):index + 1]
+            if ocr_segments:
+                candidates.append(ocr_segments[-1])
             
-            for segment in segments:
-                seg_start = segment['start']
-                seg_end = segment['end']
-                
-                # セグメント内または近接している場合
-                if seg_start <= ocr_time <= seg_end:
-                    closest_segment = segment
-                    break
-                
-                # 時間差を計算
-                time_diff = min(abs(ocr_time - seg_start), abs(ocr_time - seg_end))
-                if time_diff < min_time_diff:
-                    min_time_diff = time_diff
-                    closest_segment = segment
+            closest_segment = min(candidates, key=lambda segment: distance_to(segment, ocr_time), default=None)
             
             # 3秒以内のセグメントに追加
-            if closest_segment and min_time_diff < 3.0:
+            if closest_segment is not None and distance_to(closest_segment, ocr_time) < max_gap:
                 # OCRテキストを追加（重複チェック）
-                if 'ocr_text' not in closest_segment:
-                    closest_segment['ocr_text'] = []
+                closest_segment.setdefault('ocr_text', [])
                 if ocr_text not in closest_segment['ocr_text']:
                     closest_segment['ocr_text'].append(ocr_text)
             else:
                 # 新しいセグメントとして追加
-                new_segment = {
+                ocr_segments.append({
                     'start': ocr_time,
                     'end': ocr_time + 1.0,
                     'text': '',  # 音声テキストは空
                     'ocr_text': [ocr_text]
-                }
-                segments.append(new_segment)
+                })
         
-        # セグメントを時刻順にソート
-        segments.sort(key=lambda x: x['start'])
-        combined['segments'] = segments
+        # 音声セグメントとOCRセグメントを時刻順にマージ（どちらもソート済み）
+        combined = dict(transcription)
+        combined['segments'] = list(heapq.merge(segments, ocr_segments, key=lambda x: x['start']))
         
         # 全テキストを更新（音声 + OCR）
         all_texts = []
-        for segment in segments:
+        for segment in combined['segments']:
             if segment.get('text'):
                 all_texts.append(segment['text'])
             if segment.get('ocr_text'):
@@ -931,26 +2107,768 @@ def combine_transcription_and_ocr(transcription: Dict, ocr_results: List[Dict])
         return transcription
 
 
-def setup_chromadb() -> chromadb.Client:
-    """ChromaDBクライアントをセットアップ"""
-    try:
-        # ディレクトリが存在しない場合は作成
-        CHROMADB_DIR.mkdir(parents=True, exist_ok=True)
-        
-        client = chromadb.Client(Settings(
-            persist_directory=str(CHROMADB_DIR),
-            anonymized_telemetry=False
+@st.cache_resource
+def setup_chromadb() -> chromadb.Client:
+    """ChromaDBクライアントをセットアップ（ディスクに永続化し、プロセス内で共有）
+
+    ページを再読み込みしてもインデックス済みのコレクションが残る。
+    """
+    try:
+        # ディレクトリが存在しない場合は作成
+        CHROMADB_DIR.mkdir(parents=True, exist_ok=True)
+        
+        client = chromadb.PersistentClient(
+            path=str(CHROMADB_DIR),
+            settings=Settings(anonymized_telemetry=False)
+        )
+        return client
+    except Exception as e:
+        import traceback
+        error_detail = traceback.format_exc()
+        st.error(f"❌ ChromaDBのセットアップに失敗しました: {str(e)}\n\n詳細:\n```\n{error_detail}\n```")
+        return None
+
+
+@st.cache_resource
+def load_embedding_model():
+    """検索用の埋め込みモデルをロード（キャッシュ付き・プロセス内で共有）
+
+    sentence-transformers がインストールされていない場合はNoneを返し、ChromaDB標準の埋め込みを使う。
+    インストールされているのにロードできない場合（初回ダウンロードのネットワークエラーなど）は
+    標準の埋め込みに切り替えず例外を送出する。切り替えると、既存のコレクションがモデル変更とみなされて
+    作り直されてしまうため。例外はキャッシュされないので、次の呼び出しで再度ロードを試みる。
+
+    Raises:
+        RuntimeError: モデルのロードに失敗した場合
+    """
+    try:
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        st.warning("⚠️ sentence-transformers がインストールされていないため、ChromaDB標準の埋め込みを使用します。")
+        return None
+    
+    try:
+        return SentenceTransformer(EMBEDDING_MODEL_NAME, device='cpu')
+    except Exception as e:
+        raise RuntimeError(f"埋め込みモデル（{EMBEDDING_MODEL_NAME}）のロードに失敗しました: {e}") from e
+
+
+def get_embedding_model_name(embedding_model) -> str:
+    """コレクションのメタデータに記録する埋め込みモデル名"""
+    return EMBEDDING_MODEL_NAME if embedding_model is not None else EMBEDDING_DEFAULT_NAME
+
+
+def embed_texts(texts: List[str], embedding_model, is_query: bool = False) -> np.ndarray:
+    """テキストをバッチに分けて埋め込み、L2正規化したベクトル（N×次元）を返す
+
+    E5系のモデルは検索クエリとドキュメントで異なる接頭辞を付ける。
+    """
+    if 'e5' in EMBEDDING_MODEL_NAME.lower():
+        prefix = "query: " if is_query else "passage: "
+        texts = [prefix + text for text in texts]
+    
+    embeddings = embedding_model.encode(
+        texts,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False
+    )
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+@functools.lru_cache(maxsize=EMBEDDING_QUERY_CACHE_SIZE)
+def embed_query(query: str, embedding_model) -> Tuple[float, ...]:
+    """検索クエリを埋め込む（同じクエリはモデルを実行せずに再利用）"""
+    return tuple(embed_texts([query], embedding_model, is_query=True)[0].tolist())
+
+
+def get_embedding_cache_path(collection_name: str, model_name: str) -> Path:
+    """コレクションのドキュメント埋め込みを保存するファイルのパス"""
+    import hashlib
+    model_hash = hashlib.sha1(model_name.encode('utf-8')).hexdigest()[:8]
+    return EMBEDDING_CACHE_DIR / f"{collection_name}_{model_hash}.npz"
+
+
+def load_embedding_cache(collection_name: str, model_name: str) -> Dict[str, np.ndarray]:
+    """保存済みのドキュメント埋め込みを {ID: ベクトル} として読み込む"""
+    cache_path = get_embedding_cache_path(collection_name, model_name)
+    if not cache_path.exists():
+        return {}
+    
+    try:
+        with np.load(cache_path) as data:
+            embedding_cache = dict(zip(data['ids'].tolist(), data['vectors']))
+        os.utime(cache_path, None)
+        return embedding_cache
+    except Exception as e:
+        print(f"埋め込みキャッシュの読み込みに失敗: {e}")
+        return {}
+
+
+def save_embedding_cache(collection_name: str, model_name: str, embedding_cache: Dict[str, np.ndarray], keep_ids: List[str]) -> None:
+    """現在のセグメントのドキュメント埋め込みを保存（文字起こしキャッシュと同じ容量上限で古い順に削除）"""
+    cache_path = get_embedding_cache_path(collection_name, model_name)
+    ids = [segment_key for segment_key in dict.fromkeys(keep_ids) if segment_key in embedding_cache]
+    if not ids:
+        return
+    
+    tmp_path = cache_path.with_suffix('.tmp.npz')
+    try:
+        np.savez(tmp_path, ids=np.array(ids), vectors=np.stack([embedding_cache[segment_key] for segment_key in ids]))
+        os.replace(tmp_path, cache_path)
+        evict_lru_cache(EMBEDDING_CACHE_DIR, TRANSCRIPT_CACHE_MAX_BYTES, pattern="*.npz")
+    except Exception as e:
+        print(f"埋め込みキャッシュの保存に失敗: {e}")
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def get_segment_collection(client: chromadb.Client, collection_name: str, embedding_model):
+    """セグメント用のコレクションを取得または作成
+
+    コレクションのメタデータに埋め込みモデル名を記録し、モデルが変わった場合は作り直す
+    （異なるモデルのベクトルは比較できないため）。モデルが変わるのは、ユーザーが EMBEDDING_MODEL を
+    変更したか sentence-transformers を導入・削除した場合だけで、ロードの失敗では embedding_model が
+    None にならない（load_embedding_model が例外を送出する）。
+    """
+    model_name = get_embedding_model_name(embedding_model)
+    collection = client.get_or_create_collection(
+        name=collection_name,
+        metadata={"hnsw:space": "cosine", "embedding_model": model_name}
+    )
+    if (collection.metadata or {}).get('embedding_model', EMBEDDING_DEFAULT_NAME) != model_name:
+        collection = rebuild_collection_embeddings(client, collection, embedding_model)
+    return collection
+
+
+def rebuild_collection_embeddings(client: chromadb.Client, collection, embedding_model):
+    """登録済みの文書を新しい埋め込みモデルで埋め込み直したコレクションに置き換える
+
+    ライブラリのように他の動画の文書も入っているコレクションを空にしないよう、
+    別名のコレクションに全文書を書き込んでから元のコレクションと入れ替える。
+    IDと文書は変わらないため、転置インデックスはそのまま使える。
+    """
+    collection_name = collection.name
+    rebuild_name = f"{collection_name}_rebuild"
+    metadata = {"hnsw:space": "cosine", "embedding_model": get_embedding_model_name(embedding_model)}
+
+    documents, metadatas, ids = [], [], []
+    for offset in range(0, collection.count(), CHROMA_UPSERT_BATCH_SIZE):
+        batch = collection.get(include=['documents', 'metadatas'], limit=CHROMA_UPSERT_BATCH_SIZE, offset=offset)
+        documents.extend(batch['documents'])
+        metadatas.extend(batch['metadatas'])
+        ids.extend(batch['ids'])
+
+    # 前回の作り直しが途中で終わっていた場合の残りを捨てる
+    try:
+        client.delete_collection(name=rebuild_name)
+    except Exception:
+        pass
+    rebuilt = client.create_collection(name=rebuild_name, metadata=metadata)
+    if ids:
+        upsert_segment_documents(rebuilt, documents, metadatas, ids, embedding_model)
+
+    client.delete_collection(name=collection_name)
+    rebuilt.modify(name=collection_name)
+    invalidate_query_cache(collection_name)
+    return client.get_collection(name=collection_name)
+
+
+def get_video_collection_name(video_name: str) -> str:
+    """動画名からChromaDBのコレクション名を生成"""
+    import hashlib
+    # 日本語・特殊文字を安全な文字列に変換（英数字とアンダースコアのみ）
+    # ファイル名のハッシュを生成（安全で一意な識別子）
+    name_hash = hashlib.md5(video_name.encode('utf-8')).hexdigest()[:8]
+    # 英数字のみ抽出（最大20文字）
+    safe_name = re.sub(r'[^a-zA-Z0-9]', '_', video_name)[:20]
+    return f"video_{safe_name}_{name_hash}"
+
+
+def build_segment_documents(segments: List[Dict], start_index: int = 0) -> Tuple[List[str], List[Dict], List[str]]:
+    """セグメントからChromaDB登録用のドキュメント・メタデータ・IDを作成
+
+    IDは時刻とテキストのハッシュなので、同じ内容のセグメントは再インデックス時も同じIDになる。
+
+    Args:
+        segments: 文字起こしセグメント
+        start_index: 先頭セグメントの通し番号（逐次追加時に使用）
+    """
+    import hashlib
+    
+    documents = []
+    metadatas = []
+    ids = []
+    seen_ids = set()
+    
+    for i, segment in enumerate(segments, start_index):
+        # 音声テキスト
+        text = segment['text'].strip()
+        
+        # OCRテキストがあれば結合
+        ocr_texts = segment.get('ocr_text', [])
+        if ocr_texts:
+            combined_text = text + " " + " ".join(ocr_texts)
+            combined_text = combined_text.strip()
+        else:
+            combined_text = text
+        
+        if combined_text:
+            # 🆕 OCRテキストもmetadataに保存
+            metadata = {
+                'start': float(segment['start']),  # 🆕 明示的にfloatに変換
+                'end': float(segment['end']),      # 🆕 明示的にfloatに変換
+                'segment_id': int(i),              # 🆕 明示的にintに変換
+                'has_ocr': bool(len(ocr_texts) > 0),  # 🆕 明示的にboolに変換
+                'ocr_count': int(len(ocr_texts))    # 🆕 明示的にintに変換
+            }
+            # OCRテキストをJSON文字列として保存
+            if ocr_texts:
+                metadata['ocr_text'] = json.dumps(ocr_texts, ensure_ascii=False)
+            if 'segment_count' in segment:
+                metadata['segment_count'] = int(segment['segment_count'])  # ウィンドウに含まれるセグメント数
+            
+            content_key = f"{float(segment['start']):.3f}:{float(segment['end']):.3f}:{combined_text}"
+            segment_key = f"segment_{hashlib.sha1(content_key.encode('utf-8')).hexdigest()[:16]}"
+            if segment_key in seen_ids:
+                continue  # 同じ時刻・同じテキストのセグメントは1件にまとめる
+            seen_ids.add(segment_key)
+            
+            documents.append(combined_text)
+            metadatas.append(metadata)
+            ids.append(segment_key)
+    
+    return documents, metadatas, ids
+
+
+
+def build_scene_windows(
+    segments: List[Dict],
+    window_seconds: float = SCENE_WINDOW_SECONDS,
+    stride_seconds: float = SCENE_WINDOW_STRIDE_SECONDS
+) -> List[Dict]:
+    """連続するセグメントを、指定の長さとずらし幅で重なりのあるウィンドウにまとめる
+
+    各ウィンドウは build_segment_documents にそのまま渡せるセグメント形式
+    （テキストは改行区切り、OCRテキストは重複を除いて結合）。
+
+    Args:
+        segments: 文字起こしセグメント
+        window_seconds: ウィンドウの長さ（先頭セグメントの開始時刻からこの範囲に始まるセグメントを含める）
+        stride_seconds: 次のウィンドウの開始位置までのずらし幅（ウィンドウの長さを上限とする）
+    """
+    stride_seconds = min(stride_seconds, window_seconds)
+    segments = sorted(
+        (segment for segment in segments if segment['text'].strip() or segment.get('ocr_text')),
+        key=lambda segment: float(segment['start'])
+    )
+
+    windows = []
+    lo = 0
+    while lo < len(segments):
+        window_start = float(segments[lo]['start'])
+        hi = lo + 1
+        while hi < len(segments) and float(segments[hi]['start']) < window_start + window_seconds:
+            hi += 1
+
+        window_segments = segments[lo:hi]
+        windows.append({
+            'start': window_start,
+            'end': max(float(segment['end']) for segment in window_segments),
+            'text': '\n'.join(segment['text'].strip() for segment in window_segments if segment['text'].strip()),
+            'ocr_text': list(dict.fromkeys(text for segment in window_segments for text in segment.get('ocr_text', []))),
+            'segment_count': hi - lo
+        })
+        if hi == len(segments):
+            break
+
+        # 次のウィンドウはずらし幅以降に始まる最初のセグメントから（最低1セグメントは進める）
+        lo += 1
+        while lo < len(segments) and float(segments[lo]['start']) < window_start + stride_seconds:
+            lo += 1
+
+    return windows
+
+
+def build_index_documents(
+    segments: List[Dict],
+    search_unit: str = SEARCH_UNIT_WINDOW,
+    window_seconds: float = SCENE_WINDOW_SECONDS,
+    stride_seconds: float = SCENE_WINDOW_STRIDE_SECONDS
+) -> Tuple[List[str], List[Dict], List[str]]:
+    """検索単位に応じて、ChromaDB登録用のドキュメント・メタデータ・IDを作成"""
+    if search_unit == SEARCH_UNIT_WINDOW:
+        return build_segment_documents(build_scene_windows(segments, window_seconds, stride_seconds))
+    return build_segment_documents(segments)
+
+
+def upsert_segment_documents(
+    collection,
+    documents: List[str],
+    metadatas: List[Dict],
+    ids: List[str],
+    embedding_model=None,
+    embedding_cache: Optional[Dict[str, np.ndarray]] = None,
+    embedding_ids: Optional[List[str]] = None
+) -> int:
+    """変更のあったセグメントだけをバッチに分けて書き込む
+
+    IDは内容のハッシュなので、新しいIDのみドキュメントをupsertして埋め込みを計算する。
+    既存のIDでメタデータ（通し番号など）だけが変わったものは、埋め込みを再計算せずメタデータのみ更新する。
+    embedding_model を指定した場合は埋め込みを自前で計算し、embedding_cache にあるIDはモデルを実行せずに再利用する。
+    embedding_ids は embedding_cache を引くキー（省略時は ids。ライブラリ用にIDを付け替えた場合に使う）。
+
+    Returns:
+        書き込んだ件数
+    """
+    existing_metadatas = {}
+    for batch_start in range(0, len(ids), CHROMA_UPSERT_BATCH_SIZE):
+        existing = collection.get(ids=ids[batch_start:batch_start + CHROMA_UPSERT_BATCH_SIZE], include=['metadatas'])
+        existing_metadatas.update(zip(existing['ids'], existing['metadatas'] or []))
+    
+    new_indices = [index for index, segment_key in enumerate(ids) if segment_key not in existing_metadatas]
+    moved_indices = [
+        index for index, segment_key in enumerate(ids)
+        if segment_key in existing_metadatas and existing_metadatas[segment_key] != metadatas[index]
+    ]
+    
+    if embedding_ids is None:
+        embedding_ids = ids
+    if embedding_model is not None:
+        if embedding_cache is None:
+            embedding_cache = {}
+        missing_indices = [index for index in new_indices if embedding_ids[index] not in embedding_cache]
+        if missing_indices:
+            vectors = embed_texts([documents[index] for index in missing_indices], embedding_model)
+            embedding_cache.update(zip((embedding_ids[index] for index in missing_indices), vectors))
+    
+    for batch_start in range(0, len(new_indices), CHROMA_UPSERT_BATCH_SIZE):
+        batch = new_indices[batch_start:batch_start + CHROMA_UPSERT_BATCH_SIZE]
+        collection.upsert(
+            documents=[documents[index] for index in batch],
+            metadatas=[metadatas[index] for index in batch],
+            ids=[ids[index] for index in batch],
+            embeddings=np.stack([embedding_cache[embedding_ids[index]] for index in batch]).tolist() if embedding_model is not None else None
+        )
+    for batch_start in range(0, len(moved_indices), CHROMA_UPSERT_BATCH_SIZE):
+        batch = moved_indices[batch_start:batch_start + CHROMA_UPSERT_BATCH_SIZE]
+        collection.update(
+            metadatas=[metadatas[index] for index in batch],
+            ids=[ids[index] for index in batch]
+        )
+    return len(new_indices) + len(moved_indices)
+
+
+def delete_stale_segment_documents(collection, keep_ids: List[str], where: Optional[Dict] = None) -> int:
+    """コレクションから keep_ids に含まれないセグメントを削除
+
+    Args:
+        where: 削除対象を絞り込むメタデータ条件（ライブラリで1本の動画だけを対象にする場合など）
+
+    Returns:
+        削除した件数
+    """
+    keep_ids = set(keep_ids)
+    existing_ids = collection.get(where=where, include=[])['ids'] if where else collection.get(include=[])['ids']
+    stale_ids = [segment_key for segment_key in existing_ids if segment_key not in keep_ids]
+    for batch_start in range(0, len(stale_ids), CHROMA_UPSERT_BATCH_SIZE):
+        collection.delete(ids=stale_ids[batch_start:batch_start + CHROMA_UPSERT_BATCH_SIZE])
+    return len(stale_ids)
+
+
+def tokenize_for_search(text: str) -> List[str]:
+    """検索用のトークン列を作成（英数字は単語単位、日本語は文字バイグラム）
+
+    形態素解析器に依存せず、製品名や型番（例: ABC-123）も1トークンとして一致させる。
+    """
+    import unicodedata
+
+    text = unicodedata.normalize('NFKC', text).lower()
+    tokens = re.findall(r'[a-z0-9]+(?:[-_.][a-z0-9]+)*', text)
+    for run in re.findall(r'[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]+', text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def create_lexical_index() -> Dict:
+    """空の転置インデックスを作成
+
+    文書番号とトークン頻度は array に詰めて保持し、削除は墓標（tombstone）フラグで表す。
+    """
+    from array import array
+
+    return {
+        'doc_ids': [],             # 文書番号 → ドキュメントID
+        'doc_numbers': {},         # ドキュメントID → 文書番号
+        'doc_lengths': array('I'),  # 文書番号 → トークン数
+        'deleted': bytearray(),    # 文書番号 → 削除済みなら1
+        'postings': {},            # トークン → array('I')（文書番号, 出現回数 の並び）
+        'total_length': 0,
+        'deleted_count': 0
+    }
+
+
+def lexical_index_add(index: Dict, doc_id: str, text: str) -> None:
+    """転置インデックスに文書を追加（同じIDが登録済みなら何もしない）"""
+    from array import array
+    from collections import Counter
+
+    if doc_id in index['doc_numbers']:
+        return
+
+    tokens = tokenize_for_search(text)
+    doc_number = len(index['doc_ids'])
+    index['doc_ids'].append(doc_id)
+    index['doc_numbers'][doc_id] = doc_number
+    index['doc_lengths'].append(len(tokens))
+    index['deleted'].append(0)
+    index['total_length'] += len(tokens)
+    for token, count in Counter(tokens).items():
+        postings = index['postings'].get(token)
+        if postings is None:
+            postings = index['postings'][token] = array('I')
+        postings.extend((doc_number, count))
+
+
+def lexical_index_remove(index: Dict, doc_id: str) -> None:
+    """転置インデックスから文書を削除（墓標を立て、削除が増えたらまとめて詰め直す）"""
+    doc_number = index['doc_numbers'].pop(doc_id, None)
+    if doc_number is None:
+        return
+
+    index['deleted'][doc_number] = 1
+    index['deleted_count'] += 1
+    index['total_length'] -= index['doc_lengths'][doc_number]
+    if index['deleted_count'] > LEXICAL_COMPACT_RATIO * len(index['doc_ids']):
+        compact_lexical_index(index)
+
+
+def compact_lexical_index(index: Dict) -> None:
+    """削除済みの文書をポスティングから取り除き、文書番号を詰め直す"""
+    from array import array
+
+    deleted = np.frombuffer(bytes(index['deleted']), dtype=np.uint8).astype(bool)
+    new_numbers = np.cumsum(~deleted) - 1
+
+    for token in list(index['postings']):
+        pairs = np.frombuffer(index['postings'][token], dtype=np.uint32).reshape(-1, 2)
+        pairs = pairs[~deleted[pairs[:, 0]]]
+        if len(pairs) == 0:
+            del index['postings'][token]
+            continue
+        pairs = np.column_stack((new_numbers[pairs[:, 0]], pairs[:, 1])).astype(np.uint32)
+        index['postings'][token] = array('I', pairs.tobytes())
+
+    index['doc_ids'] = [doc_id for doc_id, is_deleted in zip(index['doc_ids'], deleted) if not is_deleted]
+    index['doc_numbers'] = {doc_id: number for number, doc_id in enumerate(index['doc_ids'])}
+    index['doc_lengths'] = array('I', np.frombuffer(index['doc_lengths'], dtype=np.uint32)[~deleted].tobytes())
+    index['deleted'] = bytearray(len(index['doc_ids']))
+    index['deleted_count'] = 0
+
+
+def lexical_index_search(
+    index: Dict,
+    query: str,
+    n_results: int,
+    id_prefixes: Optional[List[str]] = None
+) -> List[Tuple[str, float]]:
+    """BM25で文書をスコアリングし、上位の (ドキュメントID, スコア) を返す
+
+    Args:
+        id_prefixes: 指定した場合、IDがいずれかで始まる文書に絞り込む（ライブラリでの動画指定）
+    """
+    num_docs = len(index['doc_ids'])
+    live_docs = num_docs - index['deleted_count']
+    query_tokens = set(tokenize_for_search(query))
+    if live_docs == 0 or not query_tokens:
+        return []
+
+    doc_lengths = np.frombuffer(index['doc_lengths'], dtype=np.uint32).astype(np.float32)
+    average_length = max(1.0, index['total_length'] / live_docs)
+    length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / average_length)
+
+    scores = np.zeros(num_docs, dtype=np.float32)
+    for token in query_tokens:
+        postings = index['postings'].get(token)
+        if not postings:
+            continue
+        pairs = np.frombuffer(postings, dtype=np.uint32).reshape(-1, 2)
+        doc_numbers = pairs[:, 0]
+        term_freqs = pairs[:, 1].astype(np.float32)
+        idf = np.log(1 + (live_docs - len(pairs) + 0.5) / (len(pairs) + 0.5))
+        scores[doc_numbers] += idf * term_freqs * (BM25_K1 + 1) / (term_freqs + length_norm[doc_numbers])
+
+    scores[np.frombuffer(bytes(index['deleted']), dtype=np.uint8).astype(bool)] = 0.0
+    if id_prefixes:
+        prefixes = tuple(id_prefixes)
+        for doc_number in np.flatnonzero(scores):
+            if not index['doc_ids'][doc_number].startswith(prefixes):
+                scores[doc_number] = 0.0
+
+    top = np.flatnonzero(scores)
+    top = top[np.argsort(-scores[top], kind='stable')][:n_results]
+    return [(index['doc_ids'][doc_number], float(scores[doc_number])) for doc_number in top]
+
+
+_LEXICAL_INDEXES = {}  # コレクション名 → メモリ上の転置インデックス
+_LEXICAL_INDEX_LOCK = threading.Lock()
+
+
+def _get_lexical_index_unlocked(collection_name: str) -> Dict:
+    """メモリ上の転置インデックスを取得（なければディスクから読み込む）"""
+    import pickle
+
+    index = _LEXICAL_INDEXES.get(collection_name)
+    if index is None:
+        index_path = LEXICAL_INDEX_DIR / f"{collection_name}.pkl"
+        try:
+            with open(index_path, 'rb') as f:
+                index = pickle.load(f)
+        except FileNotFoundError:
+            index = create_lexical_index()
+        except Exception as e:
+            print(f"転置インデックスの読み込みに失敗: {e}")
+            index = create_lexical_index()
+        _LEXICAL_INDEXES[collection_name] = index
+    return index
+
+
+def _save_lexical_index_unlocked(collection_name: str, index: Dict) -> None:
+    """転置インデックスをディスクに保存"""
+    import pickle
+
+    index_path = LEXICAL_INDEX_DIR / f"{collection_name}.pkl"
+    tmp_path = index_path.with_suffix('.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, index_path)
+    except Exception as e:
+        print(f"転置インデックスの保存に失敗: {e}")
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+
+def sync_lexical_index(
+    collection_name: str,
+    documents: List[str],
+    ids: List[str],
+    scope_prefix: str = "",
+    remove_stale: bool = True,
+    save: bool = True
+) -> None:
+    """ChromaDBのコレクションと同じ文書で転置インデックスを差分更新
+
+    IDは内容のハッシュなので、未登録のIDだけを追加する。
+    remove_stale=True の場合、scope_prefix で始まるIDのうち ids にないものを削除する。
+    """
+    with _LEXICAL_INDEX_LOCK:
+        index = _get_lexical_index_unlocked(collection_name)
+        if remove_stale:
+            keep_ids = set(ids)
+            stale_ids = [doc_id for doc_id in index['doc_numbers'] if doc_id.startswith(scope_prefix) and doc_id not in keep_ids]
+            for doc_id in stale_ids:
+                lexical_index_remove(index, doc_id)
+        for doc_id, document in zip(ids, documents):
+            lexical_index_add(index, doc_id, document)
+        if save:
+            _save_lexical_index_unlocked(collection_name, index)
+
+
+def search_lexical(collection_name: str, query: str, n_results: int, id_prefixes: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+    """コレクションに対応する転置インデックスをBM25で検索"""
+    with _LEXICAL_INDEX_LOCK:
+        index = _get_lexical_index_unlocked(collection_name)
+        return lexical_index_search(index, query, n_results, id_prefixes)
+
+
+def ensure_lexical_index(collection) -> None:
+    """転置インデックスが空のコレクション（この機能より前にインデックス化したもの）は、登録済みの文書から作成"""
+    with _LEXICAL_INDEX_LOCK:
+        is_empty = not _get_lexical_index_unlocked(collection.name)['doc_numbers']
+    if is_empty and collection.count() > 0:
+        existing = collection.get(include=['documents'])
+        sync_lexical_index(collection.name, existing['documents'], existing['ids'], remove_stale=False)
+
+
+def hybrid_query(
+    collection,
+    query: str,
+    n_results: int,
+    where: Optional[Dict] = None,
+    id_prefixes: Optional[List[str]] = None,
+    embedding_model=None
+) -> List[Tuple[str, str, Dict, float]]:
+    """ベクトル検索とBM25の結果を Reciprocal Rank Fusion で統合
+
+    製品名や型番のような完全一致はBM25で、言い換えや意味の近さはベクトル検索で拾う。
+
+    Returns:
+        [(ID, ドキュメント, メタデータ, 統合スコア), ...]（スコアの高い順）
+    """
+    n_candidates = max(n_results * 4, HYBRID_CANDIDATES)
+    n_candidates = min(n_candidates, collection.count())
+    if n_candidates == 0:
+        return []
+
+    if (collection.metadata or {}).get('embedding_model') == EMBEDDING_MODEL_NAME and embedding_model is not None:
+        # 🚀 クエリの埋め込みはLRUキャッシュから再利用
+        results = collection.query(query_embeddings=[list(embed_query(query, embedding_model))], n_results=n_candidates, where=where)
+    else:
+        results = collection.query(query_texts=[query], n_results=n_candidates, where=where)
+
+    documents = dict(zip(results['ids'][0], results['documents'][0]))
+    metadatas = dict(zip(results['ids'][0], results['metadatas'][0]))
+    fused_scores = {}
+    for rank, doc_id in enumerate(results['ids'][0]):
+        fused_scores[doc_id] = fused_scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+    ensure_lexical_index(collection)
+    lexical_hits = search_lexical(collection.name, query, n_candidates, id_prefixes)
+    for rank, (doc_id, _) in enumerate(lexical_hits):
+        fused_scores[doc_id] = fused_scores.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+    # BM25だけでヒットした文書の本文とメタデータを取得
+    missing_ids = [doc_id for doc_id, _ in lexical_hits if doc_id not in documents]
+    if missing_ids:
+        fetched = collection.get(ids=missing_ids, include=['documents', 'metadatas'])
+        documents.update(zip(fetched['ids'], fetched['documents']))
+        metadatas.update(zip(fetched['ids'], fetched['metadatas']))
+
+    # コレクションにない（転置インデックスにだけ残っている）IDが結果の枠を占めないよう、件数を絞る前に除く
+    top_ids = sorted(
+        (doc_id for doc_id in fused_scores if doc_id in documents),
+        key=lambda doc_id: -fused_scores[doc_id]
+    )[:n_results]
+
+    return [(doc_id, documents[doc_id], metadatas[doc_id], fused_scores[doc_id]) for doc_id in top_ids]
+
+
+def build_scene_from_metadata(document: str, metadata: Dict) -> Dict:
+    """検索結果のドキュメントとメタデータからシーン情報を作成"""
+    scene = {
+        'text': document,
+        'start': metadata['start'],
+        'end': metadata['end'],
+        'segment_id': metadata['segment_id']
+    }
+
+    # 🆕 OCRテキストを復元
+    if 'ocr_text' in metadata and metadata['ocr_text']:
+        try:
+            scene['ocr_text'] = json.loads(metadata['ocr_text'])
+        except:
+            pass
+
+    return scene
+
+
+def merge_adjacent_scenes(scenes: List[Dict], max_gap: float = SCENE_MERGE_GAP_SECONDS) -> List[Dict]:
+    """時間的に重なる・隣り合う検索ヒットを1つのシーン範囲にまとめる
+
+    順位は各シーンに含まれる最上位ヒットの順。テキストは時刻順に並べ、
+    重なったウィンドウで重複する行は1回だけ残す。異なる動画のヒットはまとめない。
+    """
+    groups = []  # 各グループの先頭がそのグループの最上位ヒット
+    for scene in scenes:
+        overlapping = [
+            group for group in groups
+            if group[0].get('video_id') == scene.get('video_id')
+            and scene['start'] <= max(member['end'] for member in group) + max_gap
+            and scene['end'] >= min(member['start'] for member in group) - max_gap
+        ]
+        if not overlapping:
+            groups.append([scene])
+            continue
+
+        # このヒットでつながった複数のグループは、順位の高いグループに統合する
+        target = overlapping[0]
+        target.append(scene)
+        for group in overlapping[1:]:
+            target.extend(group)
+        groups = [group for group in groups if not any(group is merged for merged in overlapping[1:])]
+
+    merged_scenes = []
+    for group in groups:
+        if len(group) == 1:
+            merged_scenes.append(group[0])
+            continue
+
+        members = sorted(group, key=lambda member: member['start'])
+        scene = dict(group[0])
+        scene['start'] = members[0]['start']
+        scene['end'] = max(member['end'] for member in members)
+        scene['segment_id'] = members[0]['segment_id']
+        scene['text'] = '\n'.join(dict.fromkeys(
+            line.strip() for member in members for line in member['text'].split('\n') if line.strip()
         ))
-        return client
-    except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        st.error(f"❌ ChromaDBのセットアップに失敗しました: {str(e)}\n\n詳細:\n```\n{error_detail}\n```")
-        return None
+        ocr_texts = list(dict.fromkeys(text for member in members for text in member.get('ocr_text', [])))
+        if ocr_texts:
+            scene['ocr_text'] = ocr_texts
+        merged_scenes.append(scene)
+
+    return merged_scenes
+
+
+def build_library_documents(video: Dict, metadatas: List[Dict], ids: List[str]) -> Tuple[List[Dict], List[str]]:
+    """動画ごとのセグメントを、ライブラリ用のメタデータ（動画ID・動画名・パス付き）とIDに変換"""
+    library_metadatas = [
+        {**metadata, 'video_id': video['video_id'], 'video_name': video['video_name'], 'video_path': video['video_path'] or ''}
+        for metadata in metadatas
+    ]
+    library_ids = [f"{video['video_id']}:{segment_key}" for segment_key in ids]
+    return library_metadatas, library_ids
+
+
+def upsert_library_documents(
+    library_collection,
+    video: Dict,
+    documents: List[str],
+    metadatas: List[Dict],
+    ids: List[str],
+    embedding_model=None,
+    embedding_cache: Optional[Dict[str, np.ndarray]] = None
+) -> List[str]:
+    """動画のセグメントをライブラリのコレクションに書き込み、ライブラリ上のIDを返す
+
+    埋め込みは動画ごとのコレクションと同じ embedding_cache から再利用する。
+    """
+    library_metadatas, library_ids = build_library_documents(video, metadatas, ids)
+    upsert_segment_documents(
+        library_collection, documents, library_metadatas, library_ids,
+        embedding_model, embedding_cache, embedding_ids=ids
+    )
+    return library_ids
+
+
+def get_library_video(video_name: str, video_path: Optional[str]) -> Dict:
+    """ライブラリに登録する動画の情報（動画IDは動画ごとのコレクション名と同じ）"""
+    return {
+        'video_id': get_video_collection_name(video_name),
+        'video_name': video_name,
+        'video_path': video_path
+    }
+
 
+def index_transcription_to_chromadb(
+    transcription: Dict,
+    video_name: str,
+    client: chromadb.Client,
+    video_path: Optional[str] = None,
+    search_unit: str = SEARCH_UNIT_WINDOW,
+    window_seconds: float = SCENE_WINDOW_SECONDS,
+    stride_seconds: float = SCENE_WINDOW_STRIDE_SECONDS
+):
+    """文字起こし結果をChromaDBにインデックス化
 
-def index_transcription_to_chromadb(transcription: Dict, video_name: str, client: chromadb.Client):
-    """文字起こし結果をChromaDBにインデックス化"""
+    動画ごとのコレクションに加え、全動画を横断検索するためのライブラリのコレクションにも登録する。
+    search_unit が SEARCH_UNIT_WINDOW の場合は、セグメントを重なりのあるウィンドウにまとめて登録する
+    （検索単位を切り替えると、以前の単位のドキュメントは差分更新で削除される）。
+    """
     # 🆕 clientがNoneの場合のチェック
     if client is None:
         st.session_state.index_error_msg = "❌ ChromaDBクライアントが初期化されていません。ページをリロードしてください。"
@@ -958,73 +2876,41 @@ def index_transcription_to_chromadb(transcription: Dict, video_name: str, client
     
     try:
         # コレクションの作成または取得
-        # 🆕 日本語・特殊文字を安全な文字列に変換（英数字とアンダースコアのみ）
-        import re
-        import hashlib
-        # ファイル名のハッシュを生成（安全で一意な識別子）
-        name_hash = hashlib.md5(video_name.encode('utf-8')).hexdigest()[:8]
-        # 英数字のみ抽出（最大20文字）
-        safe_name = re.sub(r'[^a-zA-Z0-9]', '_', video_name)[:20]
-        collection_name = f"video_{safe_name}_{name_hash}"
-        
-        # 既存のコレクションを削除（更新の場合）
-        try:
-            client.delete_collection(name=collection_name)
-        except:
-            pass
+        collection_name = get_video_collection_name(video_name)
         
-        collection = client.create_collection(
-            name=collection_name,
-            metadata={"hnsw:space": "cosine"}
-        )
+        # 既存のコレクションは残し、差分だけを更新する
+        embedding_model = load_embedding_model()
+        model_name = get_embedding_model_name(embedding_model)
+        collection = get_segment_collection(client, collection_name, embedding_model)
         
-        # セグメントごとにインデックス化
-        documents = []
-        metadatas = []
-        ids = []
+        # 検索単位ごとにインデックス化（内容が変わったドキュメントのみ書き込み、消えたドキュメントは削除）
+        documents, metadatas, ids = build_index_documents(transcription['segments'], search_unit, window_seconds, stride_seconds)
+        embedding_cache = load_embedding_cache(collection_name, model_name) if embedding_model is not None else None
+        written_count = upsert_segment_documents(collection, documents, metadatas, ids, embedding_model, embedding_cache)
+        deleted_count = delete_stale_segment_documents(collection, ids)
+        sync_lexical_index(collection_name, documents, ids)
         
-        for i, segment in enumerate(transcription['segments']):
-            # 音声テキスト
-            text = segment['text'].strip()
-            
-            # OCRテキストがあれば結合
-            ocr_texts = segment.get('ocr_text', [])
-            if ocr_texts:
-                combined_text = text + " " + " ".join(ocr_texts)
-                combined_text = combined_text.strip()
-            else:
-                combined_text = text
-            
-            if combined_text:
-                documents.append(combined_text)
-                # 🆕 OCRテキストもmetadataに保存
-                metadata = {
-                    'start': float(segment['start']),  # 🆕 明示的にfloatに変換
-                    'end': float(segment['end']),      # 🆕 明示的にfloatに変換
-                    'segment_id': int(i),              # 🆕 明示的にintに変換
-                    'has_ocr': bool(len(ocr_texts) > 0),  # 🆕 明示的にboolに変換
-                    'ocr_count': int(len(ocr_texts))    # 🆕 明示的にintに変換
-                }
-                # OCRテキストをJSON文字列として保存
-                if ocr_texts:
-                    import json
-                    metadata['ocr_text'] = json.dumps(ocr_texts, ensure_ascii=False)
-                
-                metadatas.append(metadata)
-                ids.append(f"segment_{i}")
+        # 🆕 ライブラリ全体のコレクションにも登録（動画IDで絞り込んで差分を更新）
+        video = get_library_video(video_name, video_path)
+        library_collection = get_segment_collection(client, LIBRARY_COLLECTION_NAME, embedding_model)
+        library_ids = upsert_library_documents(library_collection, video, documents, metadatas, ids, embedding_model, embedding_cache)
+        delete_stale_segment_documents(library_collection, library_ids, where={'video_id': video['video_id']})
+        sync_lexical_index(LIBRARY_COLLECTION_NAME, documents, library_ids, scope_prefix=f"{video['video_id']}:")
+        invalidate_query_cache(collection_name)
+        invalidate_query_cache(LIBRARY_COLLECTION_NAME)
+        
+        if embedding_cache is not None:
+            save_embedding_cache(collection_name, model_name, embedding_cache, ids)
         
         if documents:
-            collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            
             # OCR統計を表示（st.rerun()前に表示するため、session_stateに保存）
             ocr_segments = sum(1 for meta in metadatas if meta.get('has_ocr', False))
-            success_msg = f"✅ {len(documents)}件のセグメントをインデックス化しました"
+            unit_label = "シーン" if search_unit == SEARCH_UNIT_WINDOW else "セグメント"
+            success_msg = f"✅ {len(documents)}件の{unit_label}をインデックス化しました"
             if ocr_segments > 0:
                 success_msg += f"（うち{ocr_segments}件にOCRテキスト含む）"
+            if written_count < len(documents) or deleted_count > 0:
+                success_msg += f"（更新 {written_count}件・削除 {deleted_count}件、他は既存のインデックスを再利用）"
             st.session_state.index_success_msg = success_msg
             return collection_name
         else:
@@ -1038,200 +2924,412 @@ def index_transcription_to_chromadb(transcription: Dict, video_name: str, client
         return None
 
 
-def search_scenes(query: str, collection_name: str, client: chromadb.Client, n_results: int = 5) -> List[Dict]:
-    """自然言語クエリでシーンを検索"""
-    try:
-        import json
-        collection = client.get_collection(name=collection_name)
-        results = collection.query(
-            query_texts=[query],
-            n_results=n_results
+_QUERY_RESULT_CACHE = OrderedDict()  # (コレクション名, 世代, クエリ, 件数, 絞り込み) → シーンのリスト
+_QUERY_RESULT_CACHE_LOCK = threading.Lock()
+_COLLECTION_GENERATIONS = {}  # コレクション名 → 再インデックスのたびに増える世代番号
+
+
+def get_query_cache_key(collection_name: str, query: str, n_results: int, filter_key=None) -> Tuple:
+    """検索結果キャッシュのキー（コレクションの世代を含むため、再インデックス後の古い結果は使われない）"""
+    with _QUERY_RESULT_CACHE_LOCK:
+        generation = _COLLECTION_GENERATIONS.get(collection_name, 0)
+    return (collection_name, generation, query, n_results, filter_key)
+
+
+def get_cached_query_result(cache_key: Tuple) -> Optional[List[Dict]]:
+    """キャッシュ済みの検索結果を取得（呼び出し側が変更してもキャッシュに影響しないようコピーを返す）"""
+    with _QUERY_RESULT_CACHE_LOCK:
+        scenes = _QUERY_RESULT_CACHE.get(cache_key)
+        if scenes is None:
+            return None
+        _QUERY_RESULT_CACHE.move_to_end(cache_key)
+        return [dict(scene) for scene in scenes]
+
+
+def put_cached_query_result(cache_key: Tuple, scenes: List[Dict]) -> None:
+    """検索結果をキャッシュに保存し、上限を超えたら最も古く使われた結果から削除"""
+    with _QUERY_RESULT_CACHE_LOCK:
+        _QUERY_RESULT_CACHE[cache_key] = [dict(scene) for scene in scenes]
+        _QUERY_RESULT_CACHE.move_to_end(cache_key)
+        while len(_QUERY_RESULT_CACHE) > QUERY_RESULT_CACHE_SIZE:
+            _QUERY_RESULT_CACHE.popitem(last=False)
+
+
+def invalidate_query_cache(collection_name: str) -> None:
+    """コレクションの再インデックス時に、そのコレクションの検索結果キャッシュを無効化"""
+    with _QUERY_RESULT_CACHE_LOCK:
+        _COLLECTION_GENERATIONS[collection_name] = _COLLECTION_GENERATIONS.get(collection_name, 0) + 1
+        for cache_key in [cache_key for cache_key in _QUERY_RESULT_CACHE if cache_key[0] == collection_name]:
+            del _QUERY_RESULT_CACHE[cache_key]
+
+
+def query_scenes(
+    client: chromadb.Client,
+    collection_name: str,
+    query: str,
+    n_results: int = SEARCH_DEFAULT_N_RESULTS,
+    embedding_model=None
+) -> List[Dict]:
+    """動画のコレクションからシーンを検索（結果キャッシュ付き）
+
+    隣り合うヒットは1つのシーン範囲にまとめてから返す。
+    st.* を呼ばないため、バックグラウンドスレッドからも使える。
+
+    Raises:
+        Exception: コレクションの取得や検索に失敗した場合
+    """
+    cache_key = get_query_cache_key(collection_name, query, n_results)
+    scenes = get_cached_query_result(cache_key)
+    if scenes is not None:
+        return scenes
+
+    collection = client.get_collection(name=collection_name)
+    scenes = [
+        build_scene_from_metadata(document, metadata)
+        for _, document, metadata, _ in hybrid_query(
+            collection, query, n_results * SCENE_MERGE_CANDIDATE_FACTOR, embedding_model=embedding_model
         )
-        
-        scenes = []
-        if results['metadatas'] and len(results['metadatas']) > 0:
-            for i, metadata in enumerate(results['metadatas'][0]):
-                scene = {
-                    'text': results['documents'][0][i],
-                    'start': metadata['start'],
-                    'end': metadata['end'],
-                    'segment_id': metadata['segment_id']
-                }
-                
-                # 🆕 OCRテキストを復元
-                if 'ocr_text' in metadata and metadata['ocr_text']:
-                    try:
-                        scene['ocr_text'] = json.loads(metadata['ocr_text'])
-                    except:
-                        pass
-                
-                scenes.append(scene)
-        
+    ]
+    scenes = merge_adjacent_scenes(scenes)[:n_results]
+    put_cached_query_result(cache_key, scenes)
+    return scenes
+
+
+def query_library_scenes(
+    client: chromadb.Client,
+    query: str,
+    n_results: int = 10,
+    video_ids: Optional[List[str]] = None,
+    embedding_model=None
+) -> List[Dict]:
+    """ライブラリのコレクションからシーンを検索（結果キャッシュ付き・st.* を呼ばない）
+
+    隣り合うヒットは動画ごとに1つのシーン範囲にまとめてから返す。
+
+    Raises:
+        Exception: コレクションの取得や検索に失敗した場合
+    """
+    cache_key = get_query_cache_key(LIBRARY_COLLECTION_NAME, query, n_results, tuple(sorted(video_ids)) if video_ids else None)
+    scenes = get_cached_query_result(cache_key)
+    if scenes is not None:
         return scenes
+
+    collection = client.get_collection(name=LIBRARY_COLLECTION_NAME)
+    where = {'video_id': {'$in': list(video_ids)}} if video_ids else None
+    id_prefixes = [f"{video_id}:" for video_id in video_ids] if video_ids else None
+
+    scenes = []
+    for _, document, metadata, score in hybrid_query(
+        collection, query, n_results * SCENE_MERGE_CANDIDATE_FACTOR,
+        where=where, id_prefixes=id_prefixes, embedding_model=embedding_model
+    ):
+        scene = build_scene_from_metadata(document, metadata)
+        scene.update({
+            'video_id': metadata['video_id'],
+            'video_name': metadata['video_name'],
+            'video_path': metadata.get('video_path') or None,
+            'score': score  # ベクトル検索とBM25の順位を統合したスコア
+        })
+        scenes.append(scene)
+
+    scenes = merge_adjacent_scenes(scenes)[:n_results]
+    put_cached_query_result(cache_key, scenes)
+    return scenes
+
+
+def _run_suggestion_precompute(client: chromadb.Client, collection_name: str, queries: List[str], n_results: int, embedding_model) -> None:
+    """検索クエリ候補の検索結果をバックグラウンドで計算してキャッシュに入れる（st.* は呼ばない）"""
+    for query in queries:
+        try:
+            query_scenes(client, collection_name, query, n_results, embedding_model)
+        except Exception as e:
+            print(f"検索クエリ候補の事前計算に失敗: {e}")
+            return
+
+
+def prepare_search_suggestions(transcript_text: str, collection_name: Optional[str], client: chromadb.Client) -> None:
+    """検索クエリ候補を生成し、候補をクリックしたときにすぐ結果を出せるよう検索結果を事前計算する"""
+    suggestions = generate_search_suggestions(transcript_text)
+    st.session_state.search_suggestions = suggestions
+    if not suggestions or not collection_name or client is None:
+        return
+
+    # バックグラウンドスレッドから st.cache_resource を呼ばないよう、埋め込みモデルはここで取得して渡す
+    try:
+        embedding_model = load_embedding_model()
+    except RuntimeError as e:
+        print(f"検索クエリ候補の事前計算をスキップ: {e}")
+        return
+    thread = threading.Thread(
+        target=_run_suggestion_precompute,
+        args=(client, collection_name, suggestions, SEARCH_DEFAULT_N_RESULTS, embedding_model),
+        daemon=True
+    )
+    thread.start()
+
+
+def search_library(
+    query: str,
+    client: chromadb.Client,
+    n_results: int = 10,
+    video_ids: Optional[List[str]] = None
+) -> List[Dict]:
+    """ライブラリ全体（全動画）からシーンを1回の近傍検索で探す
+
+    Args:
+        query: 検索クエリ
+        client: ChromaDBクライアント
+        n_results: 返すシーン数（全動画での上位）
+        video_ids: 指定した場合はこれらの動画に絞り込む
+
+    Returns:
+        [{'video_id', 'video_name', 'video_path', 'start', 'end', 'score', 'text', ...}, ...]（スコアの高い順）
+    """
+    try:
+        client.get_collection(name=LIBRARY_COLLECTION_NAME)
+    except Exception:
+        st.warning("⚠️ ライブラリにまだ動画が登録されていません。")
+        return []
+    
+    try:
+        return query_library_scenes(client, query, n_results, video_ids, load_embedding_model())
+    except Exception as e:
+        st.error(f"ライブラリ検索に失敗しました: {e}")
+        return []
+
+
+def search_scenes(query: str, collection_name: str, client: chromadb.Client, n_results: int = SEARCH_DEFAULT_N_RESULTS) -> List[Dict]:
+    """自然言語クエリでシーンを検索（ベクトル検索とBM25のハイブリッド）"""
+    try:
+        return query_scenes(client, collection_name, query, n_results, load_embedding_model())
     except Exception as e:
         st.error(f"検索に失敗しました: {e}")
         return []
 
 
+# 優先度の高い定型クエリ候補リスト
+SEARCH_PRIORITY_QUERIES = [
+    "商品の特徴について説明している箇所",
+    "デザインについて説明をしている箇所",
+    "使用方法について説明をしている箇所",
+    "メンテナンス方法について説明をしている箇所",
+    "保証について説明をしている箇所",
+    "味・風味について説明している箇所",
+    "色味について説明している箇所",
+    "香りについて説明している箇所",
+    "肌触り・テクスチャーについて説明している箇所",
+    "着心地・フィット感について説明している箇所",
+    "使いやすさについて説明している箇所",
+    "携帯性（持ち運びやすさ）について説明している箇所",
+    "静粛性・打鍵感について説明している箇所",
+    "視認性（画面の明るさ、文字の見やすさ）について説明している箇所",
+    "サイズ・寸法について説明している箇所",
+    "重量について説明している箇所",
+    "原材料・素材について説明している箇所",
+    "成分・添加物について説明している箇所",
+    "アレルギー物質について説明している箇所",
+    "原産国・製造国について説明している箇所",
+    "カラーバリエーションについて説明している箇所",
+    "付属品・同梱物について説明している箇所",
+    "製造年月日・消費期限について説明している箇所",
+    "スペック・性能について説明している箇所",
+    "耐久性・寿命について説明している箇所",
+    "防水・防塵性能について説明している箇所",
+    "静音性について説明している箇所",
+    "省エネ性能・消費電力について説明している箇所",
+    "認証・取得規格について説明している箇所",
+    "互換性について説明している箇所",
+    "動作環境について説明している箇所",
+    "通信方式について説明している箇所",
+    "処理速度について説明している箇所",
+    "安全上の注意・警告について説明している箇所",
+    "使用禁止事項について説明している箇所",
+    "対象年齢について説明している箇所",
+    "副作用・リスクについて説明している箇所",
+    "免責事項（責任の範囲）について説明している箇所",
+    "法的遵守事項について説明している箇所",
+    "廃棄・リサイクル方法について説明している箇所",
+    "開発ストーリー・コンセプトについて説明している箇所",
+    "生産者・製造工程について説明している箇所",
+    "サステナビリティ・環境配慮について説明している箇所",
+    "受賞歴・メディア掲載について説明している箇所",
+    "ターゲット層（こんな方におすすめ）について説明している箇所",
+    "監修者・専門家のコメントについて説明している箇所",
+    "組み立て・設置方法について説明している箇所",
+    "初期設定（セットアップ）について説明している箇所",
+    "トラブルシューティング（Q&A）について説明している箇所",
+    "アップデート・更新について説明している箇所",
+    "修理・交換対応について説明している箇所",
+    "消耗品の購入・補充について説明している箇所",
+    "返品・キャンセルポリシーについて説明している箇所",
+    "配送・納期について説明している箇所",
+    "カスタマーサポート窓口について説明している箇所"
+]
+
+# キーワードマッピング（優先クエリとの関連性チェック用）
+# 同じキーワードが複数回ある場合は、dictの仕様どおり後に書いたクエリが使われる
+SEARCH_KEYWORD_PATTERNS = {
+    "商品": "商品の特徴について説明している箇所",
+    "特徴": "商品の特徴について説明している箇所",
+    "デザイン": "デザインについて説明をしている箇所",
+    "使い方": "使用方法について説明をしている箇所",
+    "使用方法": "使用方法について説明をしている箇所",
+    "メンテナンス": "メンテナンス方法について説明をしている箇所",
+    "手入れ": "メンテナンス方法について説明をしている箇所",
+    "保証": "保証について説明をしている箇所",
+    "味": "味・風味について説明している箇所",
+    "風味": "味・風味について説明している箇所",
+    "色": "色味について説明している箇所",
+    "香り": "香りについて説明している箇所",
+    "肌触り": "肌触り・テクスチャーについて説明している箇所",
+    "テクスチャー": "肌触り・テクスチャーについて説明している箇所",
+    "着心地": "着心地・フィット感について説明している箇所",
+    "フィット": "着心地・フィット感について説明している箇所",
+    "使いやすさ": "使いやすさについて説明している箇所",
+    "携帯": "携帯性（持ち運びやすさ）について説明している箇所",
+    "持ち運び": "携帯性（持ち運びやすさ）について説明している箇所",
+    "サイズ": "サイズ・寸法について説明している箇所",
+    "寸法": "サイズ・寸法について説明している箇所",
+    "重量": "重量について説明している箇所",
+    "重さ": "重量について説明している箇所",
+    "原材料": "原材料・素材について説明している箇所",
+    "素材": "原材料・素材について説明している箇所",
+    "成分": "成分・添加物について説明している箇所",
+    "添加物": "成分・添加物について説明している箇所",
+    "アレルギー": "アレルギー物質について説明している箇所",
+    "原産": "原産国・製造国について説明している箇所",
+    "製造": "原産国・製造国について説明している箇所",
+    "カラー": "カラーバリエーションについて説明している箇所",
+    "色": "カラーバリエーションについて説明している箇所",
+    "付属": "付属品・同梱物について説明している箇所",
+    "同梱": "付属品・同梱物について説明している箇所",
+    "消費期限": "製造年月日・消費期限について説明している箇所",
+    "スペック": "スペック・性能について説明している箇所",
+    "性能": "スペック・性能について説明している箇所",
+    "耐久": "耐久性・寿命について説明している箇所",
+    "寿命": "耐久性・寿命について説明している箇所",
+    "防水": "防水・防塵性能について説明している箇所",
+    "防塵": "防水・防塵性能について説明している箇所",
+    "静音": "静音性について説明している箇所",
+    "省エネ": "省エネ性能・消費電力について説明している箇所",
+    "消費電力": "省エネ性能・消費電力について説明している箇所",
+    "注意": "安全上の注意・警告について説明している箇所",
+    "警告": "安全上の注意・警告について説明している箇所",
+    "禁止": "使用禁止事項について説明している箇所",
+    "年齢": "対象年齢について説明している箇所",
+    "副作用": "副作用・リスクについて説明している箇所",
+    "リスク": "副作用・リスクについて説明している箇所",
+    "廃棄": "廃棄・リサイクル方法について説明している箇所",
+    "リサイクル": "廃棄・リサイクル方法について説明している箇所",
+    "ストーリー": "開発ストーリー・コンセプトについて説明している箇所",
+    "コンセプト": "開発ストーリー・コンセプトについて説明している箇所",
+    "組み立て": "組み立て・設置方法について説明している箇所",
+    "設置": "組み立て・設置方法について説明している箇所",
+    "設定": "初期設定（セットアップ）について説明している箇所",
+    "セットアップ": "初期設定（セットアップ）について説明している箇所",
+    "トラブル": "トラブルシューティング（Q&A）について説明している箇所",
+    "修理": "修理・交換対応について説明している箇所",
+    "交換": "修理・交換対応について説明している箇所",
+    "返品": "返品・キャンセルポリシーについて説明している箇所",
+    "キャンセル": "返品・キャンセルポリシーについて説明している箇所",
+    "配送": "配送・納期について説明している箇所",
+    "納期": "配送・納期について説明している箇所",
+    "サポート": "カスタマーサポート窓口について説明している箇所",
+    "問い合わせ": "カスタマーサポート窓口について説明している箇所",
+    "料金": "料金について説明している箇所",
+    "特徴": "特徴について説明している箇所",
+    "機能": "機能について説明している箇所",
+    "効果": "効果について説明している箇所",
+    "注意": "注意点について説明している箇所",
+    "ポイント": "重要なポイントを説明している箇所",
+    "コツ": "コツについて説明している箇所",
+    "手順": "手順について説明している箇所",
+    "方法": "方法について説明している箇所",
+    "やり方": "やり方について説明している箇所",
+    "問題": "問題について説明している箇所",
+    "解決": "解決方法について説明している箇所",
+    "比較": "比較している箇所",
+    "違い": "違いについて説明している箇所",
+    "おすすめ": "おすすめについて説明している箇所",
+    "メリット": "メリットについて説明している箇所",
+    "デメリット": "デメリットについて説明している箇所",
+}
+
+
+def build_keyword_automaton(keywords: List[str]) -> Dict:
+    """キーワード群からAho–Corasickオートマトンを構築
+
+    テキストを1回走査するだけで、全キーワードの出現をまとめて数えられる。
+
+    Returns:
+        {'keywords': キーワード, 'goto': 状態ごとの遷移, 'fail': 失敗遷移, 'outputs': 状態ごとに一致するキーワード番号}
+    """
+    keywords = list(keywords)
+    goto = [{}]
+    outputs = [[]]
+    for index, keyword in enumerate(keywords):
+        state = 0
+        for char in keyword.lower():
+            if char not in goto[state]:
+                goto[state][char] = len(goto)
+                goto.append({})
+                outputs.append([])
+            state = goto[state][char]
+        outputs[state].append(index)
+
+    # 幅優先で失敗遷移を求め、失敗先で一致するキーワードも出力に含める
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, next_state in goto[state].items():
+            fallback = fail[state]
+            while fallback and char not in goto[fallback]:
+                fallback = fail[fallback]
+            fail[next_state] = goto[fallback].get(char, 0)
+            outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+            queue.append(next_state)
+
+    return {'keywords': keywords, 'goto': goto, 'fail': fail, 'outputs': outputs}
+
+
+def count_keyword_hits(automaton: Dict, text: str) -> Dict[str, int]:
+    """オートマトンでテキストを1回走査し、キーワードごとの出現回数を返す（出現したキーワードのみ）"""
+    goto = automaton['goto']
+    fail = automaton['fail']
+    outputs = automaton['outputs']
+    counts = [0] * len(automaton['keywords'])
+
+    state = 0
+    for char in text.lower():
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        for index in outputs[state]:
+            counts[index] += 1
+
+    return {keyword: count for keyword, count in zip(automaton['keywords'], counts) if count}
+
+
+# 🚀 起動時に1回だけ構築し、文字起こしごとに作り直さない
+_SEARCH_KEYWORD_AUTOMATON = build_keyword_automaton(SEARCH_KEYWORD_PATTERNS)
+
+
 def generate_search_suggestions(transcript_text: str, max_suggestions: int = 10) -> List[str]:
-    """文字起こしテキストから検索クエリ候補を生成"""
-    suggestions = []
-    
-    # 優先度の高い定型クエリ候補リスト
-    priority_queries = [
-        "商品の特徴について説明している箇所",
-        "デザインについて説明をしている箇所",
-        "使用方法について説明をしている箇所",
-        "メンテナンス方法について説明をしている箇所",
-        "保証について説明をしている箇所",
-        "味・風味について説明している箇所",
-        "色味について説明している箇所",
-        "香りについて説明している箇所",
-        "肌触り・テクスチャーについて説明している箇所",
-        "着心地・フィット感について説明している箇所",
-        "使いやすさについて説明している箇所",
-        "携帯性（持ち運びやすさ）について説明している箇所",
-        "静粛性・打鍵感について説明している箇所",
-        "視認性（画面の明るさ、文字の見やすさ）について説明している箇所",
-        "サイズ・寸法について説明している箇所",
-        "重量について説明している箇所",
-        "原材料・素材について説明している箇所",
-        "成分・添加物について説明している箇所",
-        "アレルギー物質について説明している箇所",
-        "原産国・製造国について説明している箇所",
-        "カラーバリエーションについて説明している箇所",
-        "付属品・同梱物について説明している箇所",
-        "製造年月日・消費期限について説明している箇所",
-        "スペック・性能について説明している箇所",
-        "耐久性・寿命について説明している箇所",
-        "防水・防塵性能について説明している箇所",
-        "静音性について説明している箇所",
-        "省エネ性能・消費電力について説明している箇所",
-        "認証・取得規格について説明している箇所",
-        "互換性について説明している箇所",
-        "動作環境について説明している箇所",
-        "通信方式について説明している箇所",
-        "処理速度について説明している箇所",
-        "安全上の注意・警告について説明している箇所",
-        "使用禁止事項について説明している箇所",
-        "対象年齢について説明している箇所",
-        "副作用・リスクについて説明している箇所",
-        "免責事項（責任の範囲）について説明している箇所",
-        "法的遵守事項について説明している箇所",
-        "廃棄・リサイクル方法について説明している箇所",
-        "開発ストーリー・コンセプトについて説明している箇所",
-        "生産者・製造工程について説明している箇所",
-        "サステナビリティ・環境配慮について説明している箇所",
-        "受賞歴・メディア掲載について説明している箇所",
-        "ターゲット層（こんな方におすすめ）について説明している箇所",
-        "監修者・専門家のコメントについて説明している箇所",
-        "組み立て・設置方法について説明している箇所",
-        "初期設定（セットアップ）について説明している箇所",
-        "トラブルシューティング（Q&A）について説明している箇所",
-        "アップデート・更新について説明している箇所",
-        "修理・交換対応について説明している箇所",
-        "消耗品の購入・補充について説明している箇所",
-        "返品・キャンセルポリシーについて説明している箇所",
-        "配送・納期について説明している箇所",
-        "カスタマーサポート窓口について説明している箇所"
-    ]
-    
-    # キーワードマッピング（優先クエリとの関連性チェック用）
-    keyword_patterns = {
-        "商品": "商品の特徴について説明している箇所",
-        "特徴": "商品の特徴について説明している箇所",
-        "デザイン": "デザインについて説明をしている箇所",
-        "使い方": "使用方法について説明をしている箇所",
-        "使用方法": "使用方法について説明をしている箇所",
-        "メンテナンス": "メンテナンス方法について説明をしている箇所",
-        "手入れ": "メンテナンス方法について説明をしている箇所",
-        "保証": "保証について説明をしている箇所",
-        "味": "味・風味について説明している箇所",
-        "風味": "味・風味について説明している箇所",
-        "色": "色味について説明している箇所",
-        "香り": "香りについて説明している箇所",
-        "肌触り": "肌触り・テクスチャーについて説明している箇所",
-        "テクスチャー": "肌触り・テクスチャーについて説明している箇所",
-        "着心地": "着心地・フィット感について説明している箇所",
-        "フィット": "着心地・フィット感について説明している箇所",
-        "使いやすさ": "使いやすさについて説明している箇所",
-        "携帯": "携帯性（持ち運びやすさ）について説明している箇所",
-        "持ち運び": "携帯性（持ち運びやすさ）について説明している箇所",
-        "サイズ": "サイズ・寸法について説明している箇所",
-        "寸法": "サイズ・寸法について説明している箇所",
-        "重量": "重量について説明している箇所",
-        "重さ": "重量について説明している箇所",
-        "原材料": "原材料・素材について説明している箇所",
-        "素材": "原材料・素材について説明している箇所",
-        "成分": "成分・添加物について説明している箇所",
-        "添加物": "成分・添加物について説明している箇所",
-        "アレルギー": "アレルギー物質について説明している箇所",
-        "原産": "原産国・製造国について説明している箇所",
-        "製造": "原産国・製造国について説明している箇所",
-        "カラー": "カラーバリエーションについて説明している箇所",
-        "色": "カラーバリエーションについて説明している箇所",
-        "付属": "付属品・同梱物について説明している箇所",
-        "同梱": "付属品・同梱物について説明している箇所",
-        "消費期限": "製造年月日・消費期限について説明している箇所",
-        "スペック": "スペック・性能について説明している箇所",
-        "性能": "スペック・性能について説明している箇所",
-        "耐久": "耐久性・寿命について説明している箇所",
-        "寿命": "耐久性・寿命について説明している箇所",
-        "防水": "防水・防塵性能について説明している箇所",
-        "防塵": "防水・防塵性能について説明している箇所",
-        "静音": "静音性について説明している箇所",
-        "省エネ": "省エネ性能・消費電力について説明している箇所",
-        "消費電力": "省エネ性能・消費電力について説明している箇所",
-        "注意": "安全上の注意・警告について説明している箇所",
-        "警告": "安全上の注意・警告について説明している箇所",
-        "禁止": "使用禁止事項について説明している箇所",
-        "年齢": "対象年齢について説明している箇所",
-        "副作用": "副作用・リスクについて説明している箇所",
-        "リスク": "副作用・リスクについて説明している箇所",
-        "廃棄": "廃棄・リサイクル方法について説明している箇所",
-        "リサイクル": "廃棄・リサイクル方法について説明している箇所",
-        "ストーリー": "開発ストーリー・コンセプトについて説明している箇所",
-        "コンセプト": "開発ストーリー・コンセプトについて説明している箇所",
-        "組み立て": "組み立て・設置方法について説明している箇所",
-        "設置": "組み立て・設置方法について説明している箇所",
-        "設定": "初期設定（セットアップ）について説明している箇所",
-        "セットアップ": "初期設定（セットアップ）について説明している箇所",
-        "トラブル": "トラブルシューティング（Q&A）について説明している箇所",
-        "修理": "修理・交換対応について説明している箇所",
-        "交換": "修理・交換対応について説明している箇所",
-        "返品": "返品・キャンセルポリシーについて説明している箇所",
-        "キャンセル": "返品・キャンセルポリシーについて説明している箇所",
-        "配送": "配送・納期について説明している箇所",
-        "納期": "配送・納期について説明している箇所",
-        "サポート": "カスタマーサポート窓口について説明している箇所",
-        "問い合わせ": "カスタマーサポート窓口について説明している箇所",
-        "料金": "料金について説明している箇所",
-        "特徴": "特徴について説明している箇所",
-        "機能": "機能について説明している箇所",
-        "効果": "効果について説明している箇所",
-        "注意": "注意点について説明している箇所",
-        "ポイント": "重要なポイントを説明している箇所",
-        "コツ": "コツについて説明している箇所",
-        "手順": "手順について説明している箇所",
-        "方法": "方法について説明している箇所",
-        "やり方": "やり方について説明している箇所",
-        "問題": "問題について説明している箇所",
-        "解決": "解決方法について説明している箇所",
-        "比較": "比較している箇所",
-        "違い": "違いについて説明している箇所",
-        "おすすめ": "おすすめについて説明している箇所",
-        "メリット": "メリットについて説明している箇所",
-        "デメリット": "デメリットについて説明している箇所",
-    }
-    
-    # 文字起こしテキストから関連するキーワードを検出
-    text_lower = transcript_text.lower()
-    matched_queries = []
+    """文字起こしテキストから検索クエリ候補を生成
+
+    キーワードの出現回数をクエリごとに合計し、多く言及されている候補から順に返す
+    （同数の場合は SEARCH_KEYWORD_PATTERNS の順）。
+    """
+    # 文字起こしテキストを1回走査して、各キーワードの出現回数を数える
+    keyword_hits = count_keyword_hits(_SEARCH_KEYWORD_AUTOMATON, transcript_text)
     
     # キーワードパターンに基づいて優先クエリを抽出（実際に動画に含まれる内容のみ）
-    for keyword, query in keyword_patterns.items():
-        if keyword in text_lower and query not in matched_queries:
-            matched_queries.append(query)
+    query_hits = {}
+    for keyword, query in SEARCH_KEYWORD_PATTERNS.items():
+        if keyword in keyword_hits:
+            query_hits[query] = query_hits.get(query, 0) + keyword_hits[keyword]
+    matched_queries = sorted(query_hits, key=lambda query: -query_hits[query])
     
     # ⚠️ 重要: 汎用候補は追加しない
     # 動画に実際に含まれる内容のみを表示し、無理に候補を増やさない
@@ -1242,18 +3340,199 @@ def generate_search_suggestions(transcript_text: str, max_suggestions: int = 10)
 
 
 def get_video_duration(video_path: str) -> float:
-    """動画の長さを取得"""
+    """動画の長さを取得（キャッシュ済みのMediaInfoを使う）"""
     try:
-        probe = ffmpeg.probe(video_path)
-        duration = float(probe['streams'][0]['duration'])
-        return duration
+        return get_media_info(video_path).duration
     except Exception as e:
         st.error(f"動画の長さの取得に失敗しました: {e}")
         return 0.0
 
 
-def create_preview_clip(video_path: str, start_time: float, end_time: float, output_path: str) -> bool:
-    """プレビュー用の動画クリップを作成（高速コピーモード）"""
+def get_smart_cut_encode_options(media_info: MediaInfo, match_source: bool = True) -> Optional[Dict]:
+    """スマートカットの境界部分を再エンコードする設定
+
+    match_source=True の場合は、ストリームコピーする部分とつなげても再生できるよう、
+    元動画のプロファイル・レベル・ピクセルフォーマットに合わせる。合わせられない場合は None。
+    """
+    video_stream = media_info.video_stream
+    options = {
+        'vcodec': SMART_CUT_ENCODERS[media_info.video_codec],
+        'preset': 'veryfast',
+        'crf': 18,
+        'pix_fmt': video_stream.get('pix_fmt') or 'yuv420p'
+    }
+    if not match_source:
+        return options
+
+    profile = SMART_CUT_H264_PROFILES.get(video_stream.get('profile'))
+    level = video_stream.get('level')
+    if profile is None or not isinstance(level, int) or level <= 0 or not video_stream.get('pix_fmt'):
+        return None
+    options['profile:v'] = profile
+    options['level'] = f"{level // 10}.{level % 10}"  # ffprobeのレベルは10倍の整数（例: 41 → 4.1）
+    return options
+
+
+def encode_cut_segment(video_path: str, start: float, duration: float, output_path: str, encode_options: Dict) -> None:
+    """指定範囲の映像だけをフレーム単位で正確に再エンコード（スマートカットの境界部分用・MPEG-TS出力）
+
+    Raises:
+        ffmpeg.Error: エンコードに失敗した場合
+    """
+    (
+        ffmpeg
+        .input(video_path, ss=start, t=duration)
+        .output(
+            output_path,
+            **encode_options,
+            an=None,
+            format='mpegts',
+            loglevel='error'
+        )
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+
+
+def is_video_decodable(video_path: str, start: Optional[float] = None, duration: Optional[float] = None) -> bool:
+    """動画（start, duration を指定した場合はその範囲）をデコードし、エラーが出ないかを確認"""
+    command = ['ffmpeg', '-v', 'error']
+    if start is not None:
+        command += ['-ss', f"{max(0.0, start):.3f}"]
+    command += ['-i', video_path]
+    if duration is not None:
+        command += ['-t', f"{duration:.3f}"]
+    command += ['-map', '0:v:0', '-f', 'null', '-']
+    result = subprocess.run(command, capture_output=True, text=True)
+    return result.returncode == 0 and not result.stderr.strip()
+
+
+def create_smart_cut_clip(video_path: str, start_time: float, end_time: float, output_path: str) -> bool:
+    """キーフレームを使ってフレーム単位で正確なクリップを作成（スマートカット）
+
+    開始直後と終了直前のキーフレームの間はストリームコピーし、その外側の不完全なGOPだけを再エンコードする。
+    音声は範囲どおりに切り出して再エンコードし、連結した映像と多重化する。
+
+    再エンコード部分は元動画のプロファイル・レベルに合わせるが、SPS/PPSが完全には一致しないため、
+    つなぎ目の前後だけデコードできるかを確認し、問題があれば範囲全体を再エンコードして作り直す。
+    プロファイルなどを合わせられない場合も、最初から範囲全体を再エンコードする。
+
+    Returns:
+        スマートカットで作成した場合 True、元動画のコーデックなどの理由で適用できない場合 False
+
+    Raises:
+        ffmpeg.Error / subprocess.CalledProcessError: 切り出しに失敗した場合
+    """
+    import bisect
+
+    media_info = get_media_info(video_path)
+    if media_info.video_codec not in SMART_CUT_ENCODERS or media_info.fps <= 0:
+        return False
+
+    keyframes = media_info.keyframes
+    first_index = bisect.bisect_left(keyframes, start_time)
+    last_index = bisect.bisect_right(keyframes, end_time) - 1
+    matched_options = get_smart_cut_encode_options(media_info)
+
+    # 境界はキーフレームの半フレーム手前に置き、時刻の丸め誤差でフレームが重複・欠落しないようにする
+    half_frame = 0.5 / media_info.fps
+    full_encode = [('encode', start_time, end_time)]
+    if (
+        matched_options is None
+        or last_index < first_index
+        or keyframes[last_index] - keyframes[first_index] < SMART_CUT_MIN_COPY_SECONDS
+    ):
+        # 範囲内にコピーできるGOPがほとんどない短いクリップ（または元動画に合わせて再エンコードできない場合）は、
+        # 全体を再エンコードしても十分速い
+        parts = full_encode
+    else:
+        copy_start, copy_end = keyframes[first_index], keyframes[last_index]
+        parts = [
+            ('encode', start_time, copy_start - half_frame),
+            ('copy', copy_start, copy_end - half_frame),
+            ('encode', copy_end - half_frame, end_time)
+        ]
+
+    def build_clip(parts: List[Tuple[str, float, float]], encode_options: Dict) -> None:
+        work_dir = Path(tempfile.mkdtemp(dir=TEMP_VIDEOS_DIR, prefix="smart_cut_"))
+        try:
+            part_paths = []
+            for kind, part_start, part_end in parts:
+                if part_end - part_start < half_frame:
+                    continue  # 範囲の端がちょうどキーフレームの場合は再エンコード部分がない
+                part_path = work_dir / f"part_{len(part_paths):02d}.ts"
+                if kind == 'encode':
+                    encode_cut_segment(video_path, part_start, part_end - part_start, str(part_path), encode_options)
+                else:
+                    # キーフレームちょうどから読み始めるよう、わずかに後ろを指定する（入力側のシークは直前のキーフレームに合わせる）
+                    (
+                        ffmpeg
+                        .input(video_path, ss=part_start + 0.001, t=part_end - part_start)
+                        .output(str(part_path), vcodec='copy', an=None, format='mpegts', loglevel='error')
+                        .overwrite_output()
+                        .run(capture_stdout=True, capture_stderr=True)
+                    )
+                part_paths.append(part_path)
+
+            concat_list_path = work_dir / "concat.txt"
+            concat_list_path.write_text(''.join(f"file '{part_path.resolve()}'\n" for part_path in part_paths), encoding='utf-8')
+
+            streams = [ffmpeg.input(str(concat_list_path), format='concat', safe=0).video]
+            if media_info.has_audio:
+                streams.append(ffmpeg.input(video_path, ss=start_time, t=end_time - start_time).audio)
+            (
+                ffmpeg
+                .output(
+                    *streams,
+                    output_path,
+                    vcodec='copy',
+                    acodec='aac',
+                    audio_bitrate='192k',
+                    movflags='+faststart',
+                    loglevel='error'
+                )
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if parts is full_encode:
+        build_clip(full_encode, matched_options or get_smart_cut_encode_options(media_info, match_source=False))
+        return True
+
+    build_clip(parts, matched_options)
+    # クリップ全体はデコードせず、再エンコード部分とコピー部分のつなぎ目（出力上の時刻）の前後だけを確認する
+    splice_times = [copy_start - start_time, copy_end - start_time]
+    if not all(
+        is_video_decodable(output_path, splice_time - SMART_CUT_CHECK_SECONDS, SMART_CUT_CHECK_SECONDS * 2)
+        for splice_time in splice_times
+    ):
+        # コピー部分と再エンコード部分のパラメータの違いでデコードできない場合は、範囲全体を再エンコードする
+        print(f"スマートカットの結果をデコードできないため、範囲全体を再エンコードします: {video_path}")
+        build_clip(full_encode, get_smart_cut_encode_options(media_info, match_source=False))
+    return True
+
+
+def create_preview_clip(
+    video_path: str,
+    start_time: float,
+    end_time: float,
+    output_path: str,
+    smart_cut: bool = True
+) -> bool:
+    """プレビュー用の動画クリップを作成
+
+    smart_cut=True の場合、境界のGOPだけを再エンコードしてフレーム単位で正確に切り出す。
+    適用できない・失敗した場合は、従来の高速コピーモード（直前のキーフレームから始まる）で作成する。
+    """
+    if smart_cut:
+        try:
+            if create_smart_cut_clip(video_path, start_time, end_time, output_path):
+                return True
+        except Exception as e:
+            st.warning(f"⚠️ 正確な切り出しに失敗したため、高速コピーでプレビューを作成します: {e}")
+
     try:
         (
             ffmpeg
@@ -1346,342 +3625,812 @@ def get_background_settings(background_type: str):
         "🗨️ 角丸長方形（青）": {'mode': 'balloon', 'balloon_image': 'balloon_images/round_rect_blue.png'},
         "🗨️ 角丸長方形（緑）": {'mode': 'balloon', 'balloon_image': 'balloon_images/round_rect_green.png'},
     }
-    
-    # 該当する背景を検索
-    if background_type == "custom":
-        # カスタム背景画像モード
-        return {'mode': 'custom', 'balloon_image': None, 'box': 0, 'boxcolor': "black@0.0", 'boxborderw': 0}
-    elif background_type.startswith("カスタム（"):
-        # カスタム色の背景
-        # 例: "カスタム（#FF5733）半透明" or "カスタム（#FF5733）不透明"
-        import re
-        color_match = re.search(r'#[0-9A-Fa-f]{6}', background_type)
-        if color_match:
-            color_hex = color_match.group()
-            opacity = 0.7 if "半透明" in background_type else 1.0
-            return {
-                'mode': 'simple',
-                'balloon_image': None,
-                'box': 1,
-                'boxcolor': f"{color_hex}@{opacity}",
-                'boxborderw': 5
-            }
-        else:
-            return {'mode': 'simple', 'balloon_image': None, 'box': 0, 'boxcolor': "black@0.0", 'boxborderw': 0}
-    elif background_type in simple_backgrounds:
-        return simple_backgrounds[background_type]
-    elif background_type in balloon_backgrounds:
-        return balloon_backgrounds[background_type]
+    
+    # 該当する背景を検索
+    if background_type == "custom":
+        # カスタム背景画像モード
+        return {'mode': 'custom', 'balloon_image': None, 'box': 0, 'boxcolor': "black@0.0", 'boxborderw': 0}
+    elif background_type.startswith("カスタム（"):
+        # カスタム色の背景
+        # 例: "カスタム（#FF5733）半透明" or "カスタム（#FF5733）不透明"
+        import re
+        color_match = re.search(r'#[0-9A-Fa-f]{6}', background_type)
+        if color_match:
+            color_hex = color_match.group()
+            opacity = 0.7 if "半透明" in background_type else 1.0
+            return {
+                'mode': 'simple',
+                'balloon_image': None,
+                'box': 1,
+                'boxcolor': f"{color_hex}@{opacity}",
+                'boxborderw': 5
+            }
+        else:
+            return {'mode': 'simple', 'balloon_image': None, 'box': 0, 'boxcolor': "black@0.0", 'boxborderw': 0}
+    elif background_type in simple_backgrounds:
+        return simple_backgrounds[background_type]
+    elif background_type in balloon_backgrounds:
+        return balloon_backgrounds[background_type]
+    else:
+        # デフォルト
+        return {'mode': 'simple', 'balloon_image': None, 'box': 0, 'boxcolor': "black@0.0", 'boxborderw': 0}
+
+
+def get_encode_profile(profile_name: str) -> Dict:
+    """名前からエンコードプロファイルを取得（不明な名前は標準プロファイル）"""
+    return ENCODE_PROFILES.get(profile_name, ENCODE_PROFILES[DEFAULT_ENCODE_PROFILE])
+
+
+def get_encode_output_options(profile_name: str) -> Dict:
+    """エンコードプロファイルから ffmpeg.output に渡す出力オプションを作成"""
+    profile = get_encode_profile(profile_name)
+    options = {
+        'vcodec': 'libx264',
+        'acodec': 'aac',
+        'preset': profile['preset'],
+        'audio_bitrate': profile['audio_bitrate'],
+        'movflags': '+faststart'  # メタデータを先頭に置き、ダウンロード完了前から再生できるようにする
+    }
+    for key in ('crf', 'video_bitrate', 'maxrate', 'bufsize', 'tune', 'g'):
+        if profile.get(key) is not None:
+            options[key] = profile[key]
+    if ENCODE_THREADS > 0:
+        options['threads'] = ENCODE_THREADS
+    return options
+
+
+def scale_geometry(value, factor: float):
+    """位置のピクセル値・式をプロキシ解像度に合わせて拡大縮小
+
+    式中の数値のうち、割る数・掛ける数（例: "(w-text_w)/2" の2）はそのまま残し、
+    ピクセル単位の値（例: "h-text_h-50" の50）だけを factor 倍する。
+    """
+    if factor == 1.0:
+        return value
+    if isinstance(value, (int, float)):
+        return int(round(value * factor))
+
+    expr = str(value)
+
+    def scale_literal(match):
+        before = expr[:match.start()].rstrip()
+        after = expr[match.end():].lstrip()
+        if before.endswith(('/', '*')) or after.startswith('*'):
+            return match.group(0)
+        return str(int(round(float(match.group(0)) * factor)))
+
+    return re.sub(r'(?<![\w.])\d+(?:\.\d+)?(?![\w.])', scale_literal, expr)
+
+
+def escape_drawtext_text(text: str) -> str:
+    """テキストのエスケープ処理（FFmpegのdrawtextフィルタ用）"""
+    escaped_text = text.replace("\\", "\\\\\\\\")
+    escaped_text = escaped_text.replace("'", "'\\\\''")
+    escaped_text = escaped_text.replace(":", "\\:")
+    escaped_text = escaped_text.replace("\n", " ")
+    return escaped_text
+
+
+def parse_ffmpeg_color(color: str) -> Tuple[int, int, int, int]:
+    """FFmpeg形式の色指定（"white", "#FF5733", "0xFF5733", "black@0.5" など）をRGBAに変換"""
+    from PIL import ImageColor
+
+    color, _, alpha = str(color).strip().partition('@')
+    if color.lower().startswith('0x'):
+        color = '#' + color[2:]
+    rgba = ImageColor.getcolor(color, 'RGBA')
+
+    if alpha:
+        try:
+            opacity = float(alpha)
+        except ValueError:
+            opacity = 1.0
+        rgba = rgba[:3] + (int(round(rgba[3] * min(1.0, max(0.0, opacity)))),)
+    return rgba
+
+
+def rasterize_text_layer(
+    text: str,
+    font_path: str,
+    font_size: int,
+    color: str,
+    box_color: Optional[str] = None,
+    box_border: int = 0,
+    shadow_color: Optional[str] = None,
+    shadow_offset: int = 0
+) -> Tuple[str, int, int]:
+    """テキストをPillowで透過PNGに1回だけ描画し、内容ハッシュでキャッシュ
+
+    drawtext のように毎フレーム文字を描画せず、overlay で画像を重ねるだけにするため。
+    PNGは左上から box_border の余白（背景ボックス）を取り、影の分だけ右下に広げる。
+
+    Returns:
+        (PNGのパス, 背景ボックスの余白, 影のずれ)
+    """
+    import hashlib
+
+    text = text.replace("\n", " ")  # drawtextと同じく改行は空白として1行で描画
+    padding = max(0, int(box_border)) if box_color else 0
+    shadow_offset = max(0, int(shadow_offset)) if shadow_color else 0
+
+    payload = json.dumps(
+        {
+            'text': text,
+            'font_sha256': compute_file_hash(font_path),
+            'font_size': int(font_size),
+            'color': color,
+            'box_color': box_color,
+            'box_border': padding,
+            'shadow_color': shadow_color if shadow_offset else None,
+            'shadow_offset': shadow_offset
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    cache_path = TEXT_LAYER_CACHE_DIR / f"{hashlib.sha256(payload.encode('utf-8')).hexdigest()}.png"
+    if cache_path.exists():
+        os.utime(cache_path, None)
+        return str(cache_path.absolute()).replace("\\", "/"), padding, shadow_offset
+
+    from PIL import Image, ImageDraw, ImageFont
+
+    font = ImageFont.truetype(font_path, int(font_size))
+    left, top, right, bottom = font.getbbox(text)
+    text_width = max(1, right - left)
+    text_height = max(1, bottom - top)
+    size = (text_width + padding * 2 + shadow_offset, text_height + padding * 2 + shadow_offset)
+
+    def render_text(position, fill):
+        # 文字の形をマスクに描いてから色を付け、アンチエイリアスの縁を正しい透明度にする
+        mask = Image.new('L', size, 0)
+        ImageDraw.Draw(mask).text(position, text, font=font, fill=255)
+        layer = Image.new('RGBA', size, fill[:3] + (0,))
+        layer.putalpha(mask.point(lambda value: value * fill[3] // 255))
+        return layer
+
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    if box_color:
+        ImageDraw.Draw(image).rectangle(
+            [0, 0, text_width + padding * 2 - 1, text_height + padding * 2 - 1],
+            fill=parse_ffmpeg_color(box_color)
+        )
+    origin = (padding - left, padding - top)
+    if shadow_offset:
+        shadow_position = (origin[0] + shadow_offset, origin[1] + shadow_offset)
+        image = Image.alpha_composite(image, render_text(shadow_position, parse_ffmpeg_color(shadow_color)))
+    image = Image.alpha_composite(image, render_text(origin, parse_ffmpeg_color(color)))
+
+    tmp_path = cache_path.with_suffix('.tmp')
+    try:
+        image.save(tmp_path, format='PNG')
+        os.replace(tmp_path, cache_path)
+        evict_lru_cache(TEXT_LAYER_CACHE_DIR, TEXT_LAYER_CACHE_MAX_BYTES, pattern="*.png")
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return str(cache_path.absolute()).replace("\\", "/"), padding, shadow_offset
+
+
+def drawtext_position_to_overlay(value, padding: int = 0, shadow_offset: int = 0) -> str:
+    """drawtext用の位置式（text_w / text_h / w / h）を overlay 用の式に変換
+
+    ラスタライズしたPNGは背景ボックスの余白と影の分だけ文字より大きいため、
+    overlay_w / overlay_h から差し引いて文字の大きさに戻し、余白の分だけ左上にずらす。
+    """
+    extra = padding * 2 + shadow_offset
+    replacements = {
+        'text_w': f"(overlay_w-{extra})" if extra else "overlay_w",
+        'text_h': f"(overlay_h-{extra})" if extra else "overlay_h",
+        'w': "main_w",
+        'h': "main_h"
+    }
+    expr = re.sub(r'\b(text_w|text_h|w|h)\b', lambda match: replacements[match.group(1)], str(value))
+    return f"({expr})-{padding}" if padding else expr
+
+
+def draw_text_layer(
+    video_stream,
+    text: str,
+    font_path: str,
+    font_size: int,
+    color: str,
+    x,
+    y,
+    enable: Optional[str] = None,
+    alpha: str = '1.0',
+    fades: Optional[List[Tuple[str, float]]] = None,
+    box_color: Optional[str] = None,
+    box_border: int = 0,
+    shadow_color: Optional[str] = None,
+    shadow_offset: int = 0,
+    clip_duration: Optional[float] = None,
+    time_offset: float = 0.0,
+    segment_duration: Optional[float] = None
+):
+    """テキストを動画に重ねる（ラスタライズ済みPNGを overlay で合成）
+
+    x, y は drawtext と同じ式で指定する。フェードは fades に
+    [('in' / 'out', クリップ先頭からの開始時刻), ...] を渡し、PNGのアルファに fade フィルターをかける
+    （その場合は clip_duration が必要）。区間ごとに並列レンダリングするときは time_offset と
+    segment_duration で区間を切り出す。
+    Pillowやフォントが使えない場合は drawtext（alpha はそのときだけ使う）で描画する。
+    """
+    try:
+        image_path, padding, shadow_offset_px = rasterize_text_layer(
+            text, font_path, font_size, color,
+            box_color=box_color, box_border=box_border,
+            shadow_color=shadow_color, shadow_offset=shadow_offset
+        )
+    except Exception as e:
+        print(f"テキストのラスタライズに失敗したため drawtext で描画します: {e}")
+        options = {'text': escape_drawtext_text(text), 'fontfile': font_path, 'fontsize': font_size, 'fontcolor': color, 'x': x, 'y': y}
+        if alpha != '1.0':
+            options['alpha'] = alpha
+        if box_color:
+            options.update(box=1, boxcolor=box_color, boxborderw=box_border)
+        if shadow_color and shadow_offset:
+            options.update(shadowcolor=shadow_color, shadowx=shadow_offset, shadowy=shadow_offset)
+        if enable:
+            options['enable'] = enable
+        return video_stream.filter('drawtext', **options)
+
+    if fades:
+        # フェードは毎フレームのアルファが必要なので、静止画をクリップの長さだけループさせる
+        text_stream = ffmpeg.input(image_path, loop=1, t=clip_duration)
+        for fade_type, fade_start in fades:
+            text_stream = text_stream.filter(
+                'fade', type=fade_type, start_time=max(0.0, fade_start),
+                duration=TEXT_LAYER_FADE_SECONDS, alpha=1
+            )
+        if segment_duration is not None:
+            text_stream = text_stream.trim(start=time_offset, duration=segment_duration).setpts('PTS-STARTPTS')
     else:
-        # デフォルト
-        return {'mode': 'simple', 'balloon_image': None, 'box': 0, 'boxcolor': "black@0.0", 'boxborderw': 0}
+        # 1枚の画像は overlay が最後のフレームを保持し続けるため、ループ不要
+        text_stream = ffmpeg.input(image_path)
+
+    overlay_options = {
+        'x': drawtext_position_to_overlay(x, padding, shadow_offset_px),
+        'y': drawtext_position_to_overlay(y, padding, shadow_offset_px),
+        'format': 'auto'
+    }
+    if enable:
+        overlay_options['enable'] = enable
+    return video_stream.overlay(text_stream, **overlay_options)
 
 
-def generate_professional_video(
+def apply_profile_downscale(video_stream, video_path: str, profile: Dict) -> Tuple[object, float]:
+    """エンコードプロファイルの max_height / max_fps に合わせて入力を縮小・間引き
+
+    縮小してから以降のフィルターを適用すると、小さいフレームで処理できる。
+
+    Returns:
+        (映像ストリーム, レイヤーの位置・サイズに掛ける縮小率)
+    """
+    geometry_scale = 1.0
+    max_height = profile.get('max_height')
+    max_fps = profile.get('max_fps')
+    if max_height or max_fps:
+        media_info = get_media_info(video_path)
+        if max_height and media_info.height > max_height:
+            geometry_scale = max_height / media_info.height
+            video_stream = video_stream.filter('scale', -2, max_height)
+        if max_fps and media_info.fps > max_fps:
+            video_stream = video_stream.filter('fps', fps=max_fps)
+    return video_stream, geometry_scale
+
+
+def split_clip_at_keyframes(
+    media_info: MediaInfo,
+    start_time: float,
+    end_time: float,
+    num_segments: int
+) -> List[Tuple[float, float]]:
+    """クリップをなるべく等しい長さの区間に分割（境界は目標位置に最も近いキーフレーム）
+
+    境界はキーフレームの時刻ちょうどに置く。キーフレームから始まる区間は、入力側のシークで
+    前のGOPをデコードせずに済む（丸め誤差の扱いは render_professional_video_parallel の出力側のtrimで行う）。
+
+    Returns:
+        [(区間の開始時刻, 終了時刻), ...]（元動画の時刻）
+    """
+    import bisect
+
+    keyframes = media_info.keyframes
+    boundaries = [start_time]
+    for i in range(1, num_segments):
+        target = start_time + (end_time - start_time) * i / num_segments
+        index = bisect.bisect_left(keyframes, target)
+        candidates = keyframes[max(0, index - 1):index + 1]
+        if not candidates:
+            continue
+        boundary = min(candidates, key=lambda keyframe: abs(keyframe - target))
+        if boundaries[-1] + RENDER_PARALLEL_MIN_SEGMENT_SECONDS <= boundary <= end_time - RENDER_PARALLEL_MIN_SEGMENT_SECONDS:
+            boundaries.append(boundary)
+    boundaries.append(end_time)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def render_professional_video_parallel(
     video_path: str,
     start_time: float,
     end_time: float,
     output_path: str,
+    segments: List[Tuple[float, float]],
     layers: List[Dict],
     effects: Dict,
-    audio_settings: Dict
-) -> bool:
-    """プロフェッショナル動画編集（Phase 1-5統合版）"""
+    audio_settings: Dict,
+    encode_profile: str = DEFAULT_ENCODE_PROFILE
+) -> None:
+    """区間ごとに同じフィルターグラフで映像を並列にエンコードし、concat demuxerで無劣化連結して音声と多重化
+
+    レイヤーの表示時刻は区間ごとにずらすため、1回でレンダリングした場合と同じ位置に表示される。
+    音声（BGM・フェード）はクリップ全体を1回で処理する。
+
+    Raises:
+        ffmpeg.Error: いずれかの区間のエンコード、または連結に失敗した場合
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    profile = get_encode_profile(encode_profile)
+    clip_duration = end_time - start_time
+
+    # 区間の映像は音声なしのMPEG-TSで出力し（SPS/PPSを各区間に含める）、音声関連の設定は最後の多重化で使う
+    output_options = get_encode_output_options(encode_profile)
+    segment_options = {key: value for key, value in output_options.items() if key not in ('acodec', 'audio_bitrate', 'movflags')}
+    # 同時に動くFFmpegの合計スレッド数が ENCODE_THREADS（未設定ならコア数）程度に収まるよう、区間数で分ける
+    segment_options['threads'] = max(1, (ENCODE_THREADS or os.cpu_count() or 1) // len(segments))
+
+    media_info = get_media_info(video_path)
+    half_frame = 0.5 / media_info.fps if media_info.fps > 0 else 0.0
+
+    work_dir = Path(tempfile.mkdtemp(dir=TEMP_VIDEOS_DIR, prefix="parallel_render_"))
     try:
-        import streamlit as st
-        
-        # 入力動画
+        def render_segment(index: int, segment_start: float, segment_end: float) -> Path:
+            segment_path = work_dir / f"segment_{index:03d}.ts"
+            segment_duration = segment_end - segment_start
+            if index == 0:
+                # 先頭の区間はクリップの開始位置から（キーフレームとは限らないため通常の正確なシーク）
+                input_stream = ffmpeg.input(video_path, ss=segment_start, t=segment_duration)
+            else:
+                # 区間の開始はキーフレームなので、わずかに後ろを指定して正確なシークを無効にし、
+                # そのキーフレームから読み始める（前のGOPをデコードして捨てない）
+                input_stream = ffmpeg.input(video_path, ss=segment_start + 0.001, t=segment_duration + 1.0, noaccurate_seek=None)
+            # 次の区間の先頭（キーフレーム）を含めないよう半フレーム手前で切る（最後の区間はクリップの終了位置まで）
+            trim_end = segment_duration - half_frame if index < len(segments) - 1 else segment_duration
+            source_stream = input_stream.video.filter('setpts', 'PTS-STARTPTS').trim(end=trim_end).setpts('PTS-STARTPTS')
+            video_stream, geometry_scale = apply_profile_downscale(source_stream, video_path, profile)
+            video_stream = build_professional_video_filters(
+                video_stream, layers, effects, clip_duration, geometry_scale,
+                time_offset=segment_start - start_time,
+                segment_duration=segment_duration
+            )
+            (
+                ffmpeg
+                .output(video_stream, str(segment_path), format='mpegts', **segment_options, loglevel='warning')
+                .overwrite_output()
+                .run(capture_stdout=True, capture_stderr=True)
+            )
+            return segment_path
+
+        # FFmpegは別プロセスで動くため、スレッドから起動するだけで並列にエンコードされる
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            futures = [
+                executor.submit(render_segment, index, segment_start, segment_end)
+                for index, (segment_start, segment_end) in enumerate(segments)
+            ]
+            segment_paths = [future.result() for future in futures]
+
+        concat_list_path = work_dir / "concat.txt"
+        concat_list_path.write_text(''.join(f"file '{path.resolve()}'\n" for path in segment_paths), encoding='utf-8')
+
         input_stream = ffmpeg.input(video_path, ss=start_time, to=end_time)
-        video_stream = input_stream.video
-        audio_stream = input_stream.audio
-        
-        # エフェクト
-        speed = effects.get('speed', 1.0)
-        brightness = effects.get('brightness', 0.0)
-        contrast = effects.get('contrast', 1.0)
-        saturation = effects.get('saturation', 1.0)
-        
-        # 速度調整
-        if speed != 1.0:
-            video_stream = video_stream.filter('setpts', f'{1/speed}*PTS')
-            if speed <= 2.0:  # 2倍速以下の場合のみ音声も調整
-                audio_stream = audio_stream.filter('atempo', speed)
-        
-        # カラーフィルター
-        if brightness != 0.0 or contrast != 1.0 or saturation != 1.0:
-            video_stream = video_stream.filter('eq', brightness=brightness, contrast=contrast, saturation=saturation)
-        
-        # ステッカー・画像
-        sticker_layers = [l for l in layers if l['type'] == 'sticker']
-        for sticker in sticker_layers:
-            sticker_path = str(Path(sticker['path']).absolute()).replace("\\", "/")
-            sticker_stream = ffmpeg.input(sticker_path, loop=1, t=end_time - start_time)
-            
-            # スケール調整
-            scale = sticker.get('scale', 1.0)
-            if scale != 1.0:
-                sticker_stream = sticker_stream.filter('scale', f'iw*{scale}', f'ih*{scale}')
-            
-            # アニメーション適用
-            animation = sticker.get('animation', 'none')
-            overlay_x = sticker['x']
-            overlay_y = sticker['y']
-            enable_expr = f"between(t,{sticker['start']},{sticker['end']})"
-            
-            # アニメーション
-            if animation == 'fade_in':
-                sticker_stream = sticker_stream.filter('fade', type='in', start_time=0, duration=0.5)
-            elif animation == 'fade_out':
-                duration = sticker['end'] - sticker['start']
-                sticker_stream = sticker_stream.filter('fade', type='out', start_time=max(0, duration - 0.5), duration=0.5)
-            elif animation == 'fade_in_out':
-                duration = sticker['end'] - sticker['start']
-                sticker_stream = sticker_stream.filter('fade', type='in', start_time=0, duration=0.5)
-                sticker_stream = sticker_stream.filter('fade', type='out', start_time=max(0, duration - 0.5), duration=0.5)
-            elif animation == 'slide_in_left':
-                overlay_x = f"if(lt(t-{sticker['start']},0.5),-w+(t-{sticker['start']})*w/0.5,{overlay_x})"
-            elif animation == 'slide_in_right':
-                overlay_x = f"if(lt(t-{sticker['start']},0.5),main_w-(t-{sticker['start']})*w/0.5,{overlay_x})"
-            elif animation == 'slide_in_top':
-                overlay_y = f"if(lt(t-{sticker['start']},0.5),-h+(t-{sticker['start']})*h/0.5,{overlay_y})"
-            elif animation == 'slide_in_bottom':
-                overlay_y = f"if(lt(t-{sticker['start']},0.5),main_h-(t-{sticker['start']})*h/0.5,{overlay_y})"
-            
-            video_stream = video_stream.overlay(
-                sticker_stream,
-                x=overlay_x,
-                y=overlay_y,
-                enable=enable_expr,
-                format='auto'
+        audio_stream = build_professional_audio_filters(input_stream.audio, effects, audio_settings, clip_duration)
+        (
+            ffmpeg
+            .output(
+                ffmpeg.input(str(concat_list_path), format='concat', safe=0).video,
+                audio_stream,
+                output_path,
+                vcodec='copy',
+                acodec=output_options['acodec'],
+                audio_bitrate=output_options['audio_bitrate'],
+                movflags=output_options['movflags'],
+                loglevel='warning'
             )
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def build_professional_video_filters(
+    video_stream,
+    layers: List[Dict],
+    effects: Dict,
+    clip_duration: float,
+    geometry_scale: float = 1.0,
+    time_offset: float = 0.0,
+    segment_duration: Optional[float] = None
+):
+    """プロフェッショナル編集の映像フィルター（エフェクト・ステッカー・テキストレイヤー）を適用
+
+    segment_duration を指定した場合は、クリップ先頭から time_offset 秒の位置から始まる区間として扱い、
+    レイヤーの表示時刻を区間内の時刻にずらす（分割レンダリング用）。
+    """
+    if segment_duration is not None:
+        # 区間と重ならないレイヤーは入力ごと省く
+        layers = [
+            {**layer, 'start': layer['start'] - time_offset, 'end': layer['end'] - time_offset}
+            for layer in layers
+            if layer['end'] > time_offset and layer['start'] < time_offset + segment_duration
+        ]
+    
+    # エフェクト
+    speed = effects.get('speed', 1.0)
+    brightness = effects.get('brightness', 0.0)
+    contrast = effects.get('contrast', 1.0)
+    saturation = effects.get('saturation', 1.0)
+    
+    # 速度調整
+    if speed != 1.0:
+        video_stream = video_stream.filter('setpts', f'{1/speed}*PTS')
+    
+    # カラーフィルター
+    if brightness != 0.0 or contrast != 1.0 or saturation != 1.0:
+        video_stream = video_stream.filter('eq', brightness=brightness, contrast=contrast, saturation=saturation)
+    
+    # ステッカー・画像
+    sticker_layers = [l for l in layers if l['type'] == 'sticker']
+    for sticker in sticker_layers:
+        sticker_path = str(Path(sticker['path']).absolute()).replace("\\", "/")
+        sticker_stream = ffmpeg.input(sticker_path, loop=1, t=clip_duration)
+        
+        # スケール調整
+        scale = sticker.get('scale', 1.0) * geometry_scale
+        if scale != 1.0:
+            sticker_stream = sticker_stream.filter('scale', f'iw*{scale}', f'ih*{scale}')
+        
+        # アニメーション適用
+        animation = sticker.get('animation', 'none')
+        overlay_x = scale_geometry(sticker['x'], geometry_scale)
+        overlay_y = scale_geometry(sticker['y'], geometry_scale)
+        enable_expr = f"between(t,{sticker['start']},{sticker['end']})"
+        
+        # アニメーション
+        if animation == 'fade_in':
+            sticker_stream = sticker_stream.filter('fade', type='in', start_time=0, duration=0.5)
+        elif animation == 'fade_out':
+            duration = sticker['end'] - sticker['start']
+            sticker_stream = sticker_stream.filter('fade', type='out', start_time=max(0, duration - 0.5), duration=0.5)
+        elif animation == 'fade_in_out':
+            duration = sticker['end'] - sticker['start']
+            sticker_stream = sticker_stream.filter('fade', type='in', start_time=0, duration=0.5)
+            sticker_stream = sticker_stream.filter('fade', type='out', start_time=max(0, duration - 0.5), duration=0.5)
+        elif animation == 'slide_in_left':
+            overlay_x = f"if(lt(t-{sticker['start']},0.5),-w+(t-{sticker['start']})*w/0.5,{overlay_x})"
+        elif animation == 'slide_in_right':
+            overlay_x = f"if(lt(t-{sticker['start']},0.5),main_w-(t-{sticker['start']})*w/0.5,{overlay_x})"
+        elif animation == 'slide_in_top':
+            overlay_y = f"if(lt(t-{sticker['start']},0.5),-h+(t-{sticker['start']})*h/0.5,{overlay_y})"
+        elif animation == 'slide_in_bottom':
+            overlay_y = f"if(lt(t-{sticker['start']},0.5),main_h-(t-{sticker['start']})*h/0.5,{overlay_y})"
+        
+        if segment_duration is not None:
+            # ステッカーの入力はクリップの先頭から始まるため、フェードを適用した後にこの区間だけを切り出す
+            sticker_stream = sticker_stream.trim(start=time_offset, duration=segment_duration).setpts('PTS-STARTPTS')
+        
+        video_stream = video_stream.overlay(
+            sticker_stream,
+            x=overlay_x,
+            y=overlay_y,
+            enable=enable_expr,
+            format='auto'
+        )
+    
+    # テキストレイヤー
+    text_layers = [l for l in layers if l['type'] == 'text']
+    for text_layer in text_layers:
+        # テキスト位置の計算（プリセットまたは数値指定）
+        is_preset = text_layer.get('is_preset_position', False)
+        position_preset = text_layer.get('position_preset')
+        
+        # 🎯 プリセット位置の場合、drawtextとoverlayで同じ位置計算を使用
+        if is_preset and position_preset:
+            # drawtextフィルター用のテキスト位置
+            if position_preset == "下部中央":
+                text_x = "(w-text_w)/2"
+                text_y = "h-text_h-50"
+            elif position_preset == "上部中央":
+                text_x = "(w-text_w)/2"
+                text_y = "50"
+            elif position_preset == "中央":
+                text_x = "(w-text_w)/2"
+                text_y = "(h-text_h)/2"
+            elif position_preset == "左上":
+                text_x = "50"
+                text_y = "50"
+            elif position_preset == "右上":
+                text_x = "w-text_w-50"
+                text_y = "50"
+            elif position_preset == "左下":
+                text_x = "50"
+                text_y = "h-text_h-50"
+            elif position_preset == "右下":
+                text_x = "w-text_w-50"
+                text_y = "h-text_h-50"
+            else:
+                # フォールバック: 中央
+                text_x = "(w-text_w)/2"
+                text_y = "(h-text_h)/2"
+        else:
+            # 数値指定の場合
+            text_x = text_layer['x']
+            text_y = text_layer['y']
         
-        # テキストレイヤー
-        text_layers = [l for l in layers if l['type'] == 'text']
-        for text_layer in text_layers:
-            # テキスト位置の計算（プリセットまたは数値指定）
-            is_preset = text_layer.get('is_preset_position', False)
-            position_preset = text_layer.get('position_preset')
+        # 背景画像がある場合、先に背景を配置
+        bg_image_path = text_layer.get('background_image')
+        if bg_image_path and Path(bg_image_path).exists():
+            bg_stream = ffmpeg.input(str(Path(bg_image_path).absolute()).replace("\\", "/"), loop=1, t=segment_duration or clip_duration)
+            
+            # 背景画像のスケール調整
+            bg_scale = text_layer.get('background_scale', 1.0) * geometry_scale
+            if bg_scale != 1.0:
+                bg_stream = bg_stream.filter('scale', f'iw*{bg_scale}', f'ih*{bg_scale}')
+            
+            # 背景の透明度調整
+            bg_opacity = text_layer.get('background_opacity', 1.0)
+            if bg_opacity < 1.0:
+                bg_stream = bg_stream.filter('format', 'yuva420p').filter('colorchannelmixer', aa=bg_opacity)
             
-            # 🎯 プリセット位置の場合、drawtextとoverlayで同じ位置計算を使用
+            # 🎯 背景画像の位置: テキストと完全に同じ位置プリセットを使用
+            bg_x_offset = text_layer.get('background_x_offset', 0)
+            bg_y_offset = text_layer.get('background_y_offset', 0)
+            
+            # プリセット位置の場合、背景もテキストと同じ位置に
             if is_preset and position_preset:
-                # drawtextフィルター用のテキスト位置
+                # overlayフィルター用の背景位置（テキストと同じ位置ロジック）
                 if position_preset == "下部中央":
-                    text_x = "(w-text_w)/2"
-                    text_y = "h-text_h-50"
+                    bg_x = f"(main_w-overlay_w)/2+{bg_x_offset}"
+                    bg_y = f"main_h-overlay_h-50+{bg_y_offset}"
                 elif position_preset == "上部中央":
-                    text_x = "(w-text_w)/2"
-                    text_y = "50"
+                    bg_x = f"(main_w-overlay_w)/2+{bg_x_offset}"
+                    bg_y = f"50+{bg_y_offset}"
                 elif position_preset == "中央":
-                    text_x = "(w-text_w)/2"
-                    text_y = "(h-text_h)/2"
+                    bg_x = f"(main_w-overlay_w)/2+{bg_x_offset}"
+                    bg_y = f"(main_h-overlay_h)/2+{bg_y_offset}"
                 elif position_preset == "左上":
-                    text_x = "50"
-                    text_y = "50"
+                    bg_x = f"50+{bg_x_offset}"
+                    bg_y = f"50+{bg_y_offset}"
                 elif position_preset == "右上":
-                    text_x = "w-text_w-50"
-                    text_y = "50"
+                    bg_x = f"main_w-overlay_w-50+{bg_x_offset}"
+                    bg_y = f"50+{bg_y_offset}"
                 elif position_preset == "左下":
-                    text_x = "50"
-                    text_y = "h-text_h-50"
+                    bg_x = f"50+{bg_x_offset}"
+                    bg_y = f"main_h-overlay_h-50+{bg_y_offset}"
                 elif position_preset == "右下":
-                    text_x = "w-text_w-50"
-                    text_y = "h-text_h-50"
+                    bg_x = f"main_w-overlay_w-50+{bg_x_offset}"
+                    bg_y = f"main_h-overlay_h-50+{bg_y_offset}"
                 else:
-                    # フォールバック: 中央
-                    text_x = "(w-text_w)/2"
-                    text_y = "(h-text_h)/2"
+                    bg_x = f"(main_w-overlay_w)/2+{bg_x_offset}"
+                    bg_y = f"(main_h-overlay_h)/2+{bg_y_offset}"
             else:
-                # 数値指定の場合
-                text_x = text_layer['x']
-                text_y = text_layer['y']
-            
-            # 背景画像がある場合、先に背景を配置
-            bg_image_path = text_layer.get('background_image')
-            if bg_image_path and Path(bg_image_path).exists():
-                bg_stream = ffmpeg.input(str(Path(bg_image_path).absolute()).replace("\\", "/"), loop=1, t=end_time - start_time)
-                
-                # 背景画像のスケール調整
-                bg_scale = text_layer.get('background_scale', 1.0)
-                if bg_scale != 1.0:
-                    bg_stream = bg_stream.filter('scale', f'iw*{bg_scale}', f'ih*{bg_scale}')
-                
-                # 背景の透明度調整
-                bg_opacity = text_layer.get('background_opacity', 1.0)
-                if bg_opacity < 1.0:
-                    bg_stream = bg_stream.filter('format', 'yuva420p').filter('colorchannelmixer', aa=bg_opacity)
-                
-                # 🎯 背景画像の位置: テキストと完全に同じ位置プリセットを使用
-                bg_x_offset = text_layer.get('background_x_offset', 0)
-                bg_y_offset = text_layer.get('background_y_offset', 0)
-                
-                # プリセット位置の場合、背景もテキストと同じ位置に
-                if is_preset and position_preset:
-                    # overlayフィルター用の背景位置（テキストと同じ位置ロジック）
-                    if position_preset == "下部中央":
-                        bg_x = f"(main_w-overlay_w)/2+{bg_x_offset}"
-                        bg_y = f"main_h-overlay_h-50+{bg_y_offset}"
-                    elif position_preset == "上部中央":
-                        bg_x = f"(main_w-overlay_w)/2+{bg_x_offset}"
-                        bg_y = f"50+{bg_y_offset}"
-                    elif position_preset == "中央":
-                        bg_x = f"(main_w-overlay_w)/2+{bg_x_offset}"
-                        bg_y = f"(main_h-overlay_h)/2+{bg_y_offset}"
-                    elif position_preset == "左上":
-                        bg_x = f"50+{bg_x_offset}"
-                        bg_y = f"50+{bg_y_offset}"
-                    elif position_preset == "右上":
-                        bg_x = f"main_w-overlay_w-50+{bg_x_offset}"
-                        bg_y = f"50+{bg_y_offset}"
-                    elif position_preset == "左下":
-                        bg_x = f"50+{bg_x_offset}"
-                        bg_y = f"main_h-overlay_h-50+{bg_y_offset}"
-                    elif position_preset == "右下":
-                        bg_x = f"main_w-overlay_w-50+{bg_x_offset}"
-                        bg_y = f"main_h-overlay_h-50+{bg_y_offset}"
-                    else:
-                        bg_x = f"(main_w-overlay_w)/2+{bg_x_offset}"
-                        bg_y = f"(main_h-overlay_h)/2+{bg_y_offset}"
-                else:
-                    # 数値指定の場合: テキスト位置に背景を合わせる
-                    try:
-                        text_x_num = int(str(text_x))
-                        text_y_num = int(str(text_y))
-                        # 背景の中心にテキストが来るように調整
-                        bg_x = f"{text_x_num + bg_x_offset}"
-                        bg_y = f"{text_y_num + bg_y_offset}"
-                    except:
-                        bg_x = f"{text_x}+{bg_x_offset}"
-                        bg_y = f"{text_y}+{bg_y_offset}"
-                
-                bg_enable_expr = f"between(t,{text_layer['start']},{text_layer['end']})"
-                
-                video_stream = video_stream.overlay(
-                    bg_stream,
-                    x=bg_x,
-                    y=bg_y,
-                    enable=bg_enable_expr,
-                    format='auto'
-                )
+                # 数値指定の場合: テキスト位置に背景を合わせる
+                try:
+                    text_x_num = int(str(text_x))
+                    text_y_num = int(str(text_y))
+                    # 背景の中心にテキストが来るように調整
+                    bg_x = f"{text_x_num + bg_x_offset}"
+                    bg_y = f"{text_y_num + bg_y_offset}"
+                except:
+                    bg_x = f"{text_x}+{bg_x_offset}"
+                    bg_y = f"{text_y}+{bg_y_offset}"
             
-            # フォントパス（レイヤーに指定されたフォントを使用）
-            font_file = text_layer.get('font_file', 'Noto_Sans_JP.ttf')
-            font_path = str(FONTS_DIR / font_file).replace("\\", "/")
-            
-            # テキストのエスケープ
-            escaped_text = text_layer['content'].replace("\\", "\\\\\\\\")
-            escaped_text = escaped_text.replace("'", "'\\\\''")
-            escaped_text = escaped_text.replace(":", "\\:")
-            escaped_text = escaped_text.replace("\n", " ")
-            
-            # アニメーション適用（text_x, text_yは既に上で計算済み）
-            animation = text_layer.get('animation', 'none')
-            text_alpha = '1.0'
-            
-            # テキストアニメーション
-            if animation == 'fade_in':
-                # フェードイン: 最初の0.5秒で透明度を0→1
-                text_alpha = f"if(lt(t-{text_layer['start']},0.5),(t-{text_layer['start']})/0.5,1)"
-            elif animation == 'fade_out':
-                # フェードアウト: 最後の0.5秒で透明度を1→0
-                duration = text_layer['end'] - text_layer['start']
-                text_alpha = f"if(gt(t-{text_layer['start']},{duration-0.5}),1-((t-{text_layer['start']})-{duration-0.5})/0.5,1)"
-            elif animation == 'fade_in_out':
-                duration = text_layer['end'] - text_layer['start']
-                text_alpha = f"if(lt(t-{text_layer['start']},0.5),(t-{text_layer['start']})/0.5,if(gt(t-{text_layer['start']},{duration-0.5}),1-((t-{text_layer['start']})-{duration-0.5})/0.5,1))"
-            elif animation == 'slide_in_left':
-                text_x = f"if(lt(t-{text_layer['start']},0.5),-text_w+(t-{text_layer['start']})*text_w/0.5,{text_x})"
-            elif animation == 'slide_in_right':
-                text_x = f"if(lt(t-{text_layer['start']},0.5),w-(t-{text_layer['start']})*text_w/0.5,{text_x})"
-            elif animation == 'slide_in_top':
-                text_y = f"if(lt(t-{text_layer['start']},0.5),-text_h+(t-{text_layer['start']})*text_h/0.5,{text_y})"
-            elif animation == 'slide_in_bottom':
-                text_y = f"if(lt(t-{text_layer['start']},0.5),h-(t-{text_layer['start']})*text_h/0.5,{text_y})"
-            
-            enable_expr = f"between(t,{text_layer['start']},{text_layer['end']})"
-            
-            video_stream = video_stream.filter(
-                'drawtext',
-                text=escaped_text,
-                fontfile=font_path,
-                fontsize=text_layer['font_size'],
-                fontcolor=text_layer['color'],
-                x=text_x,
-                y=text_y,
-                alpha=text_alpha,
-                enable=enable_expr
+            bg_enable_expr = f"between(t,{text_layer['start']},{text_layer['end']})"
+            
+            video_stream = video_stream.overlay(
+                bg_stream,
+                x=scale_geometry(bg_x, geometry_scale),
+                y=scale_geometry(bg_y, geometry_scale),
+                enable=bg_enable_expr,
+                format='auto'
             )
         
-        # オーディオ処理
-        video_duration = end_time - start_time
+        # フォントパス（レイヤーに指定されたフォントを使用）
+        font_file = text_layer.get('font_file', 'Noto_Sans_JP.ttf')
+        font_path = str(FONTS_DIR / font_file).replace("\\", "/")
         
-        # 🆕 元動画の音声に自動フェード効果を適用
-        auto_audio_fade = audio_settings.get('auto_audio_fade', True)
-        if auto_audio_fade and video_duration > 4.0:  # 4秒以上の動画のみ適用
-            # フェードイン（開始2秒）
-            audio_stream = audio_stream.filter('afade', type='in', start_time=0, duration=2.0)
-            # フェードアウト（終了2秒）
-            if video_duration > 2.0:
-                fade_out_start = video_duration - 2.0
-                audio_stream = audio_stream.filter('afade', type='out', start_time=fade_out_start, duration=2.0)
+        # アニメーション適用（text_x, text_yは既に上で計算済み）
+        text_x = scale_geometry(text_x, geometry_scale)
+        text_y = scale_geometry(text_y, geometry_scale)
+        animation = text_layer.get('animation', 'none')
+        text_alpha = '1.0'
+        # ラスタライズしたPNGに掛けるフェード（クリップ先頭からの時刻。区間レンダリングでもずらす前の時刻）
+        layer_start = text_layer['start'] + time_offset
+        layer_end = text_layer['end'] + time_offset
+        text_fades = []
+        if animation in ('fade_in', 'fade_in_out'):
+            text_fades.append(('in', layer_start))
+        if animation in ('fade_out', 'fade_in_out'):
+            text_fades.append(('out', layer_end - TEXT_LAYER_FADE_SECONDS))
         
-        bgm_path = audio_settings.get('bgm_path')
-        if bgm_path and Path(bgm_path).exists():
-            # BGMを読み込み
-            bgm_stream = ffmpeg.input(bgm_path).audio
-            
-            # BGMのタイミング設定を取得
-            bgm_start = audio_settings.get('bgm_start', 0.0)
-            bgm_end = audio_settings.get('bgm_end')
-            
-            if bgm_end is None or bgm_end > video_duration:
-                bgm_end = video_duration
-            
-            # BGMの再生時間を計算
-            bgm_duration = bgm_end - bgm_start
-            
-            # 音量調整
-            original_volume = audio_settings.get('original_volume', 1.0)
-            bgm_volume = audio_settings.get('bgm_volume', 0.5)
-            
-            audio_stream = audio_stream.filter('volume', original_volume)
-            bgm_stream = bgm_stream.filter('volume', bgm_volume)
-            
-            # フェードイン・フェードアウト効果
-            fade_in_duration = audio_settings.get('bgm_fade_in', 0.0)
-            fade_out_duration = audio_settings.get('bgm_fade_out', 0.0)
-            
-            if fade_in_duration > 0:
-                bgm_stream = bgm_stream.filter('afade', type='in', start_time=0, duration=fade_in_duration)
-            
-            if fade_out_duration > 0 and bgm_duration > fade_out_duration:
-                fade_out_start = bgm_duration - fade_out_duration
-                bgm_stream = bgm_stream.filter('afade', type='out', start_time=fade_out_start, duration=fade_out_duration)
-            
-            # BGMを指定された長さに合わせてループ
-            if bgm_duration > 0:
-                bgm_stream = bgm_stream.filter('aloop', loop=-1, size=int(bgm_duration * 44100))
-                
-                # BGMの再生タイミングを調整（adelayフィルターを使用）
-                if bgm_start > 0:
-                    # 開始時間分だけ遅延させる
-                    delay_ms = int(bgm_start * 1000)
-                    bgm_stream = bgm_stream.filter('adelay', f'{delay_ms}|{delay_ms}')
+        # テキストアニメーション（text_alpha はdrawtextで描画する場合のみ使用）
+        if animation == 'fade_in':
+            # フェードイン: 最初の0.5秒で透明度を0→1
+            text_alpha = f"if(lt(t-{text_layer['start']},0.5),(t-{text_layer['start']})/0.5,1)"
+        elif animation == 'fade_out':
+            # フェードアウト: 最後の0.5秒で透明度を1→0
+            duration = text_layer['end'] - text_layer['start']
+            text_alpha = f"if(gt(t-{text_layer['start']},{duration-0.5}),1-((t-{text_layer['start']})-{duration-0.5})/0.5,1)"
+        elif animation == 'fade_in_out':
+            duration = text_layer['end'] - text_layer['start']
+            text_alpha = f"if(lt(t-{text_layer['start']},0.5),(t-{text_layer['start']})/0.5,if(gt(t-{text_layer['start']},{duration-0.5}),1-((t-{text_layer['start']})-{duration-0.5})/0.5,1))"
+        elif animation == 'slide_in_left':
+            text_x = f"if(lt(t-{text_layer['start']},0.5),-text_w+(t-{text_layer['start']})*text_w/0.5,{text_x})"
+        elif animation == 'slide_in_right':
+            text_x = f"if(lt(t-{text_layer['start']},0.5),w-(t-{text_layer['start']})*text_w/0.5,{text_x})"
+        elif animation == 'slide_in_top':
+            text_y = f"if(lt(t-{text_layer['start']},0.5),-text_h+(t-{text_layer['start']})*text_h/0.5,{text_y})"
+        elif animation == 'slide_in_bottom':
+            text_y = f"if(lt(t-{text_layer['start']},0.5),h-(t-{text_layer['start']})*text_h/0.5,{text_y})"
+        
+        enable_expr = f"between(t,{text_layer['start']},{text_layer['end']})"
+        
+        video_stream = draw_text_layer(
+            video_stream,
+            text_layer['content'],
+            font_path,
+            max(1, int(round(text_layer['font_size'] * geometry_scale))),
+            text_layer['color'],
+            text_x,
+            text_y,
+            enable=enable_expr,
+            alpha=text_alpha,
+            fades=text_fades,
+            clip_duration=clip_duration,
+            time_offset=time_offset,
+            segment_duration=segment_duration
+        )
+    
+    return video_stream
+
+
+def build_professional_audio_filters(audio_stream, effects: Dict, audio_settings: Dict, clip_duration: float):
+    """プロフェッショナル編集の音声フィルター（速度・自動フェード・BGMのミックス）を適用"""
+    # 速度調整（2倍速以下の場合のみ音声も調整）
+    speed = effects.get('speed', 1.0)
+    if speed != 1.0 and speed <= 2.0:
+        audio_stream = audio_stream.filter('atempo', speed)
+    
+    # オーディオ処理
+    video_duration = clip_duration
+    
+    # 🆕 元動画の音声に自動フェード効果を適用
+    auto_audio_fade = audio_settings.get('auto_audio_fade', True)
+    if auto_audio_fade and video_duration > 4.0:  # 4秒以上の動画のみ適用
+        # フェードイン（開始2秒）
+        audio_stream = audio_stream.filter('afade', type='in', start_time=0, duration=2.0)
+        # フェードアウト（終了2秒）
+        if video_duration > 2.0:
+            fade_out_start = video_duration - 2.0
+            audio_stream = audio_stream.filter('afade', type='out', start_time=fade_out_start, duration=2.0)
+    
+    bgm_path = audio_settings.get('bgm_path')
+    if bgm_path and Path(bgm_path).exists():
+        # BGMを読み込み
+        bgm_stream = ffmpeg.input(bgm_path).audio
+        
+        # BGMのタイミング設定を取得
+        bgm_start = audio_settings.get('bgm_start', 0.0)
+        bgm_end = audio_settings.get('bgm_end')
+        
+        if bgm_end is None or bgm_end > video_duration:
+            bgm_end = video_duration
+        
+        # BGMの再生時間を計算
+        bgm_duration = bgm_end - bgm_start
+        
+        # 音量調整
+        original_volume = audio_settings.get('original_volume', 1.0)
+        bgm_volume = audio_settings.get('bgm_volume', 0.5)
+        
+        audio_stream = audio_stream.filter('volume', original_volume)
+        bgm_stream = bgm_stream.filter('volume', bgm_volume)
+        
+        # フェードイン・フェードアウト効果
+        fade_in_duration = audio_settings.get('bgm_fade_in', 0.0)
+        fade_out_duration = audio_settings.get('bgm_fade_out', 0.0)
+        
+        if fade_in_duration > 0:
+            bgm_stream = bgm_stream.filter('afade', type='in', start_time=0, duration=fade_in_duration)
+        
+        if fade_out_duration > 0 and bgm_duration > fade_out_duration:
+            fade_out_start = bgm_duration - fade_out_duration
+            bgm_stream = bgm_stream.filter('afade', type='out', start_time=fade_out_start, duration=fade_out_duration)
+        
+        # BGMを指定された長さに合わせてループ
+        if bgm_duration > 0:
+            bgm_stream = bgm_stream.filter('aloop', loop=-1, size=int(bgm_duration * 44100))
             
-            # 2つの音声をミックス
-            audio_stream = ffmpeg.filter([audio_stream, bgm_stream], 'amix', inputs=2, duration='first')
+            # BGMの再生タイミングを調整（adelayフィルターを使用）
+            if bgm_start > 0:
+                # 開始時間分だけ遅延させる
+                delay_ms = int(bgm_start * 1000)
+                bgm_stream = bgm_stream.filter('adelay', f'{delay_ms}|{delay_ms}')
+        
+        # 2つの音声をミックス
+        audio_stream = ffmpeg.filter([audio_stream, bgm_stream], 'amix', inputs=2, duration='first')
+    
+    return audio_stream
+
+
+def generate_professional_video(
+    video_path: str,
+    start_time: float,
+    end_time: float,
+    output_path: str,
+    layers: List[Dict],
+    effects: Dict,
+    audio_settings: Dict,
+    encode_profile: str = DEFAULT_ENCODE_PROFILE,
+    parallel: bool = False
+) -> bool:
+    """プロフェッショナル動画編集（Phase 1-5統合版）
+
+    encode_profile で ENCODE_PROFILES のプリセット・CRF/ビットレートなどを選ぶ。
+    プロファイルに max_height / max_fps がある場合（プレビュー用のプロキシなど）は、入力を先に縮小・間引きし、
+    レイヤーの位置・フォントサイズ・画像の拡大率も縮小率に合わせるため、見た目の配置は元の解像度と同じになる。
+    同じ編集内容で生成済みの動画はキャッシュからコピーし、FFmpegを実行しない。
+    parallel=True の場合、速度変更のない長いクリップは分割して並列にレンダリングする（出力の見た目は同じ）。
+    """
+    try:
+        import streamlit as st
+        
+        # 出力設定
+        profile = get_encode_profile(encode_profile)
+        encode_options = get_encode_output_options(encode_profile)
+        
+        # 🚀 同じ編集内容ならキャッシュ済みの動画を使う
+        render_cache_key = get_render_cache_key(
+            video_path, start_time, end_time, layers, effects, audio_settings,
+            {**encode_options, 'max_height': profile.get('max_height'), 'max_fps': profile.get('max_fps')}
+        )
+        if load_cached_render(render_cache_key, output_path):
+            st.info("♻️ 同じ編集内容の動画をキャッシュから再利用しました")
+            return True
+        
+        # ⚡ 長いクリップはキーフレーム位置で分割し、複数のFFmpegで並列にエンコードする
+        clip_duration = end_time - start_time
+        if parallel and effects.get('speed', 1.0) == 1.0 and clip_duration >= RENDER_PARALLEL_MIN_SECONDS:
+            segments = split_clip_at_keyframes(get_media_info(video_path), start_time, end_time, RENDER_PARALLEL_WORKERS)
+            if len(segments) > 1:
+                st.info(f"⚡ {len(segments)}区間に分割して並列にレンダリングします")
+                render_professional_video_parallel(
+                    video_path, start_time, end_time, output_path, segments,
+                    layers, effects, audio_settings, encode_profile
+                )
+                save_render_to_cache(render_cache_key, output_path)
+                return True
+        
+        # 入力動画
+        input_stream = ffmpeg.input(video_path, ss=start_time, to=end_time)
+        video_stream, geometry_scale = apply_profile_downscale(input_stream.video, video_path, profile)
+        audio_stream = input_stream.audio
+        
+        video_stream = build_professional_video_filters(video_stream, layers, effects, clip_duration, geometry_scale)
+        audio_stream = build_professional_audio_filters(audio_stream, effects, audio_settings, clip_duration)
         
         # 出力
         output = ffmpeg.output(
             video_stream,
             audio_stream,
             output_path,
-            vcodec='libx264',
-            acodec='aac',
-            audio_bitrate='192k',
+            **encode_options,
             **{'loglevel': 'warning', 'y': None}
         )
         
         ffmpeg.run(output, overwrite_output=True, capture_stderr=True)
+        save_render_to_cache(render_cache_key, output_path)
         return True
         
     except ffmpeg.Error as e:
@@ -1707,19 +4456,21 @@ def generate_final_video_with_subtitle(
     x_position: str = "(w-text_w)/2",
     y_position: str = "h-text_h-20",
     auto_position: bool = True,
-    auto_size: bool = False
+    auto_size: bool = False,
+    encode_profile: Optional[str] = None
 ) -> bool:
-    """テロップ付き最終動画を生成（吹き出し画像対応）"""
+    """テロップ付き最終動画を生成（吹き出し画像対応）
+
+    encode_profile で ENCODE_PROFILES のプリセット・CRF/ビットレートなどを選ぶ。
+    省略した場合は、テキストのスケールなどと同じくUIで選択中のプロファイル（セッションステート）を使う。
+    """
     try:
+        if encode_profile is None:
+            encode_profile = st.session_state.get('pro_encode_profile', DEFAULT_ENCODE_PROFILE)
+        
         # フォントパスの取得（Windowsパスを/に変換）
         font_path = str(FONTS_DIR / font_file).replace("\\", "/")
         
-        # テキストのエスケープ処理（FFmpegのdrawtextフィルタ用）
-        escaped_text = subtitle_text.replace("\\", "\\\\\\\\")
-        escaped_text = escaped_text.replace("'", "'\\\\''")  
-        escaped_text = escaped_text.replace(":", "\\:")
-        escaped_text = escaped_text.replace("\n", " ")
-        
         # 背景設定を取得
         bg_settings = get_background_settings(background_type)
         
@@ -1758,26 +4509,14 @@ def generate_final_video_with_subtitle(
                 adjusted_font_size = int(font_size * text_scale)
                 
                 # テキストを描画（ユーザー指定の位置）
-                video_stream = video_stream.filter(
-                    'drawtext',
-                    text=escaped_text,
-                    fontfile=font_path,
-                    fontsize=adjusted_font_size,
-                    fontcolor=font_color,
-                    x=x_position,
-                    y=y_position
+                video_stream = draw_text_layer(
+                    video_stream, subtitle_text, font_path, adjusted_font_size, font_color, x_position, y_position
                 )
             else:
                 # カスタム背景が見つからない場合は透明背景として処理
                 adjusted_font_size = int(font_size * st.session_state.get('text_scale', 1.0))
-                video_stream = video_stream.filter(
-                    'drawtext',
-                    text=escaped_text,
-                    fontfile=font_path,
-                    fontsize=adjusted_font_size,
-                    fontcolor=font_color,
-                    x=x_position,
-                    y=y_position
+                video_stream = draw_text_layer(
+                    video_stream, subtitle_text, font_path, adjusted_font_size, font_color, x_position, y_position
                 )
         
         # 吹き出し画像モードの場合
@@ -1847,14 +4586,8 @@ def generate_final_video_with_subtitle(
             adjusted_font_size = int(adjusted_font_size * text_scale)
             
             # テキストを描画
-            video_stream = video_stream.filter(
-                'drawtext',
-                text=escaped_text,
-                fontfile=font_path,
-                fontsize=adjusted_font_size,
-                fontcolor=font_color,
-                x=text_x,
-                y=text_y
+            video_stream = draw_text_layer(
+                video_stream, subtitle_text, font_path, adjusted_font_size, font_color, text_x, text_y
             )
         # シンプル背景モード
         else:
@@ -1864,29 +4597,23 @@ def generate_final_video_with_subtitle(
             adjusted_font_size = int(font_size * text_scale)
             
             if bg_settings['box'] > 0:
-                video_stream = video_stream.filter(
-                    'drawtext',
-                    text=escaped_text,
-                    fontfile=font_path,
-                    fontsize=adjusted_font_size,
-                    fontcolor=font_color,
-                    x=x_position,
-                    y=y_position,
-                    box=bg_settings['box'],
-                    boxcolor=bg_settings['boxcolor'],
-                    boxborderw=bg_settings['boxborderw']
+                video_stream = draw_text_layer(
+                    video_stream, subtitle_text, font_path, adjusted_font_size, font_color, x_position, y_position,
+                    box_color=bg_settings['boxcolor'],
+                    box_border=bg_settings['boxborderw']
                 )
             else:
-                video_stream = video_stream.filter(
-                    'drawtext',
-                    text=escaped_text,
-                    fontfile=font_path,
-                    fontsize=adjusted_font_size,
-                    fontcolor=font_color,
-                    x=x_position,
-                    y=y_position
+                video_stream = draw_text_layer(
+                    video_stream, subtitle_text, font_path, adjusted_font_size, font_color, x_position, y_position
                 )
         
+        # 解像度の上限があるプロファイルでは、テロップを描画した後に縮小する
+        profile = get_encode_profile(encode_profile)
+        if profile.get('max_height'):
+            video_stream = video_stream.filter('scale', -2, f"min(ih,{profile['max_height']})")
+        if profile.get('max_fps'):
+            video_stream = video_stream.filter('fps', fps=profile['max_fps'])
+        
         # 音声ストリームを取得（そのままコピー）
         audio_stream = input_stream.audio
         
@@ -1895,9 +4622,7 @@ def generate_final_video_with_subtitle(
             video_stream,
             audio_stream,
             output_path,
-            vcodec='libx264',
-            acodec='aac',
-            audio_bitrate='192k',
+            **get_encode_output_options(encode_profile),
             **{'loglevel': 'warning', 'y': None}
         )
         
@@ -1919,6 +4644,43 @@ def generate_final_video_with_subtitle(
 # Streamlit UI
 # ============================
 
+@st.fragment(run_every=2)
+def render_streaming_progress():
+    """ストリーミング文字起こしの進捗を定期的に更新して表示（完了時にアプリ全体を再実行）"""
+    job = st.session_state.get('streaming_job')
+    if not job:
+        return
+    
+    with job['lock']:
+        status = job['status']
+        processed_seconds = job['processed_seconds']
+        total_seconds = job['total_seconds']
+        segments = list(job['transcription']['segments'])
+        indexed_count = job['indexed_count']
+        vad_stats = job.get('vad_stats')
+        error = job['error']
+    
+    if status == 'running':
+        st.progress(min(1.0, processed_seconds / total_seconds) if total_seconds > 0 else 0.0)
+        st.caption(
+            f"🔴 ストリーミング文字起こし中... {processed_seconds:.0f}秒 / {total_seconds:.0f}秒"
+            f"（{len(segments)}セグメント、うち{indexed_count}件を検索可能）"
+        )
+        if vad_stats:
+            st.caption(vad_stats)
+        return
+    
+    st.session_state.streaming_job = None
+    if status == 'done':
+        st.session_state.transcript_text = ' '.join(seg['text'] for seg in segments)
+        # 全文がそろったので検索クエリ候補を作り直し、その検索結果を事前計算する
+        prepare_search_suggestions(st.session_state.transcript_text, job['collection_name'], st.session_state.chromadb_client)
+        st.session_state.index_success_msg = f"✅ ストリーミング文字起こし完了！ {indexed_count}件のセグメントをインデックス化しました"
+    else:
+        st.session_state.index_error_msg = f"❌ ストリーミング文字起こしに失敗しました: {error}"
+    st.rerun()
+
+
 def main():
     st.set_page_config(
         page_title="Context Cut Pro",
@@ -2160,6 +4922,7 @@ def main():
                                 st.session_state.collection_name = None
                                 st.session_state.search_results = []
                                 st.session_state.skip_transcription = False
+                                st.session_state.streaming_job = None
                             
                             st.session_state.video_path = output_path
                             st.success("✅ ダウンロード完了!")
@@ -2197,6 +4960,7 @@ def main():
                                 st.session_state.collection_name = None
                                 st.session_state.search_results = []
                                 st.session_state.skip_transcription = False
+                                st.session_state.streaming_job = None
                             
                             st.session_state.video_path = output_path
                             st.success("✅ ダウンロード完了! 🎉")
@@ -2230,6 +4994,7 @@ def main():
                     st.session_state.collection_name = None
                     st.session_state.search_results = []
                     st.session_state.skip_transcription = False
+                    st.session_state.streaming_job = None
                 
                 with open(output_path, "wb") as f:
                     f.write(uploaded_file.getbuffer())
@@ -2270,8 +5035,34 @@ def main():
                     help="EasyOCRは日本語の認識精度が高いですが、初回は数分かかります。"
                 )
                 use_easyocr = "EasyOCR" in ocr_method
+                ocr_sampling_method = st.radio(
+                    "フレームの選び方",
+                    ["🎬 シーン切り替わり（推奨）", "⏱️ 一定間隔"],
+                    index=0,
+                    horizontal=True,
+                    help="シーン切り替わりでは、画面が変わった直後のフレームをOCRするため短いテロップも拾いやすく、同じスライドの読み直しも減ります。"
+                )
+                ocr_scene_detection = "シーン" in ocr_sampling_method
+                ocr_sample_interval = st.slider(
+                    "最大サンプリング間隔（秒）" if ocr_scene_detection else "OCRのサンプリング間隔（秒）",
+                    min_value=1.0,
+                    max_value=30.0,
+                    value=OCR_SAMPLE_INTERVAL_SECONDS,
+                    step=1.0,
+                    help="指定した間隔のフレームだけをデコードしてOCRします。短くすると短時間のテロップも拾えますが、処理時間が増えます。"
+                         "シーン切り替わりモードでは、切り替わりがない区間をこの間隔で補完します。"
+                )
+                ocr_crop_text_regions = st.checkbox(
+                    "⚡ テキストらしい領域だけを認識（高速）",
+                    value=OCR_CROP_TEXT_REGIONS,
+                    help="MSERで文字らしい領域を検出し、その部分だけを認識します。"
+                         "オフにするとEasyOCRがフレーム全体から文字を検出するため、処理は遅くなりますが背景に溶け込んだ文字も拾いやすくなります。"
+                )
             else:
                 use_easyocr = True  # デフォルト
+                ocr_sample_interval = OCR_SAMPLE_INTERVAL_SECONDS
+                ocr_scene_detection = True
+                ocr_crop_text_regions = OCR_CROP_TEXT_REGIONS
             
             # モデル選択オプション
             st.write("**🎤 Whisper音声認識モデル**")
@@ -2291,20 +5082,113 @@ def main():
             else:
                 model_name = "small"
             
+            backend_choice = st.radio(
+                "推論エンジンを選択",
+                ["🐢 openai-whisper（標準）", "🚀 faster-whisper（int8量子化・CPU高速）"],
+                index=0,
+                horizontal=True,
+                help="faster-whisperはCTranslate2のint8推論により、同じモデルでCPU処理が3〜4倍程度高速になります。"
+            )
+            asr_backend = workers.ASR_BACKEND_FASTER_WHISPER if "faster" in backend_choice else workers.ASR_BACKEND_OPENAI_WHISPER
+            
+            streaming_transcription = st.checkbox(
+                "🔴 ストリーミング文字起こし（処理中から検索可能）",
+                value=False,
+                help=f"約{int(STREAMING_WINDOW_SECONDS)}秒ごとに文字起こし結果を検索インデックスへ追加します。"
+                     "全体の完了を待たずに、処理済みの部分からシーン検索を開始できます（OCRは使用できません）。"
+            )
+            vad_transcription = st.checkbox(
+                "🔇 無音・BGMのみの区間をスキップ（VAD）",
+                value=True,
+                help="音声のエネルギーから発話区間を検出し、その区間だけを文字起こしします。"
+                     "無音や音楽だけの区間が長い動画ほど処理時間が短くなります（タイムスタンプは元の動画のまま）。"
+            )
+            search_unit_choice = st.radio(
+                "検索単位",
+                ["🪟 シーン（複数セグメントをまとめる）", "📝 セグメント（Whisperの区切りのまま）"],
+                index=0,
+                horizontal=True,
+                help="シーン単位では、連続するセグメントを少しずつずらしながら数十秒のまとまりでインデックス化します。"
+                     "2〜3秒の断片ではなく前後の文脈を含む範囲がヒットするため、プレビューで範囲を広げ直す手間が減ります。"
+            )
+            search_unit = SEARCH_UNIT_WINDOW if "シーン" in search_unit_choice else SEARCH_UNIT_SEGMENT
+            if search_unit == SEARCH_UNIT_WINDOW:
+                scene_window_seconds = st.slider(
+                    "シーンの長さ（秒）",
+                    min_value=5.0,
+                    max_value=60.0,
+                    value=SCENE_WINDOW_SECONDS,
+                    step=5.0
+                )
+                scene_window_stride = st.slider(
+                    "シーンのずらし幅（秒）",
+                    min_value=1.0,
+                    max_value=scene_window_seconds,
+                    value=min(SCENE_WINDOW_STRIDE_SECONDS, scene_window_seconds),
+                    step=1.0,
+                    help="シーンの長さより短くすると前後のシーンが重なり、話題の切れ目をまたぐ場面も見つけやすくなります。"
+                )
+            else:
+                scene_window_seconds = SCENE_WINDOW_SECONDS
+                scene_window_stride = SCENE_WINDOW_STRIDE_SECONDS
+            parallel_transcription = st.checkbox(
+                "⚡ 並列文字起こし（長い動画向け）",
+                value=False,
+                disabled=streaming_transcription,
+                help=f"無音区間で音声を分割し、最大{PARALLEL_MAX_WORKERS}プロセスで同時に文字起こしします。"
+                     f"{int(PARALLEL_MIN_DURATION // 60)}分未満の動画には適用されません。"
+            )
+            
             col_trans1, col_trans2 = st.columns(2)
             with col_trans1:
-                if st.button("🎤 文字起こしを実行", use_container_width=True):
-                    # 音声文字起こし
-                    model = load_whisper_model(model_name)
+                run_transcription = st.button("🎤 文字起こしを実行", use_container_width=True)
+                if run_transcription and streaming_transcription:
+                    # ストリーミング文字起こし: バックグラウンドで処理し、完了したウィンドウから検索可能にする
+                    model = load_whisper_model(model_name, asr_backend)
                     if model:
-                        transcription = transcribe_video(st.session_state.video_path, model)
+                        job = start_streaming_transcription(
+                            st.session_state.video_path,
+                            model,
+                            model_name,
+                            Path(st.session_state.video_path).stem,
+                            st.session_state.chromadb_client,
+                            backend=asr_backend,
+                            vad=vad_transcription,
+                            search_unit=search_unit,
+                            window_seconds=scene_window_seconds,
+                            stride_seconds=scene_window_stride
+                        )
+                        if job and job['collection_name']:
+                            st.session_state.streaming_job = job if job['status'] == 'running' else None
+                            st.session_state.transcription = job['transcription']
+                            st.session_state.collection_name = job['collection_name']
+                            st.session_state.video_duration = get_video_duration(st.session_state.video_path)
+                            if job['status'] == 'done':
+                                st.session_state.transcript_text = ' '.join(seg['text'] for seg in job['transcription']['segments'])
+                                prepare_search_suggestions(st.session_state.transcript_text, job['collection_name'], st.session_state.chromadb_client)
+                            st.rerun()
+                elif run_transcription:
+                    # 音声文字起こし（並列モードではワーカープロセスがそれぞれモデルをロードする）
+                    model = None if parallel_transcription else load_whisper_model(model_name, asr_backend)
+                    if model or parallel_transcription:
+                        transcription = transcribe_video(
+                            st.session_state.video_path,
+                            model,
+                            model_name,
+                            parallel=parallel_transcription,
+                            backend=asr_backend,
+                            vad=vad_transcription
+                        )
                         if transcription:
                             # OCR処理を実行（有効な場合）
                             if enable_ocr:
                                 st.info("🔄 OCR処理を開始します...")
                                 ocr_results = extract_text_from_video_frames(
                                     st.session_state.video_path, 
-                                    use_easyocr=use_easyocr
+                                    use_easyocr=use_easyocr,
+                                    sample_interval=ocr_sample_interval,
+                                    scene_detection=ocr_scene_detection,
+                                    crop_text_regions=ocr_crop_text_regions
                                 )
                                 
                                 # 音声とOCRを統合
@@ -2324,9 +5208,16 @@ def main():
                             collection_name = index_transcription_to_chromadb(
                                 transcription,
                                 video_name,
-                                st.session_state.chromadb_client
+                                st.session_state.chromadb_client,
+                                st.session_state.video_path,
+                                search_unit,
+                                scene_window_seconds,
+                                scene_window_stride
                             )
                             st.session_state.collection_name = collection_name
+                            
+                            # 検索クエリ候補を生成し、クリック時にすぐ表示できるよう検索結果を事前計算
+                            prepare_search_suggestions(st.session_state.transcript_text, collection_name, st.session_state.chromadb_client)
                             st.rerun()
             
             with col_trans2:
@@ -2337,6 +5228,11 @@ def main():
                     st.success("✅ 文字起こしをスキップしました。カット範囲指定とテロップ編集が使用できます。")
                     st.rerun()
         
+        # ストリーミング文字起こしの処理中
+        elif st.session_state.get('streaming_job'):
+            st.info("🔴 文字起こしを続行中です。処理済みの部分は「🔍 シーン検索」タブですでに検索できます。")
+            render_streaming_progress()
+        
         # 文字起こし完了後のメイン画面
         elif st.session_state.transcription is not None:
             st.success("✅ 動画の取得と文字起こしが完了しました！")
@@ -2380,10 +5276,13 @@ def main():
                 search_query = ""  # 空の検索クエリを設定
             else:
                 # 検索クエリ候補がクリックされた場合、それを入力欄に設定
+                run_suggested_search = False
                 if 'selected_suggestion' in st.session_state:
                     # セッションステートに直接設定することで、text_inputに反映される
                     st.session_state.search_query_input = st.session_state.selected_suggestion
                     del st.session_state.selected_suggestion
+                    # 候補の検索結果は事前計算済みなので、そのまま検索を実行する
+                    run_suggested_search = True
                 
                 search_query = st.text_input(
                     "検索クエリを入力",
@@ -2395,8 +5294,10 @@ def main():
                 if 'transcript_text' in st.session_state and st.session_state.transcript_text:
                     if 'search_suggestions' not in st.session_state:
                         # 文字起こしから検索クエリ候補を生成（動画に含まれる内容のみ）
-                        st.session_state.search_suggestions = generate_search_suggestions(
-                            st.session_state.transcript_text
+                        prepare_search_suggestions(
+                            st.session_state.transcript_text,
+                            st.session_state.get('collection_name'),
+                            st.session_state.chromadb_client
                         )
                     
                     if st.session_state.search_suggestions:
@@ -2412,7 +5313,7 @@ def main():
                                     key=f"suggestion_{idx}",
                                     use_container_width=True
                                 ):
-                                    # クリックされた候補を保存してリロード
+                                    # クリックされた候補を保存してリロード（リロード後に自動で検索する）
                                     st.session_state.selected_suggestion = suggestion
                                     st.rerun()
                         
@@ -2422,21 +5323,37 @@ def main():
                         st.info("ℹ️ この動画には、検索クエリを生成するのに十分な量の情報が含まれていません。\n\n💡 手動で検索キーワードを入力してください。")
                         st.markdown("---")
                 
-                n_results = st.slider("検索結果数", 1, 10, 5)
+                search_scope = st.radio(
+                    "検索範囲",
+                    ["🎬 この動画", "📚 ライブラリ全体（インデックス済みの全動画）"],
+                    index=0,
+                    horizontal=True,
+                    help="ライブラリ全体では、これまでに文字起こし・インデックス化したすべての動画から一度に検索します。"
+                )
+                search_library_scope = "ライブラリ" in search_scope
+                
+                n_results = st.slider("検索結果数", 1, 10, SEARCH_DEFAULT_N_RESULTS)
                 
-                if st.button("検索実行"):
+                if st.button("検索実行") or run_suggested_search:
                     if not search_query:
                         st.warning("⚠️ 検索クエリを入力してください。")
-                    elif not st.session_state.get('collection_name'):
+                    elif not search_library_scope and not st.session_state.get('collection_name'):
                         st.error("❌ ChromaDBのコレクション名が設定されていません。文字起こしを再実行してください。")
                     else:
                         try:
-                            scenes = search_scenes(
-                                search_query,
-                                st.session_state.collection_name,
-                                st.session_state.chromadb_client,
-                                n_results
-                            )
+                            if search_library_scope:
+                                scenes = search_library(
+                                    search_query,
+                                    st.session_state.chromadb_client,
+                                    n_results
+                                )
+                            else:
+                                scenes = search_scenes(
+                                    search_query,
+                                    st.session_state.collection_name,
+                                    st.session_state.chromadb_client,
+                                    n_results
+                                )
                             
                             if scenes:
                                 # 検索結果をセッション状態に保存
@@ -2453,8 +5370,17 @@ def main():
                 if st.session_state.get('search_results'):
                     st.write(f"**{len(st.session_state.search_results)}件のシーン**")
                     
+                    current_video_id = get_video_collection_name(Path(st.session_state.video_path).stem)
                     for i, scene in enumerate(st.session_state.search_results, 1):
-                        with st.expander(f"シーン {i}: {scene['start']:.1f}s - {scene['end']:.1f}s"):
+                        # ライブラリ検索の結果は別の動画のシーンの場合がある
+                        scene_video_path = scene.get('video_path') or st.session_state.video_path
+                        is_current_video = scene.get('video_id', current_video_id) == current_video_id
+                        expander_label = f"シーン {i}: {scene['start']:.1f}s - {scene['end']:.1f}s"
+                        if 'video_name' in scene:
+                            expander_label = f"シーン {i}: 📹 {scene['video_name']} / {scene['start']:.1f}s - {scene['end']:.1f}s（スコア {scene['score']:.3f}）"
+                        with st.expander(expander_label):
+                            if 'video_name' in scene:
+                                st.write(f"**動画:** {scene['video_name']}（ID: `{scene['video_id']}`）")
                             st.write(f"**テキスト:** {scene['text']}")
                             st.write(f"**開始:** {scene['start']:.2f}秒")
                             st.write(f"**終了:** {scene['end']:.2f}秒")
@@ -2473,26 +5399,38 @@ def main():
                                 # シーンプレビューボタン
                                 if st.button(f"🎬 プレビュー", key=f"preview_{i}", use_container_width=True):
                                     # プレビュー動画を生成
-                                    with st.spinner("プレビューを生成中..."):
-                                        preview_path = str(TEMP_VIDEOS_DIR / f"scene_preview_{i}.mp4")
-                                        if create_preview_clip(
-                                            st.session_state.video_path,
-                                            scene['start'],
-                                            scene['end'],
-                                            preview_path
-                                        ):
-                                            # プレビュー用のセッション状態を設定
-                                            st.session_state.preview_scene_start = scene['start']
-                                            st.session_state.preview_scene_end = scene['end']
-                                            st.session_state.preview_scene_id = i
-                                            st.session_state.preview_scene_text = scene['text']
-                                            st.session_state.current_scene_preview_path = preview_path
-                                            st.session_state.scene_preview_dialog_open = True
-                                            st.rerun()
+                                    if not os.path.exists(scene_video_path):
+                                        st.warning("⚠️ この動画のファイルが見つからないため、プレビューできません。")
+                                    else:
+                                        with st.spinner("プレビューを生成中..."):
+                                            preview_path = str(TEMP_VIDEOS_DIR / f"scene_preview_{i}.mp4")
+                                            if create_preview_clip(
+                                                scene_video_path,
+                                                scene['start'],
+                                                scene['end'],
+                                                preview_path
+                                            ):
+                                                # プレビュー用のセッション状態を設定
+                                                st.session_state.preview_scene_start = scene['start']
+                                                st.session_state.preview_scene_end = scene['end']
+                                                st.session_state.preview_scene_id = i
+                                                st.session_state.preview_scene_text = scene['text']
+                                                # ライブラリ検索では別の動画のシーンのこともあるため、動画も記録する
+                                                st.session_state.preview_scene_video_path = scene_video_path
+                                                st.session_state.preview_scene_is_current = is_current_video
+                                                st.session_state.current_scene_preview_path = preview_path
+                                                st.session_state.scene_preview_dialog_open = True
+                                                st.rerun()
                             
                             with col_btn2:
                                 # シーンを選択ボタン
-                                if st.button(f"✂️ 選択", key=f"select_{i}", use_container_width=True):
+                                if st.button(
+                                    f"✂️ 選択",
+                                    key=f"select_{i}",
+                                    use_container_width=True,
+                                    disabled=not is_current_video,
+                                    help=None if is_current_video else "別の動画のシーンです。編集するには、その動画を読み込んでください。"
+                                ):
                                     st.session_state.selected_start = scene['start']
                                     st.session_state.selected_end = scene['end']
                                     st.session_state.clip_start = scene['start']  # 動画編集用
@@ -3630,8 +6568,34 @@ def main():
                     # プレビュー生成ボタン
                     st.subheader("🎬 プレビュー")
                     
+                    visible_profiles = [name for name, profile in ENCODE_PROFILES.items() if not profile.get('hidden')]
+                    encode_profile = st.selectbox(
+                        "エンコード設定",
+                        visible_profiles,
+                        index=visible_profiles.index(DEFAULT_ENCODE_PROFILE),
+                        format_func=lambda name: ENCODE_PROFILES[name]['label'],
+                        key="pro_encode_profile",
+                        help="下書きは処理が速く、保存用は時間をかけて高画質にエンコードします。SNS投稿は1080pに収め、ビットレートを固定します。"
+                    )
+                    
+                    parallel_render = st.checkbox(
+                        "⚡ 並列レンダリング（長いクリップ向け）",
+                        value=False,
+                        key="pro_parallel_render",
+                        help=f"{int(RENDER_PARALLEL_MIN_SECONDS)}秒以上のクリップをキーフレーム位置で最大{RENDER_PARALLEL_WORKERS}区間に分割し、"
+                             "同時にエンコードしてから無劣化で連結します（速度変更を使う場合は通常どおり処理します）。"
+                    )
+                    
+                    proxy_preview = st.checkbox(
+                        "⚡ 低解像度プロキシでプレビュー（高速）",
+                        value=True,
+                        key="pro_proxy_preview",
+                        help=f"縦{PROXY_MAX_HEIGHT}px・{PROXY_FPS}fpsに縮小して高速にエンコードします。"
+                             "レイヤーの配置やサイズは縮小率に合わせるため、見た目の確認に使えます。最終動画はプロキシを使わず、選択したエンコードプロファイルの解像度（元動画のまま。SNS投稿プロファイルは縦1080pまで）で出力します。"
+                    )
+                    
                     if st.button("🔄 プレビューを生成", type="primary", use_container_width=True):
-                        with st.spinner("🎬 プロフェッショナル編集を適用中... (数分かかる場合があります)"):
+                        with st.spinner("🎬 プロフェッショナル編集を適用中..." + ("" if proxy_preview else " (数分かかる場合があります)")):
                             output_path = str(TEMP_VIDEOS_DIR / "pro_preview.mp4")
                             
                             # プロフェッショナル編集を適用
@@ -3642,7 +6606,9 @@ def main():
                                 output_path,
                                 st.session_state.pro_layers,
                                 st.session_state.pro_effects,
-                                st.session_state.pro_audio
+                                st.session_state.pro_audio,
+                                encode_profile=PROXY_ENCODE_PROFILE if proxy_preview else encode_profile,
+                                parallel=parallel_render
                             )
                             
                             if success:
@@ -3685,7 +6651,9 @@ def main():
                                     final_output_path,
                                     st.session_state.pro_layers,
                                     st.session_state.pro_effects,
-                                    st.session_state.pro_audio
+                                    st.session_state.pro_audio,
+                                    encode_profile=st.session_state.get('pro_encode_profile', DEFAULT_ENCODE_PROFILE),
+                                    parallel=st.session_state.get('pro_parallel_render', False)
                                 )
                                 
                                 if success:
@@ -3767,8 +6735,16 @@ def main():
                 if 'dialog_adjusted_end' not in st.session_state:
                     st.session_state.dialog_adjusted_end = st.session_state.preview_scene_end
                 
+                # プレビュー中のシーンの動画（ライブラリ検索では読み込み中の動画と異なる場合がある）
+                scene_video_path = st.session_state.get('preview_scene_video_path', st.session_state.video_path)
+                is_current_scene_video = st.session_state.get('preview_scene_is_current', True)
+                
                 # 動画の全体長さを取得
-                video_duration = st.session_state.get('video_duration', 100.0)
+                try:
+                    video_duration = get_media_info(scene_video_path).duration
+                except Exception:
+                    video_duration = st.session_state.get('video_duration', 100.0)
+                video_duration = max(video_duration, st.session_state.dialog_adjusted_end)
                 
                 # 範囲調整スライダー
                 time_range = st.slider(
@@ -3799,7 +6775,7 @@ def main():
                         with st.spinner("プレビューを生成中..."):
                             preview_path = str(TEMP_VIDEOS_DIR / f"scene_preview_{st.session_state.preview_scene_id}_adjusted.mp4")
                             if create_preview_clip(
-                                st.session_state.video_path,
+                                scene_video_path,
                                 adjusted_start,
                                 adjusted_end,
                                 preview_path
@@ -3825,7 +6801,13 @@ def main():
                             del st.session_state.dialog_adjusted_end
                         st.rerun()
                 with col2:
-                    if st.button("✅ この範囲で選択", use_container_width=True, key="select_from_dialog"):
+                    if st.button(
+                        "✅ この範囲で選択",
+                        use_container_width=True,
+                        key="select_from_dialog",
+                        disabled=not is_current_scene_video,
+                        help=None if is_current_scene_video else "別の動画のシーンです。編集するには、その動画を読み込んでください。"
+                    ):
                         # 調整後の値を選択
                         st.session_state.selected_start = st.session_state.dialog_adjusted_start
                         st.session_state.selected_end = st.session_state.dialog_adjusted_end
@@ -0,0 +1,36 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# app.py はこれらを起動時にインポートする（足りない環境ではテストをスキップ）
+APP_REQUIRED_MODULES = [
+    "streamlit",
+    "whisper",
+    "ffmpeg",
+    "chromadb",
+    "googleapiclient",
+    "google.oauth2",
+    "yt_dlp",
+    "torch",
+    "numpy",
+]
+
+
+@pytest.fixture(scope="session")
+def app(tmp_path_factory):
+    for module_name in APP_REQUIRED_MODULES:
+        pytest.importorskip(module_name)
+
+    # app.py はインポート時に作業ディレクトリへキャッシュ用のディレクトリを作るため、一時ディレクトリで読み込む
+    original_cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    try:
+        import app as app_module
+    finally:
+        os.chdir(original_cwd)
+    return app_module
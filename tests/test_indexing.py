@@ -0,0 +1,48 @@
+def make_segment(start, end, text, **extra):
+    return {'start': start, 'end': end, 'text': text, **extra}
+
+
+def test_build_segment_documents_keeps_lists_aligned(app):
+    segments = [make_segment(0.0, 1.0, 'あ'), make_segment(1.0, 2.0, 'い'), make_segment(2.0, 3.0, 'う')]
+
+    documents, metadatas, ids = app.build_segment_documents(segments)
+
+    assert len(documents) == len(metadatas) == len(ids) == 3
+    assert documents == ['あ', 'い', 'う']
+    assert [metadata['segment_id'] for metadata in metadatas] == [0, 1, 2]
+    assert len(set(ids)) == 3
+
+
+def test_build_segment_documents_skips_duplicates_and_empty_text(app):
+    segments = [
+        make_segment(0.0, 1.0, 'あ'),
+        make_segment(0.0, 1.0, 'あ'),
+        make_segment(1.0, 2.0, '   '),
+        make_segment(2.0, 3.0, 'う'),
+    ]
+
+    documents, metadatas, ids = app.build_segment_documents(segments)
+
+    assert len(documents) == len(metadatas) == len(ids) == 2
+    assert documents == ['あ', 'う']
+    assert [metadata['start'] for metadata in metadatas] == [0.0, 2.0]
+
+
+def test_build_segment_documents_ids_are_stable(app):
+    segments = [make_segment(0.0, 1.0, 'あ'), make_segment(1.0, 2.0, 'い')]
+
+    _, _, first_ids = app.build_segment_documents(segments)
+    _, _, shifted_ids = app.build_segment_documents(segments, start_index=10)
+
+    assert first_ids == shifted_ids
+
+
+def test_build_segment_documents_includes_ocr_text(app):
+    segments = [make_segment(0.0, 1.0, '音声', ocr_text=['スライド'])]
+
+    documents, metadatas, ids = app.build_segment_documents(segments)
+
+    assert documents == ['音声 スライド']
+    assert metadatas[0]['has_ocr'] is True
+    assert metadatas[0]['ocr_count'] == 1
+    assert len(ids) == 1
@@ -0,0 +1,56 @@
+import pytest
+
+
+def make_media_info(app, keyframes, fps=30.0, duration=300.0):
+    media_info = app.MediaInfo(
+        path='video.mp4',
+        duration=duration,
+        fps=fps,
+        frame_count=int(duration * fps),
+        width=1920,
+        height=1080,
+        video_codec='h264',
+        audio_codec='aac',
+        streams=[]
+    )
+    media_info.keyframes = keyframes  # ffprobeを呼ばないようキャッシュに直接入れる
+    return media_info
+
+
+def test_split_clip_at_keyframes_uses_exact_keyframes(app):
+    media_info = make_media_info(app, [float(t) for t in range(0, 300, 2)])
+
+    segments = app.split_clip_at_keyframes(media_info, 1.0, 121.0, 4)
+
+    assert segments[0][0] == 1.0
+    assert segments[-1][1] == 121.0
+    assert len(segments) == 4
+    for (_, end), (start, _) in zip(segments, segments[1:]):
+        assert end == start
+        assert start in media_info.keyframes
+
+
+def test_split_clip_at_keyframes_respects_min_segment_length(app):
+    media_info = make_media_info(app, [float(t) for t in range(0, 300, 2)])
+
+    segments = app.split_clip_at_keyframes(media_info, 0.0, 30.0, 8)
+
+    assert all(end - start >= app.RENDER_PARALLEL_MIN_SEGMENT_SECONDS for start, end in segments)
+    assert segments[0][0] == 0.0 and segments[-1][1] == 30.0
+
+
+def test_split_clip_at_keyframes_without_keyframes_returns_whole_clip(app):
+    media_info = make_media_info(app, [])
+
+    assert app.split_clip_at_keyframes(media_info, 5.0, 125.0, 4) == [(5.0, 125.0)]
+
+
+@pytest.mark.parametrize('keyframes', [[0.0, 60.0, 120.0], [float(t) for t in range(0, 200, 7)]])
+def test_split_clip_at_keyframes_covers_clip(app, keyframes):
+    media_info = make_media_info(app, keyframes)
+
+    segments = app.split_clip_at_keyframes(media_info, 3.0, 150.0, 3)
+
+    assert segments[0][0] == 3.0
+    assert segments[-1][1] == 150.0
+    assert all(start < end for start, end in segments)
@@ -0,0 +1,113 @@
+def build_index(app, documents):
+    index = app.create_lexical_index()
+    for doc_id, text in documents.items():
+        app.lexical_index_add(index, doc_id, text)
+    return index
+
+
+def test_lexical_search_ranks_matching_documents(app):
+    index = build_index(app, {
+        'a': '新製品 ABC-123 の紹介',
+        'b': '今日の天気',
+        'c': 'ABC-123 と ABC-123 の比較',
+    })
+
+    hits = app.lexical_index_search(index, 'ABC-123', 10)
+
+    assert [doc_id for doc_id, _ in hits] == ['c', 'a']
+    assert all(score > 0 for _, score in hits)
+
+
+def test_lexical_index_add_ignores_existing_id(app):
+    index = build_index(app, {'a': '天気'})
+
+    app.lexical_index_add(index, 'a', '別の文書')
+
+    assert index['doc_ids'] == ['a']
+
+
+def test_lexical_index_remove_hides_document(app):
+    index = build_index(app, {str(number): f'文書 {number}' for number in range(10)})
+
+    app.lexical_index_remove(index, '3')
+
+    hit_ids = [doc_id for doc_id, _ in app.lexical_index_search(index, '文書', 20)]
+    assert '3' not in hit_ids
+    assert len(hit_ids) == 9
+
+
+def test_lexical_index_compacts_after_many_removals(app):
+    index = build_index(app, {str(number): f'文書 {number}' for number in range(10)})
+
+    for number in range(5):
+        app.lexical_index_remove(index, str(number))
+
+    assert index['deleted_count'] < 5  # 墓標が増えたので詰め直された
+    assert sorted(doc_id for doc_id, _ in app.lexical_index_search(index, '文書', 20)) == ['5', '6', '7', '8', '9']
+
+
+def test_lexical_search_filters_by_id_prefix(app):
+    index = build_index(app, {'video_a:1': '天気予報', 'video_b:1': '天気予報'})
+
+    hits = app.lexical_index_search(index, '天気', 10, id_prefixes=['video_b:'])
+
+    assert [doc_id for doc_id, _ in hits] == ['video_b:1']
+
+
+def make_scene(start, end, text, video_id='v', **extra):
+    return {'start': start, 'end': end, 'text': text, 'segment_id': int(start), 'video_id': video_id, **extra}
+
+
+def test_merge_adjacent_scenes_merges_overlapping_hits(app):
+    scenes = [
+        make_scene(10.0, 30.0, 'B\nC'),
+        make_scene(0.0, 20.0, 'A\nB'),
+        make_scene(100.0, 120.0, 'X'),
+    ]
+
+    merged = app.merge_adjacent_scenes(scenes)
+
+    assert len(merged) == 2
+    assert (merged[0]['start'], merged[0]['end']) == (0.0, 30.0)
+    assert merged[0]['text'] == 'A\nB\nC'
+    assert merged[1]['text'] == 'X'
+
+
+def test_merge_adjacent_scenes_keeps_videos_apart(app):
+    scenes = [make_scene(0.0, 20.0, 'A', video_id='v1'), make_scene(10.0, 30.0, 'B', video_id='v2')]
+
+    merged = app.merge_adjacent_scenes(scenes)
+
+    assert [scene['video_id'] for scene in merged] == ['v1', 'v2']
+
+
+def test_merge_adjacent_scenes_respects_gap(app):
+    scenes = [make_scene(0.0, 10.0, 'A'), make_scene(10.5, 20.0, 'B'), make_scene(25.0, 30.0, 'C')]
+
+    merged = app.merge_adjacent_scenes(scenes, max_gap=1.0)
+
+    assert [(scene['start'], scene['end']) for scene in merged] == [(0.0, 20.0), (25.0, 30.0)]
+
+
+def test_count_keyword_hits_counts_overlapping_keywords(app):
+    automaton = app.build_keyword_automaton(['he', 'she', 'his', 'hers'])
+
+    assert app.count_keyword_hits(automaton, 'ushers') == {'he': 1, 'she': 1, 'hers': 1}
+
+
+def test_count_keyword_hits_is_case_insensitive(app):
+    automaton = app.build_keyword_automaton(['AI', '紹介'])
+
+    assert app.count_keyword_hits(automaton, 'ai と AI の紹介') == {'AI': 2, '紹介': 1}
+
+
+def test_count_keyword_hits_matches_naive_count(app):
+    keywords = ['ab', 'b', 'bab', 'aa']
+    automaton = app.build_keyword_automaton(keywords)
+    text = 'abababaab'
+
+    def naive_count(keyword):
+        return sum(1 for i in range(len(text)) if text.startswith(keyword, i))
+
+    expected = {keyword: naive_count(keyword) for keyword in keywords if naive_count(keyword)}
+    assert app.count_keyword_hits(automaton, text) == expected
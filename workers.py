@@ -0,0 +1,304 @@
+"""
+Context Cut Pro - プロセスプール用ワーカー関数
+Streamlitに依存しないため、spawnされた子プロセスから安全にインポートできる
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# 音声認識バックエンド
+ASR_BACKEND_OPENAI_WHISPER = "openai-whisper"
+ASR_BACKEND_FASTER_WHISPER = "faster-whisper"  # CTranslate2によるint8量子化CPU推論
+
+# ワーカープロセスごとに1回だけロードするWhisperモデル
+_WHISPER_MODEL = None
+_WHISPER_MODEL_KEY = None
+
+# OCR設定
+OCR_LANGUAGES = ['ja', 'en']
+TESSERACT_CONFIG = '--oem 3 --psm 6 -l jpn+eng'  # Tesseractの設定（日本語対応）
+TESSERACT_LINE_CONFIG = '--oem 3 --psm 7 -l jpn+eng'  # 切り出したテキスト行用
+OCR_MAX_TEXT_REGIONS = 32  # 1フレームあたりに認識するテキスト領域の上限
+
+# ワーカープロセスごとに1回だけロードするEasyOCRリーダー（Noneの場合はTesseractを使う）
+_OCR_READER = None
+
+
+def load_asr_model(model_name: str, backend: str = ASR_BACKEND_OPENAI_WHISPER, num_threads: int = 0):
+    """指定バックエンドで音声認識モデルをロード
+
+    Args:
+        model_name: モデル名（tiny / base / small など）
+        backend: ASR_BACKEND_OPENAI_WHISPER または ASR_BACKEND_FASTER_WHISPER
+        num_threads: CPUスレッド数（0はライブラリの既定値）
+    """
+    if backend == ASR_BACKEND_FASTER_WHISPER:
+        from faster_whisper import WhisperModel
+        return WhisperModel(model_name, device="cpu", compute_type="int8", cpu_threads=num_threads)
+
+    import whisper
+    return whisper.load_model(model_name)
+
+
+def is_faster_whisper_model(model) -> bool:
+    """faster-whisperのモデルかどうかを判定"""
+    return type(model).__module__.startswith("faster_whisper")
+
+
+def run_asr(model, audio, decode_options: Dict, verbose=None) -> Dict:
+    """バックエンドに依存せず文字起こしを実行し、openai-whisperと同じ形式の結果を返す
+
+    Args:
+        model: load_asr_model で取得したモデル
+        audio: 音声ファイルのパス、または16kHzモノラルのfloat32音声
+        decode_options: WhisperのデコードオプションDict（language, temperature など）
+        verbose: openai-whisperの進捗表示設定
+
+    Returns:
+        {'text': 全文, 'segments': [...], 'language': 言語}
+    """
+    if not is_faster_whisper_model(model):
+        return model.transcribe(audio, verbose=verbose, **decode_options)
+
+    # faster-whisperはfp16指定を持たず、compute_type（int8）で精度が決まる
+    segments_iter, info = model.transcribe(
+        audio,
+        language=decode_options.get('language'),
+        temperature=decode_options.get('temperature', 0.0),
+        condition_on_previous_text=decode_options.get('condition_on_previous_text', True),
+        beam_size=1  # openai-whisperのtemperature=0と同じ貪欲デコード
+    )
+
+    segments = []
+    for segment in segments_iter:
+        segments.append({
+            'id': len(segments),
+            'seek': int(segment.seek),
+            'start': float(segment.start),
+            'end': float(segment.end),
+            'text': segment.text,
+            'tokens': list(segment.tokens),
+            'temperature': float(segment.temperature),
+            'avg_logprob': float(segment.avg_logprob),
+            'compression_ratio': float(segment.compression_ratio),
+            'no_speech_prob': float(segment.no_speech_prob)
+        })
+
+    return {
+        'text': ''.join(segment['text'] for segment in segments),
+        'segments': segments,
+        'language': info.language
+    }
+
+
+def init_whisper_worker(model_name: str, num_threads: int = 1, backend: str = ASR_BACKEND_OPENAI_WHISPER) -> None:
+    """ワーカープロセスの初期化（音声認識モデルをプロセス内にキャッシュ）"""
+    global _WHISPER_MODEL, _WHISPER_MODEL_KEY
+
+    import torch
+
+    # プロセス数 × スレッド数がコア数を超えないように制限
+    num_threads = max(1, num_threads)
+    torch.set_num_threads(num_threads)
+
+    if _WHISPER_MODEL is None or _WHISPER_MODEL_KEY != (backend, model_name):
+        _WHISPER_MODEL = load_asr_model(model_name, backend, num_threads)
+        _WHISPER_MODEL_KEY = (backend, model_name)
+
+
+def shift_segments(segments: List[Dict], offset: float) -> List[Dict]:
+    """セグメントのタイムスタンプを元音声の時刻に補正（元のdictは変更しない）"""
+    shifted = []
+    for segment in segments:
+        segment = dict(segment)
+        segment['start'] = float(segment['start']) + offset
+        segment['end'] = float(segment['end']) + offset
+        if 'seek' in segment:
+            # seekはメルスペクトログラムのフレーム単位（100フレーム/秒）
+            segment['seek'] = int(segment['seek']) + int(round(offset * 100))
+        shifted.append(segment)
+    return shifted
+
+
+def transcribe_chunk(audio: np.ndarray, offset: float, decode_options: Dict) -> List[Dict]:
+    """音声チャンクを文字起こしし、元音声の時刻に補正したセグメントを返す
+
+    Args:
+        audio: 16kHzモノラルのfloat32音声
+        offset: チャンク先頭の元音声上の時刻（秒）
+        decode_options: model.transcribe に渡すデコード設定
+    """
+    if _WHISPER_MODEL is None:
+        raise RuntimeError("Whisperワーカーが初期化されていません")
+
+    result = run_asr(_WHISPER_MODEL, audio, decode_options)
+    return shift_segments(result.get('segments', []), offset)
+
+
+def create_easyocr_reader():
+    """EasyOCRのリーダーを作成（CPU推論）"""
+    import easyocr
+    return easyocr.Reader(OCR_LANGUAGES, gpu=False)
+
+
+def detect_text_regions(gray: np.ndarray, min_height: int = 8) -> List[List[int]]:
+    """MSERで文字らしい領域を検出し、同じ行の文字をまとめたテキスト領域を返す
+
+    EasyOCRの検出モデル（CRAFT）より大幅に軽く、認識器には候補領域だけを渡せる。
+
+    Returns:
+        EasyOCRの horizontal_list 形式 [[x_min, x_max, y_min, y_max], ...]（上から順）
+    """
+    import cv2
+
+    height, width = gray.shape[:2]
+    mser = cv2.MSER_create()
+    mser.setMinArea(30)
+    mser.setMaxArea(max(31, int(height * width * 0.05)))
+    _, bboxes = mser.detectRegions(gray)
+    if len(bboxes) == 0:
+        return []
+
+    # 文字サイズとして不自然な領域を除いてマスクを作成
+    mask = np.zeros((height, width), dtype=np.uint8)
+    char_heights = []
+    for x, y, w, h in bboxes:
+        if h < min_height or h > height * 0.3 or w > width * 0.5:
+            continue
+        mask[y:y + h, x:x + w] = 255
+        char_heights.append(h)
+    if not char_heights:
+        return []
+
+    # 文字の高さ程度だけ横方向に膨張させて、同じ行の文字をつなげる
+    char_height = int(np.median(char_heights))
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, char_height), 3))
+    mask = cv2.dilate(mask, kernel)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    padding = 4
+    regions = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < min_height or w < min_height:
+            continue
+        regions.append([max(0, x - padding), min(width, x + w + padding), max(0, y - padding), min(height, y + h + padding)])
+
+    regions.sort(key=lambda region: (region[2], region[0]))
+    return regions[:OCR_MAX_TEXT_REGIONS]
+
+
+def ocr_frame_batch(
+    frames: List[Tuple[float, np.ndarray]],
+    reader=None,
+    crop_text_regions: bool = True,
+    min_confidence: float = 0.6
+) -> List[Dict]:
+    """グレースケールフレームのバッチをOCRし、認識結果を時刻順に返す
+
+    crop_text_regions=True の場合はMSERで検出したテキスト領域だけを認識し、候補がないフレームは読み飛ばす。
+    False の場合、EasyOCRでは readtext_batched で複数フレームをまとめて検出・認識する。
+
+    Args:
+        frames: [(時刻（秒）, グレースケール画像), ...]
+        reader: EasyOCRリーダー（Noneの場合はTesseract）
+        crop_text_regions: テキスト領域を切り出してから認識する
+        min_confidence: これより信頼度が低いEasyOCRの結果は捨てる
+
+    Returns:
+        [{"text": "抽出テキスト", "timestamp": 10.5, "confidence": 0.95}, ...]
+    """
+    ocr_results = []
+    if not frames:
+        return ocr_results
+
+    def add_easyocr_results(timestamp: float, results) -> None:
+        for (bbox, text, confidence) in results:
+            if confidence > min_confidence and text.strip() and len(text.strip()) > 1:
+                ocr_results.append({
+                    "text": text.strip(),
+                    "timestamp": timestamp,
+                    "confidence": float(confidence)
+                })
+
+    if reader is not None and not crop_text_regions:
+        # 同じ動画のフレームはサイズが同じなので、そのままバッチにできる
+        batch_results = reader.readtext_batched([gray for _, gray in frames], batch_size=len(frames))
+        for (timestamp, _), results in zip(frames, batch_results):
+            add_easyocr_results(timestamp, results)
+        return ocr_results
+
+    for timestamp, gray in frames:
+        regions = detect_text_regions(gray) if crop_text_regions else None
+        if regions is not None and not regions:
+            continue  # テキスト候補がないフレームは認識しない
+
+        if reader is not None:
+            results = reader.recognize(gray, horizontal_list=regions, free_list=[], batch_size=len(regions))
+            add_easyocr_results(timestamp, results)
+            continue
+
+        import pytesseract
+        if regions is None:
+            text = pytesseract.image_to_string(gray, config=TESSERACT_CONFIG).strip()
+        else:
+            lines = [
+                pytesseract.image_to_string(gray[y_min:y_max, x_min:x_max], config=TESSERACT_LINE_CONFIG).strip()
+                for x_min, x_max, y_min, y_max in regions
+            ]
+            text = '\n'.join(line for line in lines if line)
+        if text and len(text) > 1:
+            ocr_results.append({
+                "text": text,
+                "timestamp": timestamp,
+                "confidence": 0.8  # Tesseractは信頼度を返さない
+            })
+
+    return ocr_results
+
+
+def ocr_frame_batch_with_retry(
+    frames: List[Tuple[float, np.ndarray]],
+    reader=None,
+    crop_text_regions: bool = True,
+    min_confidence: float = 0.6
+) -> Tuple[List[Dict], int]:
+    """バッチ単位でOCRし、失敗した場合は1フレームずつやり直す（1枚の失敗でバッチ全体を失わない）
+
+    Returns:
+        (認識結果, OCRに失敗したフレーム数)
+    """
+    try:
+        return ocr_frame_batch(frames, reader, crop_text_regions, min_confidence), 0
+    except Exception as e:
+        print(f"OCRバッチの処理に失敗したため1フレームずつ再試行します: {e}")
+
+    ocr_results = []
+    failed_count = 0
+    for frame in frames:
+        try:
+            ocr_results.extend(ocr_frame_batch([frame], reader, crop_text_regions, min_confidence))
+        except Exception as e:
+            failed_count += 1
+            print(f"OCRに失敗したフレーム（{frame[0]:.1f}秒）: {e}")
+    return ocr_results, failed_count
+
+
+def init_ocr_worker(use_easyocr: bool, num_threads: int = 1) -> None:
+    """OCRワーカープロセスの初期化（EasyOCRリーダーをプロセス内にキャッシュ）"""
+    global _OCR_READER
+
+    import cv2
+    cv2.setNumThreads(1)
+
+    if use_easyocr:
+        import torch
+        torch.set_num_threads(max(1, num_threads))
+        if _OCR_READER is None:
+            _OCR_READER = create_easyocr_reader()
+
+
+def ocr_frames_in_worker(frames: List[Tuple[float, np.ndarray]], crop_text_regions: bool, min_confidence: float) -> Tuple[List[Dict], int]:
+    """ワーカープロセス内のリーダーでフレームのバッチをOCR（戻り値は ocr_frame_batch_with_retry と同じ）"""
+    return ocr_frame_batch_with_retry(frames, _OCR_READER, crop_text_regions, min_confidence)